@@ -1,22 +1,22 @@
-import json
-import time
+import atexit
+import asyncio
+import threading
 import random
 import pandas as pd
 from faker import Faker
-from IPython.display import display, clear_output
 import Connection as BQ
-from google.cloud import bigquery
+from ingest import run_ingestion
+from spool import EventSpool, SpoolDrainer
+from storage import get_backend
+from dedup import EventDeduplicator
+from statements import logger
+from events import EVENT_TYPES
+from schema import EventsSchema
+from broadcast import start_publisher
 
 fake = Faker()
 
 
-EVENT_TYPES = [
-    "page_view", "search_product", "view_product", "add_to_cart",
-    "remove_from_cart", "wishlist_add", "wishlist_remove", "apply_coupon",
-    "checkout", "purchase", "login", "logout"
-]
-
-
 columns = ["event_id", "user_id", "event_type", "product_id", "price", "timestamp"]
 events_df = pd.DataFrame(columns=columns)
 
@@ -32,25 +32,89 @@ def generate_event():
         "event_type": event_type,
         "product_id": product_id,
         "price": price,
-        "timestamp": pd.Timestamp.now().isoformat()
+        "timestamp": pd.Timestamp.now(tz="UTC").isoformat()
     }
 
+_spool = None
+_drainer = None
+_spool_lock = threading.Lock()
+
+
+def get_spool():
+    """The spool behind `stream_to_bigquery`, with its drainer started."""
+    global _spool, _drainer
+    with _spool_lock:
+        if _spool is None:
+            backend = get_backend()
+            _spool = EventSpool()
+            _drainer = SpoolDrainer(_spool, lambda rows: backend.insert_rows("events", rows)).start()
+            atexit.register(_close_spool)
+    return _spool
+
+
+def _close_spool():
+    # Whatever is not delivered in time stays spooled for the next run.
+    _drainer.stop(timeout=60)
+    _spool.close()
+
+
 def stream_to_bigquery(event):
-    table_id = f"{BQ.BQ_PROJECT}.{BQ.BQ_DATASET}.events"
-    client = bigquery.Client()
-    errors = client.insert_rows_json(table_id, [event])
-    
-    if errors:
-        print(f"Error inserting event: {errors}")
-    else:
-        print(f"Inserted event: {event}")
-        
-
-for _ in range(100):  
-    new_event = generate_event()  
-    stream_to_bigquery(new_event)
-    
-    clear_output(wait=True)
-    
-    
-    time.sleep(1) 
+    # On disk before this returns, so a crash loses nothing; the drainer
+    # sends spooled events in batches in the background.
+    get_spool().append(event)
+
+
+def run_bulk_ingestion(source, dedup=None, **options):
+    from bulkload import ParquetEventSink
+
+    publisher = start_publisher()
+    with ParquetEventSink() as sink:
+        write = publisher.wrap(sink.write_many) if publisher else sink.write_many
+        # Files are loaded under idempotent job ids, so only source
+        # duplicates need dropping here.
+        write = dedup.wrap(write) if dedup else write
+        try:
+            return asyncio.run(run_ingestion(source, write, **options))
+        finally:
+            if publisher:
+                publisher.close()
+
+
+def run_stream_ingestion(source, dedup=None, **options):
+    backend = get_backend()
+    # Every event is spooled to disk first; the drainer delivers it and
+    # resumes from the spool checkpoint after a crash or restart.
+    spool = EventSpool()
+    send = lambda rows: backend.insert_rows("events", rows)
+    # Source duplicates are dropped once delivered; retried and replayed
+    # inserts are deduplicated by BigQuery on their insert ids (event ids).
+    send = dedup.wrap_delivery(send) if dedup else send
+    drainer = SpoolDrainer(spool, send).start()
+    # Spooled events are also pushed straight to live dashboards.
+    publisher = start_publisher()
+    write = publisher.wrap(spool.append_many) if publisher else spool.append_many
+    try:
+        return asyncio.run(run_ingestion(source, write, **options))
+    finally:
+        if publisher:
+            publisher.close()
+        drainer.stop(timeout=60)
+        spool.close()
+
+
+if __name__ == "__main__":
+    from generator import EventBatchGenerator
+
+    if EventsSchema(get_backend()).ensure():
+        raise SystemExit("events still has a string timestamp column; run `python schema.py migrate` first")
+    generator = EventBatchGenerator()
+    dedup = EventDeduplicator()
+    run = run_bulk_ingestion if BQ.INGEST_SINK == "bulk" else run_stream_ingestion
+    run(
+        lambda n: generator.generate(n).to_rows(),
+        dedup=dedup,
+        senders=4,
+        batch_size=500,
+        max_events=100_000,
+    )
+    logger.info(f"Dedup stats: {dedup.stats()}")
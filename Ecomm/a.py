@@ -1,16 +1,19 @@
 import streamlit as st
 from statements import logger
 import Connection as BQ
-from google.cloud import bigquery
+from storage import get_backend
+from sketches import distinct_count
 import pandas as pd
 import time
 import plotly.express as px
 
 try:
-    client = bigquery.Client()
+    backend = get_backend()
     
 except Exception as e:
-    st.error(f"Error initializing BigQuery client: {e}")
+    st.error(f"Error initializing storage backend: {e}")
+    # Everything below needs the backend.
+    st.stop()
 
 EVENT_TYPES = [
     "page_view", "search_product", "view_product", "add_to_cart",
@@ -18,31 +21,31 @@ EVENT_TYPES = [
     "checkout", "purchase", "login", "logout"
 ]
 
-BQ_ORDERS_TABLE = f"{BQ.BQ_PROJECT}.{BQ.BQ_DATASET}.Orders"
-BQ_ORDERS_ITEMS_TABLE = f"{BQ.BQ_PROJECT}.{BQ.BQ_DATASET}.order_items"
-BQ_ORDERS_PAYMENTS_TABLE = f"{BQ.BQ_PROJECT}.{BQ.BQ_DATASET}.order_payments"
-BQ_CUSTOMERS_TABLE = f"{BQ.BQ_PROJECT}.{BQ.BQ_DATASET}.customers"
-PARTITIONED_ORDER_ITEMS= f"{BQ.BQ_PROJECT}.{BQ.BQ_DATASET}.partitioned_order_items"
-CLUSTERING_ORDERS=f"{BQ.BQ_PROJECT}.{BQ.BQ_DATASET}.ClusteredOrders"
+BQ_ORDERS_TABLE = backend.table("Orders")
+BQ_ORDERS_ITEMS_TABLE = backend.table("order_items")
+BQ_ORDERS_PAYMENTS_TABLE = backend.table("order_payments")
+BQ_CUSTOMERS_TABLE = backend.table("customers")
+PARTITIONED_ORDER_ITEMS= backend.table("partitioned_order_items")
+CLUSTERING_ORDERS=backend.table("ClusteredOrders")
 
 QUERY_ORDER_STATUS = f"""
 SELECT OrderStatus, COUNT(*) as Count
-FROM `{CLUSTERING_ORDERS}` 
+FROM {CLUSTERING_ORDERS} 
 GROUP BY OrderStatus
 ORDER BY Count DESC;
 """
 
 QUERY_DAILY_ORDERS = f"""
 SELECT OrderDate, COUNT(*) as Orders
-FROM `{CLUSTERING_ORDERS}`
+FROM {CLUSTERING_ORDERS}
 GROUP BY OrderDate
 ORDER BY OrderDate;
 """
 
 TOP_PRODUCTS = f"""
 SELECT REPLACE(INITCAP(p.product_category_name), '_', '') as ProductCategoryName ,SUM(oi.price) AS Revenue
- FROM `{BQ.BQ_PROJECT}.{BQ.BQ_DATASET}.order_items` oi
- INNER JOIN  `{BQ.BQ_PROJECT}.{BQ.BQ_DATASET}.products` p ON
+ FROM {backend.table("order_items")} oi
+ INNER JOIN  {backend.table("products")} p ON
  oi.product_id=p.product_id
  group by p.product_category_name
  order by revenue desc LIMIT 10
@@ -50,8 +53,8 @@ SELECT REPLACE(INITCAP(p.product_category_name), '_', '') as ProductCategoryName
 
 WORST_PRODUCTS = f"""
 SELECT  REPLACE(INITCAP(p.product_category_name), '_', '') as ProductCategoryName, SUM(oi.price) AS Revenue
- FROM `{BQ.BQ_PROJECT}.{BQ.BQ_DATASET}.order_items` oi
- INNER JOIN  `{BQ.BQ_PROJECT}.{BQ.BQ_DATASET}.products` p ON
+ FROM {backend.table("order_items")} oi
+ INNER JOIN  {backend.table("products")} p ON
  oi.product_id=p.product_id
  group by p.product_category_name
  order by revenue LIMIT 10
@@ -60,10 +63,10 @@ SELECT  REPLACE(INITCAP(p.product_category_name), '_', '') as ProductCategoryNam
 ALLSTATS = f"""
   SELECT COUNT(DISTINCT order_id) AS total_orders,
     SUM(price + freight_value) AS total_revenue,
-    (SELECT COUNT(DISTINCT customer_id) FROM `{BQ.BQ_PROJECT}.{BQ.BQ_DATASET}.customers` ) AS active_customers,
+    (SELECT COUNT(DISTINCT customer_id) FROM {backend.table("customers")} ) AS active_customers,
     COUNT(DISTINCT product_id) AS total_products_sold,
     AVG(price + freight_value) AS avg_order_value
-FROM `{BQ.BQ_PROJECT}.{BQ.BQ_DATASET}.order_items`
+FROM {backend.table("order_items")}
 """
 
 
@@ -71,7 +74,7 @@ FROM `{BQ.BQ_PROJECT}.{BQ.BQ_DATASET}.order_items`
 def fetch_batch_data(query):
     logger.info("Fetching Query")
     try:
-        return client.query(query).to_dataframe()
+        return backend.query(query)
     except Exception as e:
         st.error(f"Error fetching real-time events: {e}")
         logger.warning(e)
@@ -81,20 +84,19 @@ def fetch_realtime_events():
     logger.info("Fetching real-time event data...")
     query = f"""
     SELECT event_id as EventId, user_id as UserId, REPLACE(INITCAP(event_type), '_', '') as EventType, product_id as ProductId, price as Price, timestamp 
-FROM `{BQ.BQ_PROJECT}.{BQ.BQ_DATASET}.events`
-WHERE PARSE_TIMESTAMP('%Y-%m-%dT%H:%M:%E*S', timestamp) 
-      >= TIMESTAMP_SUB(TIMESTAMP(DATETIME(CURRENT_TIMESTAMP(), "Asia/Kolkata")), INTERVAL 10 MINUTE)
+FROM {backend.table("events")}
+WHERE timestamp >= TIMESTAMP_SUB(CURRENT_TIMESTAMP(), INTERVAL 10 MINUTE)
 ORDER BY timestamp DESC;
     """
-    return client.query(query).to_dataframe()
+    return backend.query(query)
 def fetch_all_events():
     logger.info("Fetching all events data...")
     query = f"""
     SELECT event_id as EventId, user_id as UserId, REPLACE(INITCAP(event_type), '_', '') as EventType, product_id as ProductId, price as Price, timestamp
-    FROM `{BQ.BQ_PROJECT}.{BQ.BQ_DATASET}.events`
+    FROM {backend.table("events")}
     ORDER BY timestamp DESC;
     """
-    return client.query(query).to_dataframe()
+    return backend.query(query)
 
 
 def animate_metric(label, final_value, key, is_currency=False):
@@ -338,7 +340,7 @@ def main():
             with st.container():
                 
                 st.markdown('<div class="metric-label">📦 Unique Users</div>', unsafe_allow_html=True)
-                animate_metric("Unique Users",df['UserId'].nunique(),"events")
+                animate_metric("Unique Users",distinct_count(df['UserId']),"events")
                 st.markdown('</div>', unsafe_allow_html=True)
        
         with col3:
@@ -455,7 +457,7 @@ def main():
                 with st.container():
                     
                     st.markdown('<div class="metric-label">📦 Unique Users</div>', unsafe_allow_html=True)
-                    animate_metric("Unique Users",df['UserId'].nunique(),"events")
+                    animate_metric("Unique Users",distinct_count(df['UserId']),"events")
                     st.markdown('</div>', unsafe_allow_html=True)
         
             with col3:
@@ -539,10 +541,8 @@ def main():
 
         # Function to fetch data from BigQuery with pagination
         def fetch_batc_data(query, offset, limit):
-            client = bigquery.Client()
             query_with_pagination = f"{query} LIMIT {limit} OFFSET {offset}"
-            query_job = client.query(query_with_pagination)
-            return query_job.result().to_dataframe()
+            return backend.query(query_with_pagination)
 
         # Fragment for pagination controls
         
@@ -592,7 +592,7 @@ def main():
         st.subheader("Orders Table")
     
     # Fetch total rows for Orders Table
-        total_rows_orders = bigquery.Client().query(f"SELECT COUNT(*) AS total FROM `{CLUSTERING_ORDERS}`").result().to_dataframe().iloc[0]['total']
+        total_rows_orders = backend.query(f"SELECT COUNT(*) AS total FROM {CLUSTERING_ORDERS}").iloc[0]['total']
         
         # Pagination for Orders Table
         offset_orders = st.session_state.page_orders * LIMIT
@@ -606,7 +606,7 @@ def main():
                 DeliveredCarrierDate,
                 DeliveredCustomerDate,
                 EstimatedDeliveryDate
-            FROM `{CLUSTERING_ORDERS}`
+            FROM {CLUSTERING_ORDERS}
         """.format(CLUSTERING_ORDERS=CLUSTERING_ORDERS)
         
         orders_table = fetch_batc_data(query_orders, offset_orders, LIMIT)
@@ -624,7 +624,7 @@ def main():
         st.subheader("Order Items Table")
         
         # Fetch total rows for Order Summary (same table for simplicity)
-        total_rows_summary = bigquery.Client().query(f"SELECT COUNT(*) AS total FROM `{PARTITIONED_ORDER_ITEMS}`").result().to_dataframe().iloc[0]['total']
+        total_rows_summary = backend.query(f"SELECT COUNT(*) AS total FROM {PARTITIONED_ORDER_ITEMS}").iloc[0]['total']
         
         # Pagination for Order Summary
         offset_summary = st.session_state.page_summary * LIMIT
@@ -637,7 +637,7 @@ def main():
             ShippingLimitDate, 
             price,
             FreightValue
-        FROM `{PARTITIONED_ORDER_ITEMS}`
+        FROM {PARTITIONED_ORDER_ITEMS}
         """.format(PARTITIONED_ORDER_ITEMS=PARTITIONED_ORDER_ITEMS)
         
         summary_table = fetch_batc_data(query_summary, offset_summary, LIMIT)
@@ -651,7 +651,7 @@ def main():
         st.subheader("Customers Table")
     
     # Fetch total rows for Orders Table
-        total_rows_orders = bigquery.Client().query(f"SELECT COUNT(*) AS total FROM `{BQ_CUSTOMERS_TABLE}`").result().to_dataframe().iloc[0]['total']
+        total_rows_orders = backend.query(f"SELECT COUNT(*) AS total FROM {BQ_CUSTOMERS_TABLE}").iloc[0]['total']
         
         # Pagination for Orders Table
         offset_orders = st.session_state.page_orders * LIMIT
@@ -662,7 +662,7 @@ def main():
             customer_zip_code_prefix AS CustomerZipCodePrefix,
             customer_city AS CustomerCity,
             customer_state AS CustomerState
-            FROM `{BQ_CUSTOMERS_TABLE}`
+            FROM {BQ_CUSTOMERS_TABLE}
         """.format(BQ_CUSTOMERS_TABLE=BQ_CUSTOMERS_TABLE)
         
         orders_table = fetch_batc_data(query_orders, offset_orders, LIMIT)
@@ -0,0 +1,182 @@
+import argparse
+import json
+import platform
+import subprocess
+import time
+import numpy as np
+from statements import logger
+
+
+def measure_rate(fn, events_per_call, min_seconds=1.0):
+    """Calls `fn` until `min_seconds` have passed; returns events/sec."""
+    calls = 0
+    started = time.perf_counter()
+    while True:
+        fn()
+        calls += 1
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_seconds:
+            return calls * events_per_call / elapsed
+
+
+def percentiles(samples):
+    p50, p95, p99 = np.percentile(samples, [50, 95, 99])
+    return {"p50_ms": p50 * 1000, "p95_ms": p95 * 1000, "p99_ms": p99 * 1000, "samples": len(samples)}
+
+
+def bench_generation(batch_size):
+    from LiveEvents import generate_event
+    from generator import EventBatchGenerator
+
+    generator = EventBatchGenerator(seed=0)
+    return {
+        "generate_event_per_sec": measure_rate(generate_event, 1),
+        "batch_generate_per_sec": measure_rate(lambda: generator.generate(batch_size), batch_size),
+    }
+
+
+def bench_serialization(batch_size):
+    from generator import EventBatchGenerator
+
+    batch = EventBatchGenerator(seed=0).generate(batch_size)
+    rows = batch.to_rows()
+    return {
+        "to_rows_per_sec": measure_rate(batch.to_rows, batch_size),
+        "to_arrow_per_sec": measure_rate(batch.to_arrow, batch_size),
+        "json_dumps_per_sec": measure_rate(lambda: json.dumps(rows), batch_size),
+    }
+
+
+def bench_sink(backend, batch_size, batches):
+    from generator import EventBatchGenerator
+    from writer import BatchedEventWriter
+
+    generator = EventBatchGenerator(seed=1)
+    batches_of_rows = [generator.generate(batch_size).to_rows() for _ in range(batches)]
+
+    latencies = []
+    started = time.perf_counter()
+    for rows in batches_of_rows:
+        t0 = time.perf_counter()
+        backend.insert_rows("events", rows)
+        latencies.append(time.perf_counter() - t0)
+    insert_elapsed = time.perf_counter() - started
+
+    # The same rows again through the batching writer, sized so each
+    # write_many call fills exactly one insert.
+    writer = BatchedEventWriter(backend=backend, max_rows=batch_size, max_linger=60.0)
+    started = time.perf_counter()
+    for rows in batches_of_rows:
+        writer.write_many(rows)
+    writer.close()
+    writer_elapsed = time.perf_counter() - started
+
+    total = batch_size * batches
+    return {
+        "insert": percentiles(latencies),
+        "insert_per_sec": total / insert_elapsed,
+        "writer_per_sec": total / writer_elapsed,
+    }
+
+
+def bench_visibility(backend, probes, linger):
+    """Time from creating an event until the newest-events query returns it."""
+    from generator import EventBatchGenerator
+    from writer import BatchedEventWriter
+
+    generator = EventBatchGenerator(seed=2)
+    writer = BatchedEventWriter(backend=backend, max_linger=linger)
+    live_query = f"SELECT event_id FROM {backend.table('events')} ORDER BY timestamp DESC LIMIT 100"
+    latencies = []
+    try:
+        for _ in range(probes):
+            t0 = time.perf_counter()
+            row = generator.generate(1).to_rows()[0]
+            writer.write(row)
+            while row["event_id"] not in set(backend.query(live_query)["event_id"]):
+                time.sleep(0.002)
+            latencies.append(time.perf_counter() - t0)
+    finally:
+        writer.close()
+    return {"visibility": percentiles(latencies), "linger_s": linger}
+
+
+def bench_download(backend, rows):
+    """Full events pull with object strings vs the Arrow path with compact dtypes."""
+    from generator import EventBatchGenerator
+
+    generator = EventBatchGenerator(seed=3)
+    for start in range(0, rows, 10_000):
+        backend.insert_rows("events", generator.generate(min(10_000, rows - start)).to_rows())
+    sql = f"SELECT * FROM {backend.table('events')}"
+
+    def timed(fn):
+        t0 = time.perf_counter()
+        df = fn()
+        return df, time.perf_counter() - t0
+
+    def megabytes(df):
+        return df.memory_usage(deep=True).sum() / 1e6
+
+    legacy, legacy_s = timed(lambda: backend.query_arrow(sql).to_pandas())
+    compact, compact_s = timed(lambda: backend.query(sql, categories=("event_type",)))
+    projected, projected_s = timed(lambda: backend.read_table("events", ["event_id", "event_type"], categories=("event_type",)))
+    return {
+        "rows": len(compact),
+        "object_rows_per_sec": len(legacy) / legacy_s,
+        "compact_rows_per_sec": len(compact) / compact_s,
+        "projected_rows_per_sec": len(projected) / projected_s,
+        "object_mb": megabytes(legacy),
+        "compact_mb": megabytes(compact),
+        "projected_mb": megabytes(projected),
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def run_benchmarks(batch_size=10_000, sink_batches=50, probes=50, linger=0.05, download_rows=500_000, backend=None):
+    from storage import DuckDBBackend
+
+    backend = backend if backend is not None else DuckDBBackend(":memory:")
+    results = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "git_revision": git_revision(),
+        "python": platform.python_version(),
+        "backend": type(backend).__name__,
+        "batch_size": batch_size,
+    }
+    for name, bench in [
+        ("generation", lambda: bench_generation(batch_size)),
+        ("serialization", lambda: bench_serialization(batch_size)),
+        ("sink", lambda: bench_sink(backend, min(batch_size, 500), sink_batches)),
+        ("visibility", lambda: bench_visibility(backend, probes, linger)),
+        ("download", lambda: bench_download(backend, download_rows)),
+    ]:
+        logger.info(f"Running {name} benchmark...")
+        results[name] = bench()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingestion benchmarks against a local DuckDB stand-in backend")
+    parser.add_argument("--batch-size", type=int, default=10_000)
+    parser.add_argument("--sink-batches", type=int, default=50)
+    parser.add_argument("--probes", type=int, default=50)
+    parser.add_argument("--linger", type=float, default=0.05, help="writer max_linger for the visibility probes")
+    parser.add_argument("--download-rows", type=int, default=500_000, help="events added before the download benchmark")
+    parser.add_argument("--output", default="benchmark_results.jsonl", help="results are appended as one JSON line per run")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.batch_size, args.sink_batches, args.probes, args.linger, args.download_rows)
+    with open(args.output, "a") as f:
+        f.write(json.dumps(results) + "\n")
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
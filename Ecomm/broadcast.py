@@ -0,0 +1,170 @@
+import json
+import queue
+import socket
+import threading
+import Connection as BQ
+from statements import logger
+
+
+def parse_address(address):
+    host, _, port = address.rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+
+class EventPublisher:
+    """Pushes newly ingested events to local subscribers over TCP.
+
+    Each `publish_many(rows)` goes out as one line of JSON to every connected
+    subscriber. Every subscriber has its own sender thread and a bounded
+    queue of `max_pending` batches; a subscriber that falls further behind
+    loses batches instead of slowing ingestion, and gets those events from
+    the warehouse on its next reconcile. The warehouse stays the system of
+    record; this only shortens the live path.
+    """
+
+    def __init__(self, address=BQ.LIVE_PUSH_ADDRESS, max_pending=256):
+        self.host, self.port = parse_address(address)
+        self.max_pending = max_pending
+        self.batches_dropped = 0
+        self._subscribers = []
+        self._lock = threading.Lock()
+        self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def start(self):
+        self._server = socket.create_server((self.host, self.port))
+        self.port = self._server.getsockname()[1]
+        threading.Thread(target=self._accept, name="push-accept", daemon=True).start()
+        logger.info(f"Publishing live events on {self.host}:{self.port}")
+        return self
+
+    def publish_many(self, rows):
+        if not rows:
+            return
+        message = (json.dumps(rows, separators=(",", ":")) + "\n").encode()
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for pending in subscribers:
+            try:
+                pending.put_nowait(message)
+            except queue.Full:
+                self.batches_dropped += 1
+
+    def wrap(self, sink):
+        """Returns a sink that publishes rows once `sink` has accepted them."""
+        def publishing_sink(rows):
+            result = sink(rows)
+            self.publish_many(rows)
+            return result
+        return publishing_sink
+
+    def close(self):
+        if self._server is not None:
+            self._server.close()
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for pending in subscribers:
+            try:
+                pending.put_nowait(None)
+            except queue.Full:
+                pass
+        if self.batches_dropped:
+            logger.warning(f"Dropped {self.batches_dropped} live batches for slow subscribers")
+
+    def _accept(self):
+        while True:
+            try:
+                conn, peer = self._server.accept()
+            except OSError:
+                return
+            pending = queue.Queue(maxsize=self.max_pending)
+            with self._lock:
+                self._subscribers.append(pending)
+            logger.info(f"Live subscriber connected from {peer[0]}:{peer[1]}")
+            threading.Thread(target=self._send, args=(conn, pending), name="push-send", daemon=True).start()
+
+    def _send(self, conn, pending):
+        try:
+            with conn:
+                while True:
+                    message = pending.get()
+                    if message is None:
+                        return
+                    conn.sendall(message)
+        except OSError as e:
+            logger.info(f"Live subscriber disconnected: {e}")
+        finally:
+            with self._lock:
+                self._subscribers.remove(pending)
+
+
+def start_publisher(address=BQ.LIVE_PUSH_ADDRESS):
+    """Starts a publisher, or returns None if push is disabled or the port is taken."""
+    if not address:
+        return None
+    try:
+        return EventPublisher(address).start()
+    except OSError as e:
+        logger.warning(f"Live event push disabled, cannot listen on {address}: {e}")
+        return None
+
+
+class EventSubscriber:
+    """Background thread that passes pushed event batches to `on_rows`.
+
+    Reconnects every `reconnect_delay` seconds while the publisher is down.
+    """
+
+    def __init__(self, on_rows, address=BQ.LIVE_PUSH_ADDRESS, reconnect_delay=1.0):
+        self.on_rows = on_rows
+        self.host, self.port = parse_address(address)
+        self.reconnect_delay = reconnect_delay
+        self.connected = False
+        self.rows_received = 0
+        self._conn = None
+        self._stopping = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="push-subscriber", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopping.set()
+        conn = self._conn
+        if conn is not None:
+            # close() alone does not wake a thread blocked reading the socket.
+            try:
+                conn.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            conn.close()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                with socket.create_connection((self.host, self.port)) as conn:
+                    self._conn = conn
+                    self.connected = True
+                    for line in conn.makefile("rb"):
+                        self._receive(line)
+            except OSError:
+                pass
+            finally:
+                self.connected = False
+                self._conn = None
+            self._stopping.wait(self.reconnect_delay)
+
+    def _receive(self, line):
+        try:
+            rows = json.loads(line)
+            self.on_rows(rows)
+            self.rows_received += len(rows)
+        except Exception as e:
+            logger.warning(f"Error handling pushed events: {e}")
@@ -0,0 +1,258 @@
+import glob
+import json
+import os
+import queue
+import threading
+import time
+import pyarrow as pa
+import pyarrow.parquet as pq
+import Connection as BQ
+from statements import logger
+from storage import get_backend
+
+
+EVENTS_SCHEMA = pa.schema([
+    ("event_id", pa.string()),
+    ("user_id", pa.string()),
+    ("event_type", pa.string()),
+    ("product_id", pa.string()),
+    ("price", pa.float64()),
+    ("timestamp", pa.timestamp("us", tz="UTC")),
+])
+
+# Rows carry the timestamp as an ISO string with a UTC offset; it is parsed
+# into EVENTS_SCHEMA's timestamp column when the row group is written.
+ROW_SCHEMA = EVENTS_SCHEMA.set(EVENTS_SCHEMA.get_field_index("timestamp"), pa.field("timestamp", pa.string()))
+
+
+class LoadLedger:
+    """Per-file load state ("running", "done", "failed") and attempt number,
+    persisted as JSON."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        try:
+            with open(path) as f:
+                self.entries = json.load(f)
+        except FileNotFoundError:
+            self.entries = {}
+
+    def state(self, name):
+        return self.entries.get(name, {}).get("state")
+
+    def get(self, name):
+        return self.entries.get(name)
+
+    def set(self, name, state, job_id, attempt=1):
+        with self._lock:
+            self.entries[name] = {"state": state, "job_id": job_id, "attempt": attempt, "updated_at": time.time()}
+            self._save()
+
+    def discard(self, name):
+        with self._lock:
+            if self.entries.pop(name, None) is not None:
+                self._save()
+
+    def _save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.entries, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+
+class ParquetEventSink:
+    """Writes events to rolling zstd Parquet files and loads each closed file.
+
+    A file is closed once it reaches `max_bytes` on disk or has been open for
+    `max_age` seconds. Closed files are loaded by a background thread with a
+    job id derived from the file name and attempt number, which the backend
+    uses to refuse a second load, and `loads.json` records each file's state
+    so a restart only resubmits files that are not yet done. A failed load
+    is retried in the background after `retry_delay` seconds, doubling up to
+    `max_retry_delay`, under the next attempt number once the failed job is
+    confirmed not to have loaded the file. Files still failing at close are
+    retried on the next start.
+    """
+
+    def __init__(self, directory=BQ.BULK_LOAD_DIR, table="events", backend=None, max_bytes=128 * 1024 * 1024,
+                 max_age=60.0, row_group_rows=50_000, compression="zstd", keep_loaded=False, retry_delay=5.0,
+                 max_retry_delay=300.0):
+        self.directory = directory
+        self.table = table
+        self.backend = backend if backend is not None else get_backend()
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.row_group_rows = row_group_rows
+        self.compression = compression
+        self.keep_loaded = keep_loaded
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+
+        os.makedirs(directory, exist_ok=True)
+        self.ledger = LoadLedger(os.path.join(directory, "loads.json"))
+        self.files_loaded = 0
+        self.files_failed = 0
+
+        self._rows = []
+        self._writer = None
+        self._path = None
+        self._opened_at = None
+        self._seq = 0
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self._pending = queue.Queue()
+        # Failed file path -> (monotonic time of its next attempt, delay
+        # before it); only the loader thread touches it.
+        self._retries = {}
+        self._loader = threading.Thread(target=self._load_loop, name="bulk-loader", daemon=True)
+        self._timer = threading.Thread(target=self._age_loop, name="bulk-rotate", daemon=True)
+
+        self._recover()
+        self._loader.start()
+        self._timer.start()
+
+    def write_many(self, rows):
+        with self._lock:
+            self._rows.extend(rows)
+            if len(self._rows) >= self.row_group_rows:
+                self._write_row_group()
+            if self._path and os.path.getsize(self._path) >= self.max_bytes:
+                self._rotate()
+
+    def write(self, row):
+        self.write_many([row])
+
+    def flush(self):
+        """Closes the current file and submits it for loading."""
+        with self._lock:
+            self._rotate()
+
+    def close(self):
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        self._timer.join()
+        self.flush()
+        self._pending.put(None)
+        self._loader.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _write_row_group(self):
+        if not self._rows:
+            return
+        if self._writer is None:
+            self._seq += 1
+            name = f"{self.table}-{time.strftime('%Y%m%dT%H%M%S', time.gmtime())}-{os.getpid()}-{self._seq:06d}.parquet"
+            self._path = os.path.join(self.directory, name + ".inprogress")
+            self._writer = pq.ParquetWriter(self._path, EVENTS_SCHEMA, compression=self.compression)
+            self._opened_at = time.monotonic()
+        table = pa.Table.from_pylist(self._rows, schema=ROW_SCHEMA).cast(EVENTS_SCHEMA)
+        self._writer.write_table(table, row_group_size=len(self._rows))
+        self._rows = []
+
+    def _rotate(self):
+        self._write_row_group()
+        if self._writer is None:
+            return
+        self._writer.close()
+        final_path = self._path[:-len(".inprogress")]
+        os.replace(self._path, final_path)
+        self._writer = None
+        self._path = None
+        self._opened_at = None
+        self._pending.put(final_path)
+
+    def _recover(self):
+        for path in glob.glob(os.path.join(self.directory, "*.parquet.inprogress")):
+            # No footer was written, so the file cannot be read back.
+            logger.warning(f"Discarding incomplete bulk load file {path}")
+            os.replace(path, path[:-len(".inprogress")] + ".corrupt")
+        for path in sorted(glob.glob(os.path.join(self.directory, "*.parquet"))):
+            if self.ledger.state(os.path.basename(path)) == "done":
+                self._forget(path)
+            else:
+                self._pending.put(path)
+
+    def _age_loop(self):
+        while not self._closed.wait(min(self.max_age / 4, 1.0)):
+            with self._lock:
+                if self._opened_at is None and self._rows:
+                    self._write_row_group()
+                if self._opened_at is not None and time.monotonic() - self._opened_at >= self.max_age:
+                    self._rotate()
+
+    def _load_loop(self):
+        while True:
+            try:
+                path = self._pending.get(timeout=self._until_next_retry())
+                if path is None:
+                    break
+                self._load(path)
+            except queue.Empty:
+                pass
+            now = time.monotonic()
+            for path, (due, _) in list(self._retries.items()):
+                if due <= now:
+                    self._load(path)
+        if self._retries:
+            logger.warning(f"{len(self._retries)} bulk load file(s) still failing, will retry on restart")
+
+    def _until_next_retry(self):
+        if not self._retries:
+            return None
+        return max(min(due for due, _ in self._retries.values()) - time.monotonic(), 0)
+
+    def _load(self, path):
+        name = os.path.basename(path)
+        entry = self.ledger.get(name)
+        attempt = 1
+        if entry is not None:
+            if entry["state"] == "done":
+                self._retries.pop(path, None)
+                return
+            attempt = entry.get("attempt", 1)
+            # The previous attempt may have loaded the file even if this
+            # process saw it fail (e.g. a timeout waiting on the job).
+            previous = self.backend.load_job_state(entry["job_id"])
+            if previous == "done":
+                self._loaded(path, entry["job_id"], attempt)
+                return
+            if previous == "failed":
+                attempt += 1
+        job_id = f"bulkload_{name[:-len('.parquet')]}_{attempt}"
+        self.ledger.set(name, "running", job_id, attempt)
+        try:
+            self.backend.load_parquet(path, self.table, job_id)
+        except Exception as e:
+            self.files_failed += 1
+            self.ledger.set(name, "failed", job_id, attempt)
+            delay = self.retry_delay
+            if path in self._retries:
+                delay = min(self._retries[path][1] * 2, self.max_retry_delay)
+            self._retries[path] = (time.monotonic() + delay, delay)
+            logger.warning(f"Error loading {name} into {self.table}, retrying in {delay:.0f}s: {e}")
+            return
+        self._loaded(path, job_id, attempt)
+
+    def _loaded(self, path, job_id, attempt):
+        name = os.path.basename(path)
+        self.ledger.set(name, "done", job_id, attempt)
+        self.files_loaded += 1
+        self._retries.pop(path, None)
+        logger.info(f"Loaded {name} into {self.table}")
+        self._forget(path)
+
+    def _forget(self, path):
+        # Once a loaded file is gone it can never be resubmitted, so its
+        # ledger entry is no longer needed.
+        if not self.keep_loaded:
+            os.remove(path)
+            self.ledger.discard(os.path.basename(path))
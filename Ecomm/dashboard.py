@@ -1,120 +1,372 @@
 import streamlit as st
 from statements import logger
 import Connection as BQ
-from google.cloud import bigquery
+from storage import get_backend
+from events import DISPLAY_NAMES, EVENT_TYPES
+from querycache import QueryCache
+from livefeed import LiveEventFeed
+from broadcast import EventSubscriber
+from summaries import OrderSummaries
+from pagination import KeysetPager
+from filters import EventFilter
+from sketches import SKETCH_TABLE, DailySketches
 import pandas as pd
-import time
 import plotly.express as px
 import uuid
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+@st.cache_resource(show_spinner=False)
+def get_warehouse():
+    # One pooled backend per server process, shared by every session and rerun.
+    return get_backend()
+
 
 try:
-    client = bigquery.Client()
+    backend = get_warehouse()
     
 except Exception as e:
-    st.error(f"Error initializing BigQuery client: {e}")
-
-EVENT_TYPES = [
-    "page_view", "search_product", "view_product", "add_to_cart",
-    "remove_from_cart", "wishlist_add", "wishlist_remove", "apply_coupon",
-    "checkout", "purchase", "login", "logout"
-]
-
-BQ_ORDERS_TABLE = f"{BQ.BQ_PROJECT}.{BQ.BQ_DATASET}.Orders"
-BQ_ORDERS_ITEMS_TABLE = f"{BQ.BQ_PROJECT}.{BQ.BQ_DATASET}.order_items"
-BQ_ORDERS_PAYMENTS_TABLE = f"{BQ.BQ_PROJECT}.{BQ.BQ_DATASET}.order_payments"
-BQ_CUSTOMERS_TABLE = f"{BQ.BQ_PROJECT}.{BQ.BQ_DATASET}.customers"
-PARTITIONED_ORDER_ITEMS= f"{BQ.BQ_PROJECT}.{BQ.BQ_DATASET}.partitioned_order_items"
-CLUSTERING_ORDERS=f"{BQ.BQ_PROJECT}.{BQ.BQ_DATASET}.ClusteredOrders"
-
+    st.error(f"Error initializing storage backend: {e}")
+    # Everything below needs the backend.
+    st.stop()
+
+BQ_ORDERS_TABLE = backend.table("Orders")
+BQ_ORDERS_ITEMS_TABLE = backend.table("order_items")
+BQ_ORDERS_PAYMENTS_TABLE = backend.table("order_payments")
+BQ_CUSTOMERS_TABLE = backend.table("customers")
+PARTITIONED_ORDER_ITEMS= backend.table("partitioned_order_items")
+CLUSTERING_ORDERS=backend.table("ClusteredOrders")
+
+# The Overview and Order Summary read the small tables kept by OrderSummaries
+# instead of aggregating the full order history.
 QUERY_ORDER_STATUS = f"""
-SELECT OrderStatus, COUNT(*) as Count
-FROM `{CLUSTERING_ORDERS}` 
-GROUP BY OrderStatus
+SELECT OrderStatus, Count
+FROM {backend.table("summary_order_status")}
 ORDER BY Count DESC;
 """
 
 QUERY_DAILY_ORDERS = f"""
-SELECT OrderDate, COUNT(*) as Orders
-FROM `{CLUSTERING_ORDERS}`
-GROUP BY OrderDate
+SELECT OrderDate, Orders
+FROM {backend.table("summary_daily_orders")}
 ORDER BY OrderDate;
 """
 
 TOP_PRODUCTS = f"""
-SELECT REPLACE(INITCAP(p.product_category_name), '_', '') as ProductCategoryName ,SUM(oi.price) AS Revenue
- FROM `{BQ.BQ_PROJECT}.{BQ.BQ_DATASET}.order_items` oi
- INNER JOIN  `{BQ.BQ_PROJECT}.{BQ.BQ_DATASET}.products` p ON
- oi.product_id=p.product_id
- group by p.product_category_name
- order by revenue desc LIMIT 10
+SELECT REPLACE(INITCAP(ProductCategoryName), '_', '') as ProductCategoryName, Revenue
+ FROM {backend.table("summary_category_revenue")}
+ order by Revenue desc LIMIT 10
  """
 
 WORST_PRODUCTS = f"""
-SELECT  REPLACE(INITCAP(p.product_category_name), '_', '') as ProductCategoryName, SUM(oi.price) AS Revenue
- FROM `{BQ.BQ_PROJECT}.{BQ.BQ_DATASET}.order_items` oi
- INNER JOIN  `{BQ.BQ_PROJECT}.{BQ.BQ_DATASET}.products` p ON
- oi.product_id=p.product_id
- group by p.product_category_name
- order by revenue LIMIT 10
+SELECT REPLACE(INITCAP(ProductCategoryName), '_', '') as ProductCategoryName, Revenue
+ FROM {backend.table("summary_category_revenue")}
+ order by Revenue LIMIT 10
  """
 
 ALLSTATS = f"""
-  SELECT COUNT(DISTINCT order_id) AS total_orders,
-    SUM(price + freight_value) AS total_revenue,
-    (SELECT COUNT(DISTINCT customer_id) FROM `{BQ.BQ_PROJECT}.{BQ.BQ_DATASET}.customers` ) AS active_customers,
-    COUNT(DISTINCT product_id) AS total_products_sold,
-    AVG(price + freight_value) AS avg_order_value
-FROM `{BQ.BQ_PROJECT}.{BQ.BQ_DATASET}.order_items`
+  SELECT total_orders,
+    total_revenue,
+    active_customers,
+    total_products_sold,
+    total_revenue / NULLIF(item_count, 0) AS avg_order_value
+FROM {backend.table("summary_kpis")}
+"""
+
+# Event Metrics aggregates run in the warehouse; only the visible rows are
+# downloaded, through get_events_pager(). In "approx" mode unique users are
+# merged from the daily sketches instead of counted over every event.
+APPROX_UNIQUE_USERS = BQ.DISTINCT_COUNT_MODE == "approx"
+
+EVENT_TOTALS = f"""
+SELECT COUNT(*) AS total_events,
+    {"" if APPROX_UNIQUE_USERS else "COUNT(DISTINCT user_id) AS unique_users,"}
+    SUM(price) AS revenue
+FROM {backend.table("events")}
+"""
+
+# Cache key of the sketched unique user count; not SQL, see cached_query().
+EVENT_SKETCH_USERS = "daily_sketches:user"
+
+EVENT_TYPE_COUNTS = f"""
+SELECT event_type AS EventType, COUNT(*) AS Count
+FROM {backend.table("events")}
+GROUP BY event_type
+"""
+
+EVENTS_PAGE_QUERY = f"""
+SELECT event_id as EventId, user_id as UserId, event_type as EventType, product_id as ProductId, price as Price, timestamp
+FROM {backend.table("events")}
+"""
+
+
+# (ttl seconds, tables read) per cached dashboard query
+QUERY_CACHE_POLICY = {
+    EVENT_TOTALS: (60, ("events",)),
+    EVENT_TYPE_COUNTS: (60, ("events",)),
+    EVENT_SKETCH_USERS: (60, ("events", SKETCH_TABLE)),
+    ALLSTATS: (3600, ("summary_kpis", "order_items", "customers")),
+    TOP_PRODUCTS: (3600, ("summary_category_revenue", "order_items", "products")),
+    WORST_PRODUCTS: (3600, ("summary_category_revenue", "order_items", "products")),
+    QUERY_ORDER_STATUS: (900, ("summary_order_status", "ClusteredOrders")),
+    QUERY_DAILY_ORDERS: (900, ("summary_daily_orders", "ClusteredOrders")),
+}
+
+
+TABLE_PAGE_SIZE = 50
+EVENTS_PAGE_SIZE = 25
+
+ORDERS_PAGE_QUERY = f"""
+    SELECT 
+        OrderId,
+        CustomerId,
+        OrderStatus,
+        OrderDate,
+        ApprovedAt,
+        DeliveredCarrierDate,
+        DeliveredCustomerDate,
+        EstimatedDeliveryDate
+    FROM {CLUSTERING_ORDERS}
+"""
+
+ORDER_ITEMS_PAGE_QUERY = f"""
+    SELECT
+    OrderId,
+    OrderItemId,
+    ProductId,
+    SellerId,
+    ShippingLimitDate, 
+    price,
+    FreightValue
+FROM {PARTITIONED_ORDER_ITEMS}
+"""
+
+CUSTOMERS_PAGE_QUERY = f"""
+    SELECT
+    customer_id AS CustomerId,
+    customer_unique_id AS CustomerUniqueId,
+    customer_zip_code_prefix AS CustomerZipCodePrefix,
+    customer_city AS CustomerCity,
+    customer_state AS CustomerState
+    FROM {BQ_CUSTOMERS_TABLE}
 """
 
 
-@st.cache_data
-def fetch_batch_data(query):
+@st.cache_resource(show_spinner=False)
+def get_table_pagers():
+    # Ordered on the clustering/partition columns plus a unique key.
+    return {
+        "orders": KeysetPager(backend, ORDERS_PAGE_QUERY, CLUSTERING_ORDERS,
+                              [("OrderDate", "OrderDate"), ("OrderId", "OrderId")], TABLE_PAGE_SIZE),
+        "order_items": KeysetPager(backend, ORDER_ITEMS_PAGE_QUERY, PARTITIONED_ORDER_ITEMS,
+                                   [("ShippingLimitDate", "ShippingLimitDate"), ("OrderId", "OrderId"), ("OrderItemId", "OrderItemId")], TABLE_PAGE_SIZE),
+        "customers": KeysetPager(backend, CUSTOMERS_PAGE_QUERY, BQ_CUSTOMERS_TABLE,
+                                 [("customer_id", "CustomerId")], TABLE_PAGE_SIZE),
+    }
+
+
+@st.cache_resource(show_spinner=False)
+def get_order_summaries():
+    # Built from the source tables on first use, then kept current by
+    # `python summaries.py append`.
+    summaries = OrderSummaries(backend)
+    summaries.ensure_built()
+    return summaries
+
+
+@st.cache_resource(show_spinner=False)
+def get_sketches():
+    return DailySketches(backend)
+
+
+def sketch_unique_users():
+    # Only today's events are read; earlier days come from stored sketches.
+    return pd.DataFrame({"unique_users": [get_sketches().distinct("user")]})
+
+
+# Cached values computed by something other than a warehouse query
+COMPUTED_QUERIES = {
+    EVENT_SKETCH_USERS: sketch_unique_users,
+}
+
+
+@st.cache_resource
+def get_query_cache():
+    return QueryCache()
+
+
+@st.cache_resource(show_spinner=False)
+def get_query_pool():
+    return ThreadPoolExecutor(max_workers=BQ.WAREHOUSE_MAX_CONCURRENCY, thread_name_prefix="dashboard-query")
+
+
+def cached_query(cache, query):
+    ttl, tags = QUERY_CACHE_POLICY.get(query, (None, ()))
+    compute = COMPUTED_QUERIES.get(query, lambda: backend.query(query))
+    return cache.get_or_compute(query, compute, ttl=ttl, tags=tags)
+
+
+def fetch_concurrently(*calls):
+    # Every query a view needs is started up front on the shared pool, so the
+    # view waits for the slowest one instead of the sum of all of them.
+    # Streamlit calls stay on the script thread.
+    futures = [get_query_pool().submit(call) for call in calls]
+    results = []
+    for future in futures:
+        try:
+            results.append(future.result())
+        except Exception as e:
+            st.error(f"Error fetching data: {e}")
+            logger.warning(e)
+            results.append(pd.DataFrame())
+    return results
+
+
+def fetch_batch_data(*queries):
     logger.info("Fetching Query")
-    try:
-        return client.query(query).to_dataframe()
-    except Exception as e:
-        st.error(f"Error fetching real-time events: {e}")
-        logger.warning(e)
-        return pd.DataFrame()
+    cache = get_query_cache()
+    results = fetch_concurrently(*(partial(cached_query, cache, query) for query in queries))
+    return results[0] if len(queries) == 1 else results
+
+@st.cache_resource(show_spinner=False)
+def get_live_feed():
+    feed = LiveEventFeed(backend, distinct_counts=BQ.DISTINCT_COUNT_MODE, precision=BQ.HLL_PRECISION)
+    subscriber = EventSubscriber(feed.push).start() if BQ.LIVE_PUSH_ADDRESS else None
+    return feed, subscriber
+
+
+def refresh_live_feed():
+    # Only events newer than the feed's watermark are downloaded; the last
+    # 10 minutes are kept in memory and shared by every session.
+    feed, subscriber = get_live_feed()
+    # The view's fragments refresh on their own timers but the warehouse is
+    # polled at most once per table refresh, so the fast KPI timer only
+    # re-reads the in-memory aggregates. While the ingester pushes events
+    # into the feed, the warehouse is only re-checked for ones the push
+    # missed.
+    if subscriber and subscriber.connected:
+        max_age = max(BQ.LIVE_RECONCILE_INTERVAL, BQ.LIVE_TABLE_REFRESH)
+    else:
+        max_age = BQ.LIVE_TABLE_REFRESH
+    feed.refresh(max_age=max_age)
+    return feed
+
 
 def fetch_realtime_events():
     logger.info("Fetching real-time event data...")
-    query = f"""
-    SELECT event_id as EventId, user_id as UserId, REPLACE(INITCAP(event_type), '_', '') as EventType, product_id as ProductId, price as Price, timestamp 
-FROM `{BQ.BQ_PROJECT}.{BQ.BQ_DATASET}.events`
-WHERE PARSE_TIMESTAMP('%Y-%m-%dT%H:%M:%E*S', timestamp) 
-      >= TIMESTAMP_SUB(TIMESTAMP(DATETIME(CURRENT_TIMESTAMP(), "Asia/Kolkata")), INTERVAL 10 MINUTE)
-ORDER BY timestamp DESC;
-    """
-    return client.query(query).to_dataframe()
-def fetch_all_events():
-    logger.info("Fetching all events data...")
-    query = f"""
-    SELECT event_id as EventId, user_id as UserId, REPLACE(INITCAP(event_type), '_', '') as EventType, product_id as ProductId, price as Price, timestamp
-    FROM `{BQ.BQ_PROJECT}.{BQ.BQ_DATASET}.events`
-    ORDER BY timestamp DESC;
-    """
-    return client.query(query).to_dataframe()
+    return with_display_names(refresh_live_feed().snapshot())
 
 
-def animate_metric(label, final_value, key, is_currency=False):
-    placeholder = st.empty()
-    value = 0 
-    step = max(1, final_value // 50)  
-    while value < final_value:
-        value += step
-        if is_currency:
-            placeholder.metric(label, f"${value:,.2f}") 
-        else:
-            placeholder.metric(label, f"{value:,}")  
-        time.sleep(0.02)  
-    
-    
-    if is_currency:
-        placeholder.metric(label, f"${final_value:,.2f}")  
-    else:
-        placeholder.metric(label, f"{final_value:,}")  
+def fetch_live_aggregates():
+    # Maintained as events arrive, so reading them costs nothing per event.
+    return refresh_live_feed().aggregates.snapshot()
+
+
+@st.cache_resource(show_spinner=False, max_entries=32)
+def get_events_pager(where=None, params=None):
+    # One pager per filter combination, newest events first.
+    return KeysetPager(backend, EVENTS_PAGE_QUERY, backend.table("events"),
+                       [("timestamp", "timestamp"), ("event_id", "EventId")], EVENTS_PAGE_SIZE,
+                       ttl=60.0, where=where, params=params, descending=True)
+
+
+def event_filter(event_types, **ids):
+    # The multiselect shows display names; the table stores raw event types.
+    names = {display: name for name, display in DISPLAY_NAMES.items()}
+    return EventFilter([names[t] for t in event_types], **ids)
+
+
+def with_display_names(df):
+    df["EventType"] = df["EventType"].map(DISPLAY_NAMES)
+    return df
+
+
+def render_metric(label, value, is_currency=False):
+    # Sent once with the final value; the count-in is a CSS animation in
+    # the browser (see the page styles in main), so it costs no script time.
+    st.metric(label, f"${value:,.2f}" if is_currency else f"{value:,}")
+
+
+
+@st.fragment(run_every=BQ.LIVE_KPI_REFRESH)
+def live_kpis():
+    totals = fetch_live_aggregates()
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        with st.container():
+            st.markdown('<div class="metric-label">📦 Total Events</div>', unsafe_allow_html=True)
+            render_metric("Total Events", totals["events"])
+            st.markdown('</div>', unsafe_allow_html=True)
+    with col2:
+        with st.container():
+            st.markdown('<div class="metric-label">📦 Unique Users</div>', unsafe_allow_html=True)
+            render_metric("Unique Users", totals["unique_users"])
+            st.markdown('</div>', unsafe_allow_html=True)
+    with col3:
+        with st.container():
+            st.markdown('<div class="metric-label">📦Total Revenue</div>', unsafe_allow_html=True)
+            render_metric("Event Revenues", totals["revenue"], is_currency=True)
+            st.markdown('</div>', unsafe_allow_html=True)
+
+
+@st.fragment(run_every=BQ.LIVE_CHART_REFRESH)
+def live_charts():
+    totals = fetch_live_aggregates()
+    type_counts = pd.DataFrame(
+        [(DISPLAY_NAMES.get(t, t), n) for t, n in totals["type_counts"].items()], columns=["EventType", "Count"]
+    )
+    fig1 = px.bar(type_counts, x='EventType', y='Count', title='Event Type Distribution', color='EventType')
+    fig2 = px.pie(type_counts, names='EventType', values='Count', title='Event Type Proportions')
+    fig3 = px.bar(totals["buckets"], x='start', y='events', title='Events per 10 Seconds', labels={'start': 'Time', 'events': 'Events'})
+
+    st.plotly_chart(fig1, use_container_width=True)
+    st.plotly_chart(fig2, use_container_width=True)
+    st.plotly_chart(fig3, use_container_width=True)
+
+
+@st.fragment(run_every=BQ.LIVE_TABLE_REFRESH)
+def live_table():
+    df = fetch_realtime_events()
+    col1, col2, col3 = st.columns([1, 1, 1])
+
+    # Every type is offered, so a selection survives refreshes that change
+    # which types are in the window.
+    event_type_filter = col1.multiselect("Event Type", [DISPLAY_NAMES[t] for t in EVENT_TYPES])
+    user_id_filter = col2.text_input("Event ID")
+    product_id_filter = col3.text_input("Product ID")
+
+    filter_checkbox = st.checkbox("Apply Filters")
+
+    if filter_checkbox:
+        # The live window is already in memory (LiveEventFeed), so it
+        # is filtered here with the same matching rules.
+        df = event_filter(event_type_filter, event_id=user_id_filter, product_id=product_id_filter).apply(df)
+
+    rows_per_page = 25
+    total_pages = (len(df) // rows_per_page) + (1 if len(df) % rows_per_page > 0 else 0)
+
+    if "current_page" not in st.session_state:
+        st.session_state.current_page = 1
+    st.session_state.current_page = min(st.session_state.current_page, max(total_pages, 1))
+
+    def next_page():
+        if st.session_state.current_page < total_pages:
+            st.session_state.current_page += 1
+
+    def prev_page():
+        if st.session_state.current_page > 1:
+            st.session_state.current_page -= 1
+
+    start_idx = (st.session_state.current_page - 1) * rows_per_page
+    end_idx = start_idx + rows_per_page
+
+    st.dataframe(df.iloc[start_idx:end_idx][['EventType', 'EventId', 'ProductId']], height=500)
+    col1, col2, col3, col4 = st.columns([1, 1, 1, 1])
+    with col1:
+        st.button("Previous", disabled=st.session_state.current_page == 1, on_click=prev_page)
+    with col3:
+        st.button("Next", disabled=st.session_state.current_page >= total_pages, on_click=next_page)
+    with col2:
+        st.write(f"Page {st.session_state.current_page} of {total_pages}")
 
 
 
@@ -140,6 +392,13 @@ def main():
             text-shadow: 3px 3px 5px rgba(0, 0, 0, 0.3);
             margin: 0;
         }
+        [data-testid="stMetricValue"] {
+            animation: metric-count-in 0.8s ease-out;
+        }
+        @keyframes metric-count-in {
+            from { opacity: 0; transform: translateY(12px); }
+            to { opacity: 1; transform: none; }
+        }
     </style>
     <div class="title-container">
         <h1 class="title">🚀 E-commerce Analytics Dashboard</h1>
@@ -186,12 +445,18 @@ def main():
         "🗂️ View Sections:", 
         ["Performance Overview", "Order Summary", "Event Metrics ", "Live Data Stream","Tables"]
     )
+    if st.sidebar.button("🔄 Refresh Data"):
+        get_query_cache().invalidate()
+        for pager in get_table_pagers().values():
+            pager.invalidate()
 
 
 
     if "view_option" in st.session_state and st.session_state.view_option == "Performance Overview":
         st.header("Performance Overview")
-        kpi_data = fetch_batch_data(ALLSTATS).iloc[0]
+        get_order_summaries()
+        kpi_data, top_products_data, worst_products_data = fetch_batch_data(ALLSTATS, TOP_PRODUCTS, WORST_PRODUCTS)
+        kpi_data = kpi_data.iloc[0]
         st.markdown(
         """
         <style>
@@ -225,7 +490,7 @@ def main():
             with st.container():
                 
                 st.markdown('<div class="metric-label">📦 Total Orders</div>', unsafe_allow_html=True)
-                animate_metric("Total Orders", int(kpi_data["total_orders"]), "orders")
+                render_metric("Total Orders", int(kpi_data["total_orders"]))
                 st.markdown('</div>', unsafe_allow_html=True)
 
             
@@ -233,26 +498,23 @@ def main():
             with st.container():
                 
                 st.markdown('<div class="metric-label">💰 Total Revenue</div>', unsafe_allow_html=True)
-                animate_metric("Total Revenue", round(kpi_data['total_revenue'], 1), "revenue", is_currency=True)
+                render_metric("Total Revenue", round(kpi_data['total_revenue'], 1), is_currency=True)
                 st.markdown('</div>', unsafe_allow_html=True)
         with col3:
             with st.container():
                 
                 st.markdown('<div class="metric-label">🧑‍💼 Active Customers</div>', unsafe_allow_html=True)
-                animate_metric("Active Customers", int(kpi_data["active_customers"]), "customers")
+                render_metric("Active Customers", int(kpi_data["active_customers"]))
                 st.markdown('</div>', unsafe_allow_html=True)
         with col4:
             with st.container():
                 
                 st.markdown('<div class="metric-label">📊 Total Products Sold</div>', unsafe_allow_html=True)
-                animate_metric("Total Products Sold", int(kpi_data["total_products_sold"]), "products")
+                render_metric("Total Products Sold", int(kpi_data["total_products_sold"]))
                 st.markdown('</div>', unsafe_allow_html=True)
         
         
 
-        top_products_data = fetch_batch_data(TOP_PRODUCTS)
-        worst_products_data = fetch_batch_data(WORST_PRODUCTS)
-
         col1, col2 = st.columns(2)
 
         with col1:
@@ -281,8 +543,8 @@ def main():
         
     elif st.session_state.view_option == "Order Summary":
         st.header("Order Summary")
-        order_status_data = fetch_batch_data(QUERY_ORDER_STATUS)
-        daily_orders_data = fetch_batch_data(QUERY_DAILY_ORDERS)
+        get_order_summaries()
+        order_status_data, daily_orders_data = fetch_batch_data(QUERY_ORDER_STATUS, QUERY_DAILY_ORDERS)
         
         st.subheader("Order Status Distribution")
         fig1 = px.bar(order_status_data, x="OrderStatus", y="Count", title="Order Status Breakdown", text='Count')
@@ -302,7 +564,13 @@ def main():
 
     elif st.session_state.view_option == "Event Metrics ":
         st.header("Event Metrics ")
-        df = fetch_all_events()
+        if APPROX_UNIQUE_USERS:
+            totals, type_counts, users = fetch_batch_data(EVENT_TOTALS, EVENT_TYPE_COUNTS, EVENT_SKETCH_USERS)
+            totals = pd.concat([totals.iloc[0], users.iloc[0]])
+        else:
+            totals, type_counts = fetch_batch_data(EVENT_TOTALS, EVENT_TYPE_COUNTS)
+            totals = totals.iloc[0]
+        type_counts = with_display_names(type_counts)
         st.markdown(
         """
         <style>
@@ -333,25 +601,25 @@ def main():
             with st.container():
     
                 st.markdown('<div class="metric-label">📦 Total Events</div>', unsafe_allow_html=True)
-                animate_metric("Total Events",len(df),"events")
+                render_metric("Total Events", int(totals["total_events"]))
                 st.markdown('</div>', unsafe_allow_html=True)
         with col2:
             with st.container():
                 
                 st.markdown('<div class="metric-label">📦 Unique Users</div>', unsafe_allow_html=True)
-                animate_metric("Unique Users",df['UserId'].nunique(),"events")
+                render_metric("Unique Users", int(totals["unique_users"]))
                 st.markdown('</div>', unsafe_allow_html=True)
        
         with col3:
             with st.container():
                 
                 st.markdown('<div class="metric-label">📦Total Revenue</div>', unsafe_allow_html=True)
-                animate_metric("Event Revenues", df['Price'].sum(), "events", is_currency=True)
+                render_metric("Event Revenues", totals["revenue"] if pd.notna(totals["revenue"]) else 0, is_currency=True)
 
                 st.markdown('</div>', unsafe_allow_html=True)
        
-        fig1 = px.bar(df.groupby('EventType').size().reset_index(name='Count'), x='EventType', y='Count', title='Conversion Funnel Breakdown', color='EventType')
-        fig2 = px.pie(df, names='EventType', title='Customer Engagement Flow')
+        fig1 = px.bar(type_counts.sort_values('EventType'), x='EventType', y='Count', title='Conversion Funnel Breakdown', color='EventType')
+        fig2 = px.pie(type_counts, names='EventType', values='Count', title='Customer Engagement Flow')
 
         st.plotly_chart(fig1, use_container_width=True)
         st.plotly_chart(fig2, use_container_width=True)
@@ -359,26 +627,25 @@ def main():
        
         col1, col2, col3 = st.columns([1, 1, 1])
 
-        event_type_filter = col1.multiselect("Event Type", df["EventType"].unique())
+        event_type_filter = col1.multiselect("Event Type", type_counts["EventType"].dropna().unique())
         user_id_filter = col2.text_input("User ID")
         product_id_filter = col3.text_input("Product ID")
 
         filter_checkbox = st.checkbox("Apply Filters")
 
+        where, params = None, None
         if filter_checkbox:
-            
-            if event_type_filter:
-                df = df[df['EventType'].isin(event_type_filter)]
-            if user_id_filter:
-                df = df[df['UserId'].str.contains(user_id_filter, na=False)]
-            if product_id_filter:
-                df = df[df['ProductId'].str.contains(product_id_filter, na=False)]
+            # Runs in the warehouse as a parameterized predicate.
+            where, params = event_filter(event_type_filter, user_id=user_id_filter, product_id=product_id_filter).sql()
+        events_pager = get_events_pager(where, params)
 
-        rows_per_page = 25
-        total_pages = (len(df) // rows_per_page) + (1 if len(df) % rows_per_page > 0 else 0)
+        rows_per_page = EVENTS_PAGE_SIZE
+        total_rows = int(totals["total_events"]) if where is None else events_pager.total_rows()
+        total_pages = (total_rows // rows_per_page) + (1 if total_rows % rows_per_page > 0 else 0)
 
         if "current_page" not in st.session_state:
             st.session_state.current_page = 1
+        st.session_state.current_page = max(1, min(st.session_state.current_page, total_pages))
 
         def next_page():
             if st.session_state.current_page < total_pages:
@@ -389,11 +656,8 @@ def main():
                 st.session_state.current_page -= 1
 
         
-        start_idx = (st.session_state.current_page - 1) * rows_per_page
-        end_idx = start_idx + rows_per_page
-
-       
-        st.data_editor(df.iloc[start_idx:end_idx], height=500, use_container_width=True)
+        df = with_display_names(events_pager.page(st.session_state.current_page - 1))
+        st.data_editor(df, height=500, use_container_width=True)
 
         
         col1, col2, col3,col4,col5,col6 = st.columns([1, 1, 1,1,1,1])
@@ -412,7 +676,6 @@ def main():
     elif st.session_state.view_option == "Live Data Stream":
             st.header("Live Data Stream")
             st.success("✅ Live Data Generated Successfully!")
-            df = fetch_realtime_events()
             st.markdown(
         """
         <style>
@@ -445,81 +708,10 @@ def main():
         """,
         unsafe_allow_html=True
     )
-            col1, col2, col3 = st.columns(3)
-            with col1:
-                with st.container():
-        
-                    st.markdown('<div class="metric-label">📦 Total Events</div>', unsafe_allow_html=True)
-                    animate_metric("Total Events",len(df),"events")
-                    st.markdown('</div>', unsafe_allow_html=True)
-            with col2:
-                with st.container():
-                    
-                    st.markdown('<div class="metric-label">📦 Unique Users</div>', unsafe_allow_html=True)
-                    animate_metric("Unique Users",df['UserId'].nunique(),"events")
-                    st.markdown('</div>', unsafe_allow_html=True)
-        
-            with col3:
-                with st.container():
-                    
-                    st.markdown('<div class="metric-label">📦Total Revenue</div>', unsafe_allow_html=True)
-                    animate_metric("Event Revenues", df['Price'].sum(), "events", is_currency=True)
-
-                    st.markdown('</div>', unsafe_allow_html=True)
-       
-            
-            fig1 = px.bar(df.groupby('EventType').size().reset_index(name='Count'), x='EventType', y='Count', title='Event Type Distribution', color='EventType')
-            fig2 = px.pie(df, names='EventType', title='Event Type Proportions') 
-
-            st.plotly_chart(fig1, use_container_width=True)
-            st.plotly_chart(fig2, use_container_width=True)
-            
-            col1, col2, col3 = st.columns([1, 1, 1])
-
-            event_type_filter = col1.multiselect("Event Type", df["EventType"].unique())
-            user_id_filter = col2.text_input("Event ID")
-            product_id_filter = col3.text_input("Product ID")
-
-            filter_checkbox = st.checkbox("Apply Filters")
-
-            if filter_checkbox:
-                if event_type_filter:
-                    df = df[df['EventType'].isin(event_type_filter)]
-                    
-                if user_id_filter:
-                    df = df[df['EventId'].str.contains(user_id_filter, na=False)]
-                if product_id_filter:
-                    df = df[df['ProductId'].str.contains(product_id_filter, na=False)]
-                
-            rows_per_page = 25
-            total_pages = (len(df) // rows_per_page) + (1 if len(df) % rows_per_page > 0 else 0)
-
-            if "current_page" not in st.session_state:
-                st.session_state.current_page = 1
-
-            def next_page():
-                if st.session_state.current_page < total_pages:
-                    st.session_state.current_page += 1
-
-            def prev_page():
-                if st.session_state.current_page > 1:
-                    st.session_state.current_page -= 1
-
-            start_idx = (st.session_state.current_page - 1) * rows_per_page
-            end_idx = start_idx + rows_per_page
-
-            st.dataframe(df.iloc[start_idx:end_idx][['EventType', 'EventId', 'ProductId']], height=500)
-            col1, col2, col3,col4 = st.columns([1, 1, 1,1])
-            with col1:
-                if st.button("Previous", disabled=st.session_state.current_page == 1):
-                    prev_page()
-            with col3:
-                if st.button("Next", disabled=st.session_state.current_page == total_pages):
-                    next_page()
-            with col2:
-               st.write(f"Page {st.session_state.current_page} of {total_pages}")   
-            time.sleep(10) 
-            st.rerun()
+            # Each part refreshes on its own timer without rerunning the page.
+            live_kpis()
+            live_charts()
+            live_table()
 
 
 
@@ -536,14 +728,8 @@ def main():
 
         
         
-        LIMIT = 50 
-
-        
-        def fetch_batc_data(query, offset, limit):
-            client = bigquery.Client()
-            query_with_pagination = f"{query} LIMIT {limit} OFFSET {offset}"
-            query_job = client.query(query_with_pagination)
-            return query_job.result().to_dataframe()
+        LIMIT = TABLE_PAGE_SIZE
+        pagers = get_table_pagers()
 
         @st.fragment
         def pagination_controls(page_key, query_key, total_rows):
@@ -577,27 +763,18 @@ def main():
                 
        
 
+        # All three counts and pages go out together; neighbouring pages are
+        # prefetched by the pagers.
+        total_rows_orders, total_rows_summary, total_rows_customers, orders_table, summary_table, customers_table = fetch_concurrently(
+            pagers["orders"].total_rows,
+            pagers["order_items"].total_rows,
+            pagers["customers"].total_rows,
+            partial(pagers["orders"].page, st.session_state.page_orders),
+            partial(pagers["order_items"].page, st.session_state.page_summary),
+            partial(pagers["customers"].page, st.session_state.page_orders),
+        )
+
         st.subheader("Orders Table")
-    
-    
-        total_rows_orders = bigquery.Client().query(f"SELECT COUNT(*) AS total FROM `{CLUSTERING_ORDERS}`").result().to_dataframe().iloc[0]['total']
-        
-        
-        offset_orders = st.session_state.page_orders * LIMIT
-        query_orders = """
-            SELECT 
-                OrderId,
-                CustomerId,
-                OrderStatus,
-                OrderDate,
-                ApprovedAt,
-                DeliveredCarrierDate,
-                DeliveredCustomerDate,
-                EstimatedDeliveryDate
-            FROM `{CLUSTERING_ORDERS}`
-        """.format(CLUSTERING_ORDERS=CLUSTERING_ORDERS)
-        
-        orders_table = fetch_batc_data(query_orders, offset_orders, LIMIT)
         st.dataframe(orders_table, height=500)
         
        
@@ -605,25 +782,6 @@ def main():
 
         st.markdown("---")
         st.subheader("Order Items Table")
-        
-        
-        total_rows_summary = bigquery.Client().query(f"SELECT COUNT(*) AS total FROM `{PARTITIONED_ORDER_ITEMS}`").result().to_dataframe().iloc[0]['total']
-        
-        
-        offset_summary = st.session_state.page_summary * LIMIT
-        query_summary = """
-            SELECT
-            OrderId,
-            OrderItemId,
-            ProductId,
-            SellerId,
-            ShippingLimitDate, 
-            price,
-            FreightValue
-        FROM `{PARTITIONED_ORDER_ITEMS}`
-        """.format(PARTITIONED_ORDER_ITEMS=PARTITIONED_ORDER_ITEMS)
-        
-        summary_table = fetch_batc_data(query_summary, offset_summary, LIMIT)
         st.dataframe(summary_table, height=500)
         
         
@@ -632,25 +790,9 @@ def main():
         st.markdown("---")
         
         st.subheader("Customers Table")
-    
-    
-        total_rows_orders = bigquery.Client().query(f"SELECT COUNT(*) AS total FROM `{BQ_CUSTOMERS_TABLE}`").result().to_dataframe().iloc[0]['total']
-        
-        offset_orders = st.session_state.page_orders * LIMIT
-        query_orders = """
-            SELECT
-            customer_id AS CustomerId,
-            customer_unique_id AS CustomerUniqueId,
-            customer_zip_code_prefix AS CustomerZipCodePrefix,
-            customer_city AS CustomerCity,
-            customer_state AS CustomerState
-            FROM `{BQ_CUSTOMERS_TABLE}`
-        """.format(BQ_CUSTOMERS_TABLE=BQ_CUSTOMERS_TABLE)
+        st.dataframe(customers_table, height=500)
         
-        orders_table = fetch_batc_data(query_orders, offset_orders, LIMIT)
-        st.dataframe(orders_table, height=500)
-        
-        pagination_controls("page_orders", "orders", total_rows_orders)
+        pagination_controls("page_orders", "orders", total_rows_customers)
 
 
 
@@ -0,0 +1,152 @@
+import hashlib
+import math
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+from statements import logger
+
+
+class BloomFilter:
+    def __init__(self, capacity, fp_rate):
+        self.num_bits = max(8, math.ceil(-capacity * math.log(fp_rate) / math.log(2) ** 2))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.bits = np.zeros((self.num_bits + 7) // 8, dtype=np.uint8)
+        self.count = 0
+        self.created_at = time.monotonic()
+
+    def positions(self, hashes):
+        # Kirsch-Mitzenmacher double hashing: h1 + i * h2 for i in range(k).
+        i = np.arange(self.num_hashes, dtype=np.uint64)
+        return (hashes[:, :1] + i * hashes[:, 1:]) % np.uint64(self.num_bits)
+
+    def contains(self, positions):
+        hits = self.bits[positions >> np.uint64(3)] & (np.uint8(1) << (positions & np.uint64(7)).astype(np.uint8))
+        return (hits != 0).all(axis=1)
+
+    def add(self, positions):
+        np.bitwise_or.at(self.bits, positions >> np.uint64(3), np.uint8(1) << (positions & np.uint64(7)).astype(np.uint8))
+        self.count += len(positions)
+
+
+class EventDeduplicator:
+    """Drops events whose `key` was already seen within the last `window` seconds.
+
+    Recent keys live in an exact LRU of `lru_size` entries; older ones in
+    `generations` rotating Bloom filters of `capacity` keys each at `fp_rate`.
+    A filter rotates every `window / (generations - 1)` seconds, or early once
+    full so the false-positive rate stays at about `fp_rate`; memory is fixed at
+    `memory_bytes` plus the LRU. Keys are remembered for at least `window` seconds
+    unless more than `capacity` arrive in that time.
+    """
+
+    def __init__(self, key="event_id", window=600.0, capacity=1_000_000, fp_rate=0.001, generations=2, lru_size=100_000):
+        if generations < 2:
+            raise ValueError("generations must be at least 2")
+        self.key = key
+        self.window = window
+        self.capacity = capacity
+        self.fp_rate = fp_rate
+        self.lru_size = lru_size
+        self.rotate_every = window / (generations - 1)
+        self.filters = [BloomFilter(capacity, fp_rate) for _ in range(generations)]
+        self.passed = 0
+        self.exact_duplicates = 0
+        self.filter_duplicates = 0
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def duplicates_dropped(self):
+        return self.exact_duplicates + self.filter_duplicates
+
+    @property
+    def memory_bytes(self):
+        return sum(f.bits.nbytes for f in self.filters)
+
+    def filter(self, rows):
+        with self._lock:
+            kept, positions = self._unseen(rows)
+            self._remember(kept, positions)
+            return kept
+
+    def wrap(self, sink):
+        """Returns a sink that forwards only unseen events to `sink`."""
+        def deduplicated_sink(rows):
+            kept = self.filter(rows)
+            if kept:
+                return sink(kept)
+        return deduplicated_sink
+
+    def wrap_delivery(self, send):
+        """Returns a `send` that skips events already delivered.
+
+        `send` returns per-row errors like `insert_rows_json`. Keys are only
+        remembered once `send` has accepted their rows, so rows that failed
+        or raised are still retried. Error indexes refer to the caller's rows.
+        Keys are kept in memory only, so this drops duplicates from the
+        source, not rows the spool replays after a restart; those are left
+        to the warehouse's insert ids (see `BigQueryBackend.insert_rows`).
+        """
+        def deduplicated_send(rows):
+            with self._lock:
+                kept, positions = self._unseen(rows)
+            if not kept:
+                return []
+            errors = send(kept) or []
+            failed = {error["index"] for error in errors}
+            delivered = [i for i in range(len(kept)) if i not in failed]
+            with self._lock:
+                self._remember([kept[i] for i in delivered], positions[delivered])
+            index = {id(row): i for i, row in enumerate(rows)}
+            return [{**error, "index": index[id(kept[error["index"]])]} for error in errors]
+        return deduplicated_send
+
+    def stats(self):
+        return {
+            "passed": self.passed,
+            "duplicates_dropped": self.duplicates_dropped,
+            "exact_duplicates": self.exact_duplicates,
+            "filter_duplicates": self.filter_duplicates,
+            "memory_bytes": self.memory_bytes,
+        }
+
+    def _unseen(self, rows):
+        # Rows whose key is new, with their Bloom filter bit positions.
+        self._maybe_rotate()
+        candidates = []
+        seen = set()
+        for row in rows:
+            key = row[self.key]
+            if key in seen or key in self._lru:
+                self.exact_duplicates += 1
+                continue
+            seen.add(key)
+            candidates.append(row)
+        if not candidates:
+            return [], np.empty((0, self.filters[0].num_hashes), dtype=np.uint64)
+
+        digests = b"".join(hashlib.blake2b(str(row[self.key]).encode(), digest_size=16).digest() for row in candidates)
+        positions = self.filters[0].positions(np.frombuffer(digests, dtype=np.uint64).reshape(-1, 2))
+        duplicate = np.zeros(len(candidates), dtype=bool)
+        for bloom in self.filters:
+            duplicate |= bloom.contains(positions)
+        self.filter_duplicates += int(duplicate.sum())
+        return [row for row, dup in zip(candidates, duplicate) if not dup], positions[~duplicate]
+
+    def _remember(self, rows, positions):
+        if not rows:
+            return
+        self.filters[0].add(positions)
+        for row in rows:
+            self._lru[row[self.key]] = None
+        while len(self._lru) > self.lru_size:
+            self._lru.popitem(last=False)
+        self.passed += len(rows)
+
+    def _maybe_rotate(self):
+        current = self.filters[0]
+        if current.count >= self.capacity or time.monotonic() - current.created_at >= self.rotate_every:
+            logger.info(f"Rotating dedup filter after {current.count} keys")
+            self.filters.pop()
+            self.filters.insert(0, BloomFilter(self.capacity, self.fp_rate))
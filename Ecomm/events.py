@@ -0,0 +1,195 @@
+from datetime import datetime, timezone
+from enum import IntEnum
+import numpy as np
+
+
+EVENT_TYPES = [
+    "page_view", "search_product", "view_product", "add_to_cart",
+    "remove_from_cart", "wishlist_add", "wishlist_remove", "apply_coupon",
+    "checkout", "purchase", "login", "logout"
+]
+
+EventType = IntEnum("EventType", {name.upper(): code for code, name in enumerate(EVENT_TYPES)})
+
+# What the dashboard shows, e.g. "add_to_cart" -> "AddToCart"; same as
+# REPLACE(INITCAP(event_type), '_', '') in SQL.
+DISPLAY_NAMES = {name: name.title().replace("_", "") for name in EVENT_TYPES}
+
+
+def uuid_to_bytes(value):
+    return bytes.fromhex(value.replace("-", ""))
+
+
+def bytes_to_uuid(raw):
+    h = raw.hex()
+    return f"{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:]}"
+
+
+def iso_to_micros(value):
+    # Naive ISO timestamps (written before the native TIMESTAMP column) are
+    # local time.
+    dt = datetime.fromisoformat(value)
+    return int(dt.replace(microsecond=0).timestamp()) * 1_000_000 + dt.microsecond
+
+
+def micros_to_iso(micros):
+    # UTC with a "Z" suffix, which the warehouse loads into TIMESTAMP as is.
+    micros = int(micros)
+    dt = datetime.fromtimestamp(micros // 1_000_000, timezone.utc).replace(microsecond=micros % 1_000_000)
+    return dt.strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+
+class Event:
+    """One event with binary UUIDs, an EventType code and epoch-micros timestamp."""
+
+    __slots__ = ("event_id", "user_id", "event_type", "product_id", "price", "timestamp")
+
+    def __init__(self, event_id, user_id, event_type, product_id, price, timestamp):
+        self.event_id = event_id
+        self.user_id = user_id
+        self.event_type = EventType(event_type)
+        self.product_id = product_id
+        self.price = price
+        self.timestamp = timestamp
+
+    @classmethod
+    def from_row(cls, row):
+        return cls(
+            uuid_to_bytes(row["event_id"]),
+            uuid_to_bytes(row["user_id"]),
+            EVENT_TYPES.index(row["event_type"]),
+            uuid_to_bytes(row["product_id"]) if row["product_id"] is not None else None,
+            row["price"],
+            iso_to_micros(row["timestamp"]),
+        )
+
+    def to_row(self):
+        return {
+            "event_id": bytes_to_uuid(self.event_id),
+            "user_id": bytes_to_uuid(self.user_id),
+            "event_type": EVENT_TYPES[self.event_type],
+            "product_id": bytes_to_uuid(self.product_id) if self.product_id is not None else None,
+            "price": self.price,
+            "timestamp": micros_to_iso(self.timestamp),
+        }
+
+    def __eq__(self, other):
+        return isinstance(other, Event) and all(getattr(self, f) == getattr(other, f) for f in self.__slots__)
+
+    def __repr__(self):
+        return f"Event({self.to_row()})"
+
+
+class EventBatch:
+    """Struct-of-arrays batch of events.
+
+    UUID columns are (n, 16) uint8 arrays; `has_product` and `has_price` are
+    the null masks for `product_id` and `price`, and `timestamp` is int64
+    epoch microseconds.
+    """
+
+    __slots__ = ("event_id", "user_id", "event_type", "product_id", "has_product", "price", "has_price", "timestamp")
+
+    def __init__(self, event_id, user_id, event_type, product_id, has_product, price, has_price, timestamp):
+        self.event_id = event_id
+        self.user_id = user_id
+        self.event_type = event_type
+        self.product_id = product_id
+        self.has_product = has_product
+        self.price = price
+        self.has_price = has_price
+        self.timestamp = timestamp
+
+    def __len__(self):
+        return len(self.event_type)
+
+    def __getitem__(self, i):
+        return Event(
+            self.event_id[i].tobytes(),
+            self.user_id[i].tobytes(),
+            self.event_type[i],
+            self.product_id[i].tobytes() if self.has_product[i] else None,
+            float(self.price[i]) if self.has_price[i] else None,
+            int(self.timestamp[i]),
+        )
+
+    @property
+    def nbytes(self):
+        return sum(getattr(self, f).nbytes for f in self.__slots__)
+
+    @classmethod
+    def from_rows(cls, rows):
+        n = len(rows)
+        batch = cls(
+            np.zeros((n, 16), dtype=np.uint8),
+            np.zeros((n, 16), dtype=np.uint8),
+            np.zeros(n, dtype=np.uint8),
+            np.zeros((n, 16), dtype=np.uint8),
+            np.zeros(n, dtype=bool),
+            np.zeros(n, dtype=np.float64),
+            np.zeros(n, dtype=bool),
+            np.zeros(n, dtype=np.int64),
+        )
+        codes = {name: code for code, name in enumerate(EVENT_TYPES)}
+        for i, row in enumerate(rows):
+            batch.event_id[i] = np.frombuffer(uuid_to_bytes(row["event_id"]), dtype=np.uint8)
+            batch.user_id[i] = np.frombuffer(uuid_to_bytes(row["user_id"]), dtype=np.uint8)
+            batch.event_type[i] = codes[row["event_type"]]
+            if row["product_id"] is not None:
+                batch.product_id[i] = np.frombuffer(uuid_to_bytes(row["product_id"]), dtype=np.uint8)
+                batch.has_product[i] = True
+            if row["price"] is not None:
+                batch.price[i] = row["price"]
+                batch.has_price[i] = True
+            batch.timestamp[i] = iso_to_micros(row["timestamp"])
+        return batch
+
+    def to_rows(self):
+        """Converts to the JSON row shape the sinks and the events table expect."""
+        event_ids = _uuid_strings(self.event_id)
+        user_ids = _uuid_strings(self.user_id)
+        product_ids = _uuid_strings(self.product_id)
+        timestamps = _iso_strings(self.timestamp)
+        return [
+            {
+                "event_id": event_ids[i],
+                "user_id": user_ids[i],
+                "event_type": EVENT_TYPES[code],
+                "product_id": product_ids[i] if has_product else None,
+                "price": price if has_price else None,
+                "timestamp": timestamps[i],
+            }
+            for i, (code, has_product, price, has_price) in enumerate(zip(
+                self.event_type.tolist(), self.has_product.tolist(), self.price.tolist(), self.has_price.tolist()
+            ))
+        ]
+
+    def to_arrow(self):
+        import pyarrow as pa
+
+        n = len(self)
+        uuid_type = pa.binary(16)
+
+        def uuid_column(values, mask=None):
+            buffer = pa.py_buffer(np.ascontiguousarray(values).tobytes())
+            validity = None if mask is None else pa.py_buffer(np.packbits(mask, bitorder="little").tobytes())
+            return pa.Array.from_buffers(uuid_type, n, [validity, buffer])
+
+        return pa.table({
+            "event_id": uuid_column(self.event_id),
+            "user_id": uuid_column(self.user_id),
+            "event_type": pa.DictionaryArray.from_arrays(pa.array(self.event_type), pa.array(EVENT_TYPES)),
+            "product_id": uuid_column(self.product_id, self.has_product),
+            "price": pa.array(self.price, mask=~self.has_price),
+            "timestamp": pa.array(self.timestamp, type=pa.timestamp("us", tz="UTC")),
+        })
+
+
+def _uuid_strings(raw):
+    h = np.ascontiguousarray(raw).tobytes().hex()
+    return [f"{h[i:i + 8]}-{h[i + 8:i + 12]}-{h[i + 12:i + 16]}-{h[i + 16:i + 20]}-{h[i + 20:i + 32]}" for i in range(0, len(h), 32)]
+
+
+def _iso_strings(timestamps):
+    # Same format as micros_to_iso().
+    return np.datetime_as_string(timestamps.astype("datetime64[us]"), unit="us", timezone="UTC").tolist()
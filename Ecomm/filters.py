@@ -0,0 +1,56 @@
+import re
+from events import DISPLAY_NAMES
+
+
+UUID_PATTERN = re.compile(r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}")
+
+# Filterable id columns: table column -> dashboard column
+ID_COLUMNS = {
+    "user_id": "UserId",
+    "event_id": "EventId",
+    "product_id": "ProductId",
+}
+
+
+class EventFilter:
+    """Event table filters from the dashboard widgets.
+
+    `event_types` keeps events of those (raw) types. Each id filter matches a
+    complete UUID exactly and anything shorter as a prefix, so a search stays
+    a cheap predicate on the id column. `sql()` gives the WHERE clause with
+    its query parameters; `apply()` does the same match on a DataFrame.
+    """
+
+    def __init__(self, event_types=(), **ids):
+        unknown = set(ids) - set(ID_COLUMNS)
+        if unknown:
+            raise ValueError(f"Unknown event filter columns {sorted(unknown)}")
+        self.event_types = tuple(sorted(event_types))
+        self.ids = {column: value.strip().lower() for column, value in sorted(ids.items()) if value and value.strip()}
+
+    def __bool__(self):
+        return bool(self.event_types or self.ids)
+
+    def sql(self):
+        conditions = []
+        params = {}
+        if self.event_types:
+            conditions.append("event_type IN UNNEST(@event_types)")
+            params["event_types"] = self.event_types
+        for column, value in self.ids.items():
+            if UUID_PATTERN.fullmatch(value):
+                conditions.append(f"{column} = @{column}")
+            else:
+                conditions.append(f"STARTS_WITH({column}, @{column})")
+            params[column] = value
+        return " AND ".join(conditions) or None, params
+
+    def apply(self, df):
+        """Filters dashboard-shaped rows, whose EventType may be a display name."""
+        mask = df.index == df.index
+        if self.event_types:
+            mask &= df["EventType"].isin(self.event_types + tuple(DISPLAY_NAMES.get(t, t) for t in self.event_types))
+        for column, value in self.ids.items():
+            ids = df[ID_COLUMNS[column]].fillna("").str.lower()
+            mask &= (ids == value) if UUID_PATTERN.fullmatch(value) else ids.str.startswith(value)
+        return df[mask]
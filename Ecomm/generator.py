@@ -0,0 +1,90 @@
+import time
+import numpy as np
+from events import EVENT_TYPES, EventBatch
+
+
+PRICED_EVENT_TYPES = ["add_to_cart", "purchase", "apply_coupon", "checkout"]
+NO_PRODUCT_EVENT_TYPES = ["login", "logout"]
+
+
+class EventBatchGenerator:
+    """Generates synthetic events N at a time as an `EventBatch`.
+
+    `weights` is either a sequence aligned with EVENT_TYPES or a dict of
+    event_type -> weight (missing types get 0). Passing `seed` makes every
+    column except the wall-clock timestamps reproducible. With `user_range`
+    (start, stop), user ids are drawn from that slice of integer user numbers
+    instead of being random, so separate generators can own disjoint users.
+    """
+
+    def __init__(self, weights=None, seed=None, min_price=5.0, max_price=500.0, user_range=None):
+        self.rng = np.random.default_rng(seed)
+        self.user_range = user_range
+        self.weights = self._normalize_weights(weights)
+        self.min_price = min_price
+        self.max_price = max_price
+        self.priced = np.isin(EVENT_TYPES, PRICED_EVENT_TYPES)
+        self.has_product = ~np.isin(EVENT_TYPES, NO_PRODUCT_EVENT_TYPES)
+        self._last_ts = None
+
+    def generate(self, n):
+        event_type = self.rng.choice(len(EVENT_TYPES), size=n, p=self.weights).astype(np.uint8)
+        has_product = self.has_product[event_type]
+        priced = self.priced[event_type]
+
+        product_id = self._uuids(n)
+        product_id[~has_product] = 0
+        price = np.round(self.rng.uniform(self.min_price, self.max_price, size=n), 2)
+        price[~priced] = 0.0
+
+        return EventBatch(
+            event_id=self._uuids(n),
+            user_id=self._uuids(n) if self.user_range is None else user_uuids(self.rng.integers(*self.user_range, size=n)),
+            event_type=event_type,
+            product_id=product_id,
+            has_product=has_product,
+            price=price,
+            has_price=priced,
+            timestamp=self._timestamps(n),
+        )
+
+    def _normalize_weights(self, weights):
+        if weights is None:
+            return None
+        if isinstance(weights, dict):
+            unknown = set(weights) - set(EVENT_TYPES)
+            if unknown:
+                raise ValueError(f"Unknown event types in weights: {sorted(unknown)}")
+            weights = [weights.get(event_type, 0) for event_type in EVENT_TYPES]
+        weights = np.asarray(weights, dtype=np.float64)
+        if weights.shape != (len(EVENT_TYPES),) or (weights < 0).any() or weights.sum() <= 0:
+            raise ValueError("weights must be non-negative, non-zero and have one entry per event type")
+        return weights / weights.sum()
+
+    def _uuids(self, n):
+        # Random version 4 UUIDs as an (n, 16) byte matrix.
+        raw = np.frombuffer(self.rng.bytes(16 * n), dtype=np.uint8).reshape(n, 16).copy()
+        raw[:, 6] = (raw[:, 6] & 0x0F) | 0x40
+        raw[:, 8] = (raw[:, 8] & 0x3F) | 0x80
+        return raw
+
+    def _timestamps(self, n):
+        # Epoch microseconds, non-decreasing within and across batches, spread
+        # over the time since the previous batch and never ahead of the wall
+        # clock. Above one event per microsecond some events share a timestamp.
+        now = time.time_ns() // 1000
+        start = now if self._last_ts is None else min(self._last_ts + 1, now)
+        ts = start + (np.arange(n, dtype=np.int64) * (now - start)) // max(n - 1, 1)
+        if n:
+            self._last_ts = int(ts[-1])
+        return ts
+
+
+def user_uuids(numbers):
+    """Maps user numbers to stable version 4 UUIDs, one number per UUID."""
+    numbers = np.asarray(numbers, dtype=np.uint64)
+    raw = np.zeros((len(numbers), 16), dtype=np.uint8)
+    raw[:, 6] = 0x40
+    raw[:, 8:] = numbers.astype(">u8").view(np.uint8).reshape(-1, 8)
+    raw[:, 8] = (raw[:, 8] & 0x3F) | 0x80
+    return raw
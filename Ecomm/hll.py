@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+
+
+class HyperLogLog:
+    """HyperLogLog distinct-count sketch with 2 ** `precision` registers.
+
+    Counts have a standard error of 1.04 / sqrt(2 ** precision), about 0.8%
+    at precision 14, in 16 KB whatever the number of values. Sketches of the
+    same precision merge by taking the larger register, so per-day or
+    per-bucket sketches combine into any range. Values are hashed by their
+    string form with pandas' stable 64-bit hash, so sketches written by one
+    process merge with those of another.
+    """
+
+    def __init__(self, precision=14, registers=None):
+        if not 4 <= precision <= 18:
+            raise ValueError(f"HyperLogLog precision must be between 4 and 18, got {precision}")
+        self.precision = precision
+        self.registers = registers if registers is not None else np.zeros(1 << precision, dtype=np.uint8)
+
+    @property
+    def standard_error(self):
+        return 1.04 / np.sqrt(len(self.registers))
+
+    def add(self, values):
+        values = pd.Series(values).dropna()
+        if values.empty:
+            return self
+        if not pd.api.types.is_string_dtype(values):
+            values = values.astype(str)
+        hashes = pd.util.hash_array(values.to_numpy(dtype=object))
+        suffix_bits = 64 - self.precision
+        index = (hashes >> np.uint64(suffix_bits)).astype(np.int64)
+        suffix = hashes & np.uint64((1 << suffix_bits) - 1)
+        # Position of the leftmost 1 in the remaining bits (suffix_bits + 1
+        # if none); frexp's exponent is the bit length.
+        rank = (suffix_bits + 1 - np.frexp(suffix.astype(np.float64))[1]).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+        return self
+
+    def count(self):
+        m = len(self.registers)
+        estimate = 0.7213 / (1 + 1.079 / m) * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and zeros:
+            # Linear counting is more accurate for small cardinalities.
+            estimate = m * np.log(m / zeros)
+        return int(round(estimate))
+
+    def merge(self, other):
+        if other.precision != self.precision:
+            raise ValueError(f"Cannot merge HyperLogLog sketches of precision {self.precision} and {other.precision}")
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def to_bytes(self):
+        return bytes([self.precision]) + self.registers.tobytes()
+
+    @classmethod
+    def from_bytes(cls, raw):
+        return cls(raw[0], np.frombuffer(raw[1:], dtype=np.uint8).copy())
+
+    @classmethod
+    def union(cls, sketches, precision=14):
+        merged = cls(precision)
+        for sketch in sketches:
+            merged.merge(sketch)
+        return merged
+
+
+def approx_nunique(values, precision=14):
+    """Approximate `Series.nunique()` for large in-memory columns."""
+    return HyperLogLog(precision).add(values).count()
@@ -0,0 +1,73 @@
+import asyncio
+import signal
+from statements import logger
+
+
+async def run_ingestion(source, sink, producers=1, senders=4, queue_size=64, batch_size=500, max_events=None):
+    """Runs producers and concurrent senders around a bounded asyncio.Queue.
+
+    `source(n)` returns a list of up to n event rows and `sink(rows)` delivers
+    them; both are blocking callables and run in worker threads. Producers
+    block on the full queue, so generation never runs ahead of delivery by
+    more than `queue_size` batches. SIGINT stops the producers and the run
+    returns once everything already queued has been sent.
+    """
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue(maxsize=queue_size)
+    stop = asyncio.Event()
+    stats = {"produced": 0, "sent": 0, "failed": 0}
+    remaining = [max_events]
+
+    def request_stop(*_):
+        if not stop.is_set():
+            logger.info("Stopping ingestion, draining queued events...")
+        loop.call_soon_threadsafe(stop.set)
+
+    try:
+        loop.add_signal_handler(signal.SIGINT, request_stop)
+        restore = lambda: loop.remove_signal_handler(signal.SIGINT)
+    except (NotImplementedError, RuntimeError):
+        # Windows event loops do not support add_signal_handler.
+        previous = signal.signal(signal.SIGINT, request_stop)
+        restore = lambda: signal.signal(signal.SIGINT, previous)
+
+    def claim():
+        if remaining[0] is None:
+            return batch_size
+        n = min(batch_size, remaining[0])
+        remaining[0] -= n
+        return n
+
+    async def produce():
+        while not stop.is_set():
+            n = claim()
+            if n == 0:
+                break
+            rows = await asyncio.to_thread(source, n)
+            stats["produced"] += len(rows)
+            await queue.put(rows)
+
+    async def send():
+        while True:
+            rows = await queue.get()
+            try:
+                await asyncio.to_thread(sink, rows)
+                stats["sent"] += len(rows)
+            except Exception as e:
+                stats["failed"] += len(rows)
+                logger.warning(f"Error sending {len(rows)} events: {e}")
+            finally:
+                queue.task_done()
+
+    sender_tasks = [asyncio.create_task(send()) for _ in range(senders)]
+    try:
+        await asyncio.gather(*(produce() for _ in range(producers)))
+        await queue.join()
+    finally:
+        for task in sender_tasks:
+            task.cancel()
+        await asyncio.gather(*sender_tasks, return_exceptions=True)
+        restore()
+
+    logger.info(f"Ingestion finished: {stats}")
+    return stats
@@ -0,0 +1,142 @@
+import threading
+import time
+from collections import deque
+import pandas as pd
+from statements import logger
+from windows import WindowedAggregates, utc_now
+
+
+LIVE_COLUMNS = "event_id as EventId, user_id as UserId, event_type as EventType, product_id as ProductId, price as Price, timestamp"
+
+# Ingested row fields -> live window columns, for pushed events
+PUSHED_COLUMNS = {
+    "event_id": "EventId",
+    "user_id": "UserId",
+    "event_type": "EventType",
+    "product_id": "ProductId",
+    "price": "Price",
+    "timestamp": "timestamp",
+}
+
+
+class LiveEventFeed:
+    """Incrementally maintained window of the most recent events.
+
+    Each `refresh()` only asks the warehouse for events at or after the
+    newest timestamp already held (minus `lateness`, to pick up late
+    arrivals), drops the ones already seen and appends the rest to a ring of
+    chunks. Rows older than `window`, or beyond `max_rows`, are evicted.
+    With `max_age`, a refresh is skipped if the last one was more recent,
+    so callers sharing the feed share one warehouse query.
+
+    Events pushed by the ingester (see broadcast.py) are added by `push()`
+    as they arrive; refreshes then only reconcile the window with the
+    warehouse and skip the pushed ids.
+
+    Every event entering the window is also added once to `aggregates`, the
+    incrementally maintained KPIs the Live view reads; `distinct_counts` and
+    `precision` pick how they count unique users.
+    """
+
+    def __init__(self, backend, window=pd.Timedelta(minutes=10), lateness=pd.Timedelta(seconds=5), max_rows=500_000, now=utc_now,
+                 distinct_counts="exact", precision=14):
+        self.backend = backend
+        self.window = window
+        self.lateness = lateness
+        self.max_rows = max_rows
+        self.now = now
+        self.watermark = None
+        self.aggregates = WindowedAggregates(window, now=now, distinct_counts=distinct_counts, precision=precision)
+        self._chunks = deque()
+        self._rows = 0
+        self._recent_ids = set()
+        self._pushed_ids = {}
+        self._refreshed_at = None
+        self._snapshot = None
+        self._lock = threading.Lock()
+
+    def refresh(self, max_age=None):
+        with self._lock:
+            if max_age is not None and self._refreshed_at is not None and time.monotonic() - self._refreshed_at < max_age:
+                return 0
+            cutoff = self.now() - self.window
+            since = cutoff if self.watermark is None else max(cutoff, self.watermark - self.lateness)
+            # A TIMESTAMP range, so only the current day partition is read.
+            fetched = self.backend.query(f"""
+                SELECT {LIVE_COLUMNS}
+                FROM {self.backend.table("events")}
+                WHERE timestamp >= @since
+                ORDER BY timestamp
+            """, {"since": since.to_pydatetime()}, categories=("EventType",))
+            new = fetched[~fetched["EventId"].isin(self._recent_ids | self._pushed_ids.keys())]
+            if not fetched.empty:
+                latest = pd.to_datetime(fetched["timestamp"], utc=True).max()
+                self.watermark = latest if self.watermark is None else max(self.watermark, latest)
+            self._append(new)
+            self._remember_recent()
+            self._evict(cutoff)
+            self._refreshed_at = time.monotonic()
+            logger.info(f"Live feed fetched {len(new)} new events since {since}")
+            return len(new)
+
+    def push(self, rows):
+        """Adds events pushed by the ingester, as rows of the events table."""
+        new = pd.DataFrame(rows, columns=list(PUSHED_COLUMNS)).rename(columns=PUSHED_COLUMNS)
+        with self._lock:
+            new = new[~new["EventId"].isin(self._recent_ids | self._pushed_ids.keys())]
+            new = new.assign(timestamp=pd.to_datetime(new["timestamp"], utc=True, format="ISO8601"))
+            new = new[new["timestamp"] >= self.now() - self.window]
+            self._pushed_ids.update(zip(new["EventId"], new["timestamp"]))
+            self._append(new)
+            return len(new)
+
+    def snapshot(self):
+        """Current window as a DataFrame, newest first."""
+        with self._lock:
+            self._evict(self.now() - self.window)
+            if not self._chunks:
+                return pd.DataFrame(columns=["EventId", "UserId", "EventType", "ProductId", "Price", "timestamp"])
+            if self._snapshot is None:
+                # Pushed and reconciled chunks can overlap in time.
+                window = pd.concat(self._chunks, ignore_index=True)
+                self._snapshot = window.sort_values("timestamp", ascending=False, kind="stable").reset_index(drop=True)
+            return self._snapshot.copy()
+
+    def _append(self, new):
+        if new.empty:
+            return
+        new = new.assign(timestamp=pd.to_datetime(new["timestamp"], utc=True)).sort_values("timestamp", kind="stable")
+        self._chunks.append(new.reset_index(drop=True))
+        self._rows += len(new)
+        self.aggregates.add_frame(new)
+        self._snapshot = None
+
+    def _remember_recent(self):
+        # Ids that the next lateness re-scan will fetch again. Pushed ids
+        # older than that can no longer come back from the warehouse.
+        cutoff = self.now() - self.window
+        if self.watermark is None:
+            self._pushed_ids = {i: t for i, t in self._pushed_ids.items() if t >= cutoff}
+            return
+        horizon = self.watermark - self.lateness
+        self._pushed_ids = {i: t for i, t in self._pushed_ids.items() if t >= max(horizon, cutoff)}
+        recent = set()
+        for chunk in reversed(self._chunks):
+            recent.update(chunk.loc[chunk["timestamp"] >= horizon, "EventId"])
+            if chunk["timestamp"].iloc[0] < horizon:
+                break
+        self._recent_ids = recent
+
+    def _evict(self, cutoff):
+        while self._chunks and (self._chunks[0]["timestamp"].iloc[-1] < cutoff or self._rows - len(self._chunks[0]) >= self.max_rows):
+            self._rows -= len(self._chunks.popleft())
+            self._snapshot = None
+        if self._chunks:
+            first = self._chunks[0]
+            keep = first["timestamp"] >= cutoff
+            overflow = max(0, self._rows - self.max_rows)
+            if not keep.all() or overflow:
+                trimmed = first[keep].iloc[overflow:].reset_index(drop=True)
+                self._rows -= len(first) - len(trimmed)
+                self._chunks[0] = trimmed
+                self._snapshot = None
@@ -0,0 +1,156 @@
+import argparse
+import multiprocessing as mp
+import queue
+import signal
+import time
+from statements import logger
+
+
+class TokenBucket:
+    """Events/sec limiter shared by every worker process.
+
+    Tokens may go negative: a worker takes its whole batch and then sleeps off
+    the debt, so batches larger than the burst size still make progress.
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.burst = burst if burst is not None else rate
+        self._tokens = mp.Value("d", self.burst, lock=False)
+        self._updated = mp.Value("d", time.monotonic(), lock=False)
+        self._lock = mp.Lock()
+
+    def acquire(self, n):
+        with self._lock:
+            now = time.monotonic()
+            tokens = min(self.burst, self._tokens.value + (now - self._updated.value) * self.rate)
+            self._tokens.value = tokens - n
+            self._updated.value = now
+        if tokens < n:
+            time.sleep((n - tokens) / self.rate)
+
+
+def make_sink(kind):
+    if kind == "null":
+        return None, (lambda: None)
+    if kind == "bulk":
+        from bulkload import ParquetEventSink
+
+        sink = ParquetEventSink()
+        return sink.write_many, sink.close
+    from writer import BatchedEventWriter
+
+    writer = BatchedEventWriter()
+    return writer.write_many, writer.close
+
+
+def run_worker(worker, user_range, bucket, target_rate, batch_size, sink_kind, seed, stop, reports, report_interval):
+    # The parent handles Ctrl+C and tells workers to stop through `stop`.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    from generator import EventBatchGenerator
+
+    generator = EventBatchGenerator(seed=None if seed is None else seed + worker, user_range=user_range)
+    write, close = make_sink(sink_kind)
+    started = last_report = time.monotonic()
+    produced = reported = 0
+    try:
+        while not stop.is_set():
+            if bucket is not None:
+                bucket.acquire(batch_size)
+            batch = generator.generate(batch_size)
+            if write is not None:
+                write(batch.to_rows())
+            produced += batch_size
+
+            now = time.monotonic()
+            if now - last_report >= report_interval:
+                reports.put(worker_report(worker, produced, reported, now - started, now - last_report, target_rate))
+                last_report, reported = now, produced
+    finally:
+        close()
+        now = time.monotonic()
+        reports.put(worker_report(worker, produced, reported, now - started, now - last_report, target_rate, final=True))
+
+
+def worker_report(worker, produced, reported, elapsed, interval, target_rate, final=False):
+    # Lag is how far this worker is behind its share of the target rate.
+    lag = None if target_rate is None else max(0.0, target_rate * elapsed - produced) / target_rate
+    return {
+        "worker": worker,
+        "events": produced,
+        "events_per_sec": (produced - reported) / interval if interval else 0.0,
+        "lag_s": lag,
+        "final": final,
+    }
+
+
+def run_load(workers=mp.cpu_count(), rate=None, duration=None, batch_size=1000, sink="null", users=1_000_000,
+             seed=None, report_interval=5.0):
+    """Runs `workers` generator processes until `duration` elapses or Ctrl+C.
+
+    Worker i owns user numbers [i * users / workers, (i + 1) * users / workers).
+    `rate` is the aggregate events/sec target; None runs unthrottled.
+    """
+    stop = mp.Event()
+    reports = mp.Queue()
+    bucket = TokenBucket(rate, burst=max(rate / 10, batch_size * workers)) if rate else None
+    share = rate / workers if rate else None
+    bounds = [users * i // workers for i in range(workers + 1)]
+    processes = [
+        mp.Process(target=run_worker, name=f"loadgen-{i}", args=(
+            i, (bounds[i], bounds[i + 1]), bucket, share, batch_size, sink, seed, stop, reports, report_interval
+        ))
+        for i in range(workers)
+    ]
+
+    started = time.monotonic()
+    for process in processes:
+        process.start()
+    logger.info(f"Started {workers} load generator workers, target {rate or 'unthrottled'} events/sec, sink {sink}")
+
+    totals = {}
+    finished = 0
+    # Keep reading reports after a stop until every worker sent its final one;
+    # a worker cannot exit while its queued reports are unread.
+    while finished < workers:
+        try:
+            if duration is not None and time.monotonic() - started >= duration:
+                stop.set()
+            try:
+                report = reports.get(timeout=0.5)
+            except queue.Empty:
+                if not any(p.is_alive() for p in processes):
+                    break
+                continue
+            totals[report["worker"]] = report["events"]
+            finished += report["final"]
+            lag = "" if report["lag_s"] is None else f", lag {report['lag_s']:.2f}s"
+            logger.info(f"worker {report['worker']}: {report['events_per_sec']:,.0f} events/sec, {report['events']:,} total{lag}")
+        except KeyboardInterrupt:
+            logger.info("Stopping load generator...")
+            stop.set()
+    for process in processes:
+        process.join()
+
+    elapsed = time.monotonic() - started
+    total = sum(totals.values())
+    logger.info(f"Generated {total:,} events in {elapsed:.1f}s ({total / elapsed:,.0f} events/sec)")
+    return {"events": total, "elapsed_s": elapsed, "per_worker": totals}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Multi-process synthetic events load generator")
+    parser.add_argument("--workers", type=int, default=mp.cpu_count())
+    parser.add_argument("--rate", type=float, default=None, help="aggregate events/sec target (default: unthrottled)")
+    parser.add_argument("--duration", type=float, default=None, help="seconds to run (default: until Ctrl+C)")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--sink", choices=["null", "stream", "bulk"], default="null")
+    parser.add_argument("--users", type=int, default=1_000_000, help="size of the user id space split across workers")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--report-interval", type=float, default=5.0)
+    args = parser.parse_args()
+    run_load(args.workers, args.rate, args.duration, args.batch_size, args.sink, args.users, args.seed, args.report_interval)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+import datetime
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+import pandas as pd
+from statements import logger
+
+
+_prefetcher = None
+_prefetcher_lock = threading.Lock()
+
+
+def shared_prefetcher(max_workers=4):
+    """Thread pool every pager prefetches on, so evicted pagers leave no threads behind."""
+    global _prefetcher
+    with _prefetcher_lock:
+        if _prefetcher is None:
+            _prefetcher = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="pager-prefetch")
+        return _prefetcher
+
+
+def sql_literal(value):
+    """SQL literal for a key value read back from the warehouse.
+
+    Dates and timestamps are written as strings, which both BigQuery and
+    DuckDB coerce to the column's type when compared.
+    """
+    if isinstance(value, pd.Timestamp):
+        value = value.date() if value == value.normalize() and value.tzinfo is None else value
+    if isinstance(value, (datetime.date, datetime.datetime, pd.Timestamp)):
+        return f"'{value}'"
+    if isinstance(value, str):
+        if "'" in value or "\\" in value:
+            raise ValueError(f"Unsupported character in pagination key {value!r}")
+        return f"'{value}'"
+    return repr(value.item() if hasattr(value, "item") else value)
+
+
+class KeysetPager:
+    """Pages through `select_sql` in `keys` order without OFFSET.
+
+    Each page seeks past the last key of the page before it, so page N costs
+    the same as page 1 and rows never shift between pages. `keys` are
+    (expression, result column) pairs that must be unique and non-NULL
+    together. `where` is an optional filter on the source columns, with its
+    query `params`. Pages and the row count are cached for `ttl` seconds, and
+    the pages either side of the one requested are fetched in the background
+    on `prefetcher` (default: `shared_prefetcher()`).
+    """
+
+    def __init__(self, backend, select_sql, table, keys, page_size=50, ttl=300.0, max_pages=32, prefetcher=None,
+                 where=None, params=None, descending=False):
+        self.backend = backend
+        self.select_sql = select_sql
+        self.table = table
+        self.keys = keys
+        self.page_size = page_size
+        self.where = where
+        self.params = params
+        self.descending = descending
+        self.ttl = ttl
+        self.max_pages = max_pages
+        self._prefetcher = prefetcher or shared_prefetcher()
+        self._lock = threading.Lock()
+        self.invalidate()
+
+    def invalidate(self):
+        with self._lock:
+            # Start key of each page; page 0 starts at the beginning.
+            self._cursors = {0: None}
+            self._pages = OrderedDict()
+            self._count = None
+
+    def total_rows(self):
+        with self._lock:
+            if self._count is not None and time.monotonic() - self._count[1] < self.ttl:
+                return self._count[0]
+        where = f"WHERE {self.where}" if self.where else ""
+        total = int(self.backend.query(f"SELECT COUNT(*) AS total FROM {self.table} {where}", self.params).iloc[0]["total"])
+        with self._lock:
+            self._count = (total, time.monotonic())
+        return total
+
+    def page(self, number):
+        future, owner = self._claim(number)
+        if owner:
+            self._run(number, future)
+        df = future.result()
+        for neighbour in (number + 1, number - 1):
+            self.prefetch(neighbour)
+        return df.copy()
+
+    def prefetch(self, number):
+        with self._lock:
+            if number < 0 or number not in self._cursors:
+                return
+        future, owner = self._claim(number)
+        if owner:
+            self._prefetcher.submit(self._run, number, future)
+
+    def _claim(self, number):
+        # Returns the cached or in-flight future for a page, or a new one the
+        # caller must fill.
+        with self._lock:
+            entry = self._pages.get(number)
+            if entry is not None and time.monotonic() - entry[1] < self.ttl:
+                self._pages.move_to_end(number)
+                return entry[0], False
+            future = Future()
+            self._pages[number] = (future, time.monotonic())
+            while len(self._pages) > self.max_pages:
+                self._pages.popitem(last=False)
+            return future, True
+
+    def _run(self, number, future):
+        try:
+            future.set_result(self._fetch(number))
+        except Exception as e:
+            with self._lock:
+                if self._pages.get(number, (None,))[0] is future:
+                    del self._pages[number]
+            logger.warning(f"Error fetching page {number} of {self.table}: {e}")
+            future.set_exception(e)
+
+    def _fetch(self, number):
+        # A page whose start key is unknown (e.g. after invalidate()) is
+        # reached by walking forward from the nearest known one. Prefetches
+        # run this concurrently, so cursors are only touched under the lock,
+        # and keys read before an invalidate() are not stored after it.
+        with self._lock:
+            cursors = self._cursors
+            start = max(page for page in cursors if page <= number)
+        for current in range(start, number + 1):
+            with self._lock:
+                if current not in cursors:
+                    return pd.DataFrame()
+                cursor = cursors[current]
+            df = self._query(cursor)
+            if len(df) == self.page_size:
+                last = df.iloc[-1]
+                with self._lock:
+                    cursors[current + 1] = tuple(last[column] for _, column in self.keys)
+        return df
+
+    def _query(self, cursor):
+        direction = " DESC" if self.descending else ""
+        order_by = ", ".join(f"{expression}{direction}" for expression, _ in self.keys)
+        conditions = [f"({condition})" for condition in (self.where, cursor is not None and self._after(cursor)) if condition]
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        return self.backend.query(f"{self.select_sql} {where} ORDER BY {order_by} LIMIT {self.page_size}", self.params)
+
+    def _after(self, cursor):
+        # (k1, k2, ...) > (c1, c2, ...), or < when descending, spelled out
+        # since BigQuery has no row value comparison.
+        op = "<" if self.descending else ">"
+        terms = []
+        for i, ((expression, _), value) in enumerate(zip(self.keys, cursor)):
+            equal = [f"{e} = {sql_literal(v)}" for (e, _), v in zip(self.keys[:i], cursor[:i])]
+            terms.append("(" + " AND ".join(equal + [f"{expression} {op} {sql_literal(value)}"]) + ")")
+        return " OR ".join(terms)
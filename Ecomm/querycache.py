@@ -0,0 +1,163 @@
+import glob
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict, defaultdict
+import pyarrow as pa
+import pyarrow.parquet as pq
+import Connection as BQ
+from statements import logger
+
+
+def normalize_sql(sql):
+    sql = re.sub(r"--[^\n]*", " ", sql)
+    return re.sub(r"\s+", " ", sql).strip().rstrip(";").strip()
+
+
+class QueryCache:
+    """Two-tier, TTL-aware cache of query results keyed on SQL + parameters.
+
+    The memory tier is an LRU bounded to `memory_bytes`. The disk tier stores
+    one Parquet file per result under `directory`, so results survive restarts
+    and are shared by every process pointing at the same directory. Entries
+    carry tags (usually the tables they read) for `invalidate(tag)`.
+    """
+
+    def __init__(self, directory=BQ.QUERY_CACHE_DIR, memory_bytes=256 * 1024 * 1024, default_ttl=600.0):
+        self.directory = directory
+        self.memory_bytes = memory_bytes
+        self.default_ttl = default_ttl
+        self.hits = {"memory": 0, "disk": 0}
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._memory_used = 0
+        self._lock = threading.Lock()
+        self._key_locks = defaultdict(threading.Lock)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def key(self, sql, params=None):
+        payload = json.dumps([normalize_sql(sql), params or {}], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def get(self, sql, params=None):
+        return self._lookup(self.key(sql, params))
+
+    def _lookup(self, key, count_miss=True):
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                df, expires_at, _, disk_mtime, _ = entry
+                if expires_at > now and disk_mtime == self._disk_mtime(key):
+                    self._memory.move_to_end(key)
+                    self.hits["memory"] += 1
+                    return df.copy()
+                self._evict(key)
+
+        df, expires_at, tags = self._read_disk(key)
+        if df is None or expires_at <= now:
+            self.misses += count_miss
+            return None
+        self.hits["disk"] += 1
+        self._remember(key, df, expires_at, tags)
+        return df.copy()
+
+    def put(self, sql, df, params=None, ttl=None, tags=()):
+        key = self.key(sql, params)
+        expires_at = time.time() + (self.default_ttl if ttl is None else ttl)
+        if self.directory:
+            self._write_disk(key, df, expires_at, tags)
+        self._remember(key, df, expires_at, tags)
+
+    def get_or_compute(self, sql, compute, params=None, ttl=None, tags=()):
+        key = self.key(sql, params)
+        df = self._lookup(key)
+        if df is not None:
+            return df
+        # One computation per key at a time; concurrent sessions wait for it.
+        with self._key_locks[key]:
+            df = self._lookup(key, count_miss=False)
+            if df is None:
+                df = compute()
+                self.put(sql, df, params, ttl, tags)
+                df = df.copy()
+        return df
+
+    def invalidate(self, tag=None):
+        """Drops every entry tagged `tag`, or everything when `tag` is None."""
+        with self._lock:
+            for key in [k for k, entry in self._memory.items() if tag is None or tag in entry[4]]:
+                self._evict(key)
+        if not self.directory:
+            return
+        dropped = 0
+        for path in glob.glob(os.path.join(self.directory, "*.parquet")):
+            try:
+                tags = json.loads(pq.read_metadata(path).metadata[b"tags"])
+                if tag is None or tag in tags:
+                    os.remove(path)
+                    dropped += 1
+            except (OSError, KeyError, pa.ArrowInvalid):
+                continue
+        logger.info(f"Invalidated {dropped} cached query results for tag {tag!r}")
+
+    def _remember(self, key, df, expires_at, tags):
+        size = int(df.memory_usage(deep=True).sum())
+        if size > self.memory_bytes:
+            return
+        with self._lock:
+            self._evict(key)
+            self._memory[key] = (df, expires_at, size, self._disk_mtime(key), tuple(tags))
+            self._memory_used += size
+            while self._memory_used > self.memory_bytes:
+                self._evict(next(iter(self._memory)))
+
+    def _evict(self, key):
+        entry = self._memory.pop(key, None)
+        if entry is not None:
+            self._memory_used -= entry[2]
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.parquet")
+
+    def _disk_mtime(self, key):
+        # Lets the memory tier notice that another process replaced or
+        # invalidated the shared on-disk entry.
+        if not self.directory:
+            return None
+        try:
+            return os.stat(self._path(key)).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _read_disk(self, key):
+        if not self.directory:
+            return None, 0, ()
+        try:
+            table = pq.read_table(self._path(key))
+        except (FileNotFoundError, pa.ArrowInvalid):
+            return None, 0, ()
+        metadata = table.schema.metadata or {}
+        expires_at = float(metadata.get(b"expires_at", 0))
+        tags = tuple(json.loads(metadata.get(b"tags", b"[]")))
+        return table.to_pandas(), expires_at, tags
+
+    def _write_disk(self, key, df, expires_at, tags):
+        table = pa.Table.from_pandas(df)
+        table = table.replace_schema_metadata({
+            **(table.schema.metadata or {}),
+            b"expires_at": str(expires_at).encode(),
+            b"tags": json.dumps(list(tags)).encode(),
+        })
+        tmp_path = f"{self._path(key)}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            pq.write_table(table, tmp_path)
+            os.replace(tmp_path, self._path(key))
+        except (OSError, pa.ArrowException) as e:
+            logger.warning(f"Could not write query cache entry {key}: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
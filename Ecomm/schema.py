@@ -0,0 +1,94 @@
+import argparse
+import time
+from statements import logger
+
+
+EVENTS_TABLE = "events"
+
+# Warehouse columns of the events table (BigQuery types). `timestamp` is a
+# native TIMESTAMP so range filters on it prune day partitions.
+EVENTS_COLUMNS = [
+    ("event_id", "STRING"),
+    ("user_id", "STRING"),
+    ("event_type", "STRING"),
+    ("product_id", "STRING"),
+    ("price", "FLOAT64"),
+    ("timestamp", "TIMESTAMP"),
+]
+EVENTS_PARTITION_FIELD = "timestamp"
+EVENTS_CLUSTER_FIELDS = ["event_type", "user_id"]
+
+# Format of the ISO strings written before the native column.
+LEGACY_TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%E*S"
+
+
+class EventsSchema:
+    """Creates the events table and migrates it off the string timestamp.
+
+    Early events stored `timestamp` as a naive ISO string in local time. The
+    migration copies them into a new table with the native schema, reading
+    the strings as `source_timezone`. Then it renames the old table to
+    `events_legacy_<unix time>` and swaps the new one in. Stop ingestion
+    while it runs, because rows written to the old table during the copy
+    would be left behind.
+    """
+
+    def __init__(self, backend, table=EVENTS_TABLE):
+        self.backend = backend
+        self.table = table
+
+    def ensure(self):
+        """Creates the table if missing; returns True if it still needs migrating."""
+        types = self.backend.column_types(self.table)
+        if types is None:
+            logger.info(f"Creating {self.table} table")
+            self.backend.create_table(self.table, EVENTS_COLUMNS, EVENTS_PARTITION_FIELD, EVENTS_CLUSTER_FIELDS)
+            return False
+        return self.needs_migration(types)
+
+    def needs_migration(self, types=None):
+        types = types if types is not None else self.backend.column_types(self.table)
+        return types is not None and types.get("timestamp") != "TIMESTAMP"
+
+    def migrate(self, source_timezone="Asia/Kolkata"):
+        if not self.needs_migration():
+            logger.info(f"{self.table} already has a native timestamp column")
+            return None
+        suffix = int(time.time())
+        migrated = f"{self.table}_migrated_{suffix}"
+        legacy = f"{self.table}_legacy_{suffix}"
+        columns = ", ".join(name for name, _ in EVENTS_COLUMNS)
+        converted = ", ".join(
+            f"TIMESTAMP(PARSE_DATETIME('{LEGACY_TIMESTAMP_FORMAT}', timestamp), @source_timezone) AS timestamp"
+            if name == "timestamp" else name
+            for name, _ in EVENTS_COLUMNS
+        )
+        logger.info(f"Migrating {self.table} to a native timestamp column via {migrated}")
+        self.backend.create_table(migrated, EVENTS_COLUMNS, EVENTS_PARTITION_FIELD, EVENTS_CLUSTER_FIELDS)
+        self.backend.execute(
+            f"INSERT INTO {self.backend.table(migrated)} ({columns}) SELECT {converted} FROM {self.backend.table(self.table)}",
+            {"source_timezone": source_timezone},
+        )
+        self.backend.execute(f"ALTER TABLE {self.backend.table(self.table)} RENAME TO {legacy}")
+        self.backend.execute(f"ALTER TABLE {self.backend.table(migrated)} RENAME TO {self.table}")
+        logger.info(f"Migrated {self.table}; the old rows are kept in {legacy}")
+        return legacy
+
+
+def main():
+    from storage import get_backend
+
+    parser = argparse.ArgumentParser(description="Create or migrate the events table")
+    parser.add_argument("command", choices=["ensure", "migrate"])
+    parser.add_argument("--source-timezone", default="Asia/Kolkata", help="timezone of the legacy naive timestamp strings")
+    args = parser.parse_args()
+
+    schema = EventsSchema(get_backend())
+    if args.command == "migrate":
+        schema.migrate(args.source_timezone)
+    elif schema.ensure():
+        logger.warning("events still has a string timestamp column; run `python schema.py migrate`")
+
+
+if __name__ == "__main__":
+    main()
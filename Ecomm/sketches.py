@@ -0,0 +1,167 @@
+import argparse
+import datetime
+import pandas as pd
+import Connection as BQ
+from hll import HyperLogLog, approx_nunique
+from statements import logger
+
+
+SKETCH_TABLE = "daily_sketches"
+SKETCH_COLUMNS = [("day", "DATE"), ("kind", "STRING"), ("sketch", "BYTES")]
+
+# What each kind counts: (table, key column, day column, day column type).
+# Only tables with a day column can be sketched per day; the Active
+# Customers KPI counts the undated customers table, so it has no kind.
+SKETCH_SOURCES = {
+    "user": ("events", "user_id", "timestamp", "TIMESTAMP"),
+    "order": ("ClusteredOrders", "OrderId", "OrderDate", "DATE"),
+}
+
+
+def distinct_count_sql(expression, mode=None):
+    """COUNT(DISTINCT ...), or its HyperLogLog estimate in "approx" mode."""
+    if (mode or BQ.DISTINCT_COUNT_MODE) == "approx":
+        return f"APPROX_COUNT_DISTINCT({expression})"
+    return f"COUNT(DISTINCT {expression})"
+
+
+def distinct_count(values, mode=None):
+    """`values.nunique()`, or its HyperLogLog estimate in "approx" mode."""
+    if (mode or BQ.DISTINCT_COUNT_MODE) == "approx":
+        return approx_nunique(values, BQ.HLL_PRECISION)
+    return values.nunique()
+
+
+def utc_today():
+    return pd.Timestamp.now(tz="UTC").date()
+
+
+class DailySketches:
+    """One HyperLogLog sketch of distinct keys per kind and (UTC) day.
+
+    Sketches merge, so the distinct count of any date range is read from
+    its days' sketches instead of scanning the source rows. Only complete
+    days are stored; `distinct()` sketches today's rows on the fly, which
+    reads just today's partition. On BigQuery the sketches are built and
+    merged in SQL with HLL_COUNT. Other backends use the `hll` module, so
+    the stored bytes are only readable by the backend that wrote them.
+    """
+
+    def __init__(self, backend, precision=BQ.HLL_PRECISION, today=utc_today):
+        self.backend = backend
+        self.precision = precision
+        self.today = today
+        self.table = backend.table(SKETCH_TABLE)
+
+    def ensure(self):
+        self.backend.create_table(SKETCH_TABLE, SKETCH_COLUMNS)
+
+    def build(self, kind, start=None, end=None):
+        """(Re)builds the sketches of complete days in [start, end]."""
+        end = min(end or self.today(), self.today() - datetime.timedelta(days=1))
+        if start is not None and start > end:
+            return
+        self.ensure()
+        table, column, day_column, day_type = SKETCH_SOURCES[kind]
+        days, params = self._days(kind, start, end)
+        self.backend.execute(f"DELETE FROM {self.table} WHERE {days}", params)
+        where, params = self._range(column, day_column, day_type, start, end + datetime.timedelta(days=1))
+        source = f"{self.backend.table(table)} WHERE {where}"
+        if self.backend.hll_sketches:
+            self.backend.execute(f"""
+                INSERT INTO {self.table} (day, kind, sketch)
+                SELECT CAST({day_column} AS DATE) AS day, @kind, HLL_COUNT.INIT({column}, {self.precision})
+                FROM {source}
+                GROUP BY day
+            """, {**params, "kind": kind})
+        else:
+            keys = self.backend.query(f"SELECT DISTINCT CAST({day_column} AS DATE) AS day, {column} AS key FROM {source}", params)
+            sketches = pd.DataFrame(
+                [(day, kind, HyperLogLog(self.precision).add(group["key"]).to_bytes()) for day, group in keys.groupby("day")],
+                columns=[name for name, _ in SKETCH_COLUMNS],
+            )
+            if len(sketches):
+                self.backend.load_dataframe(sketches, SKETCH_TABLE, write_disposition="WRITE_APPEND")
+        logger.info(f"Built daily {kind} sketches through {end}")
+
+    def update(self, kind):
+        """Builds the complete days added since the last stored sketch."""
+        self.ensure()
+        last = self.backend.query(f"SELECT MAX(day) AS day FROM {self.table} WHERE kind = @kind", {"kind": kind}).iloc[0]["day"]
+        start = None if pd.isna(last) else pd.Timestamp(last).date() + datetime.timedelta(days=1)
+        self.build(kind, start)
+
+    def distinct(self, kind, start=None, end=None):
+        """Approximate distinct keys of `kind` on the days in [start, end]."""
+        self.update(kind)
+        table, column, day_column, day_type = SKETCH_SOURCES[kind]
+        today = self.today()
+        days, params = self._days(kind, start, end)
+        include_today = (end is None or end >= today) and (start is None or start <= today)
+        where, today_params = self._range(column, day_column, day_type, today, today + datetime.timedelta(days=1))
+        if self.backend.hll_sketches:
+            today_sketch = f"""
+                UNION ALL
+                SELECT HLL_COUNT.INIT({column}, {self.precision}) FROM {self.backend.table(table)} WHERE {where}
+            """ if include_today else ""
+            merged = self.backend.query(f"""
+                SELECT HLL_COUNT.MERGE(sketch) AS n FROM (
+                    SELECT sketch FROM {self.table} WHERE {days}
+                    {today_sketch}
+                )
+            """, {**params, **today_params}).iloc[0]["n"]
+            return int(merged) if pd.notna(merged) else 0
+        stored = self.backend.query(f"SELECT sketch FROM {self.table} WHERE {days}", params)
+        merged = HyperLogLog.union((HyperLogLog.from_bytes(raw) for raw in stored["sketch"]), self.precision)
+        if include_today:
+            merged.add(self.backend.query(f"SELECT {column} AS key FROM {self.backend.table(table)} WHERE {where}", today_params)["key"])
+        return merged.count()
+
+    def _days(self, kind, start, end):
+        conditions = ["kind = @kind"]
+        params = {"kind": kind}
+        if start:
+            conditions.append("day >= @start")
+            params["start"] = start
+        if end:
+            conditions.append("day <= @end")
+            params["end"] = end
+        return " AND ".join(conditions), params
+
+    def _range(self, column, day_column, day_type, start, end):
+        # Rows of non-NULL keys on days in [start, end), as a range on the
+        # source column so partitions are pruned.
+        conditions = [f"{column} IS NOT NULL", f"{day_column} < @end_day"]
+        if start:
+            conditions.append(f"{day_column} >= @start_day")
+        as_param = self._timestamp if day_type == "TIMESTAMP" else (lambda day: day)
+        params = {"end_day": as_param(end)}
+        if start:
+            params["start_day"] = as_param(start)
+        return " AND ".join(conditions), params
+
+    def _timestamp(self, day):
+        return datetime.datetime.combine(day, datetime.time(), datetime.timezone.utc)
+
+
+def main():
+    from storage import get_backend
+
+    parser = argparse.ArgumentParser(description="Build or read the daily distinct-count sketches")
+    parser.add_argument("command", choices=["update", "rebuild", "count"])
+    parser.add_argument("--kind", choices=sorted(SKETCH_SOURCES), default="user")
+    parser.add_argument("--start", type=datetime.date.fromisoformat, help="first day (YYYY-MM-DD)")
+    parser.add_argument("--end", type=datetime.date.fromisoformat, help="last day (YYYY-MM-DD)")
+    args = parser.parse_args()
+
+    sketches = DailySketches(get_backend())
+    if args.command == "update":
+        sketches.update(args.kind)
+    elif args.command == "rebuild":
+        sketches.build(args.kind, args.start, args.end)
+    else:
+        print(sketches.distinct(args.kind, args.start, args.end))
+
+
+if __name__ == "__main__":
+    main()
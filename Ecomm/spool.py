@@ -0,0 +1,297 @@
+import glob
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+import Connection as BQ
+from statements import logger
+
+
+# Every record is <payload length><crc32 of payload> followed by the JSON payload.
+HEADER = struct.Struct("<II")
+FSYNC_POLICIES = ("always", "interval", "never")
+
+# insertAll error reasons worth retrying. "stopped" rows were valid but
+# rejected along with a bad row in the same request.
+TRANSIENT_REASONS = {"backendError", "internalError", "rateLimitExceeded", "timeout", "stopped"}
+
+
+def error_kind(errors):
+    """"permanent", "transient" or "unknown" for one row's insert errors.
+
+    BigQuery gives every error a reason; other backends return plain
+    messages, which are "unknown".
+    """
+    reasons = {e.get("reason") if isinstance(e, dict) else None for e in errors}
+    if reasons - TRANSIENT_REASONS - {None}:
+        return "permanent"
+    return "transient" if reasons <= TRANSIENT_REASONS else "unknown"
+
+
+class EventSpool:
+    """Append-only, segment-rotated on-disk log of events awaiting delivery.
+
+    Segments are `segment-<seq>.log` files in `directory`. The `checkpoint` file
+    records how far the consumer has delivered; segments entirely behind it
+    are deleted. Rows the warehouse will never accept are set aside in
+    `dead-letter.jsonl`. `fsync` is "always" (every append), "interval" (at most every
+    `fsync_interval` seconds) or "never" (leave it to the OS).
+    """
+
+    def __init__(self, directory=BQ.SPOOL_DIR, segment_bytes=64 * 1024 * 1024, fsync="interval", fsync_interval=1.0):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"fsync must be one of {FSYNC_POLICIES}, got {fsync!r}")
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self._lock = threading.Lock()
+        self._last_fsync = time.monotonic()
+
+        os.makedirs(directory, exist_ok=True)
+        segments = self.segments()
+        self.active_seq = segments[-1] if segments else 0
+        self._file = open(self._segment_path(self.active_seq), "ab")
+        self._recover_tail()
+
+    def segments(self):
+        paths = glob.glob(os.path.join(self.directory, "segment-*.log"))
+        return sorted(int(os.path.basename(p)[8:-4]) for p in paths)
+
+    def append_many(self, rows):
+        data = bytearray()
+        for row in rows:
+            payload = json.dumps(row, default=str).encode()
+            data += HEADER.pack(len(payload), zlib.crc32(payload))
+            data += payload
+
+        with self._lock:
+            if self._file.tell() and self._file.tell() + len(data) > self.segment_bytes:
+                self._rotate()
+            self._file.write(data)
+            self._file.flush()
+            now = time.monotonic()
+            if self.fsync == "always" or (self.fsync == "interval" and now - self._last_fsync >= self.fsync_interval):
+                os.fsync(self._file.fileno())
+                self._last_fsync = now
+
+    def append(self, row):
+        self.append_many([row])
+
+    def read(self, position, max_records):
+        """Returns up to `max_records` rows after `position` and the position after them."""
+        seq, offset = position
+        while True:
+            active_seq = self.active_seq
+            rows, offset = self._read_segment(seq, offset, max_records)
+            if rows or seq >= active_seq:
+                return rows, (seq, offset)
+            # A rotated-out segment never grows again, so move to the next one.
+            following = [s for s in self.segments() if s > seq]
+            if not following:
+                return rows, (seq, offset)
+            seq, offset = following[0], 0
+
+    def load_checkpoint(self):
+        try:
+            with open(self._checkpoint_path()) as f:
+                seq, offset = f.read().split()
+            position = (int(seq), int(offset))
+        except FileNotFoundError:
+            position = None
+        segments = self.segments()
+        if position is None or (segments and position[0] < segments[0]):
+            position = (segments[0] if segments else 0, 0)
+        return position
+
+    def commit(self, position):
+        tmp_path = self._checkpoint_path() + ".tmp"
+        with open(tmp_path, "w") as f:
+            f.write(f"{position[0]} {position[1]}")
+            if self.fsync != "never":
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_path, self._checkpoint_path())
+        for seq in self.segments():
+            if seq < position[0]:
+                os.remove(self._segment_path(seq))
+
+    def dead_letter(self, entries):
+        """Appends (row, errors) pairs to the dead-letter file."""
+        with self._lock, open(os.path.join(self.directory, "dead-letter.jsonl"), "a") as f:
+            for row, errors in entries:
+                f.write(json.dumps({"row": row, "errors": errors}, default=str) + "\n")
+            f.flush()
+            if self.fsync != "never":
+                os.fsync(f.fileno())
+
+    def close(self):
+        with self._lock:
+            self._file.flush()
+            if self.fsync != "never":
+                os.fsync(self._file.fileno())
+            self._file.close()
+
+    def _rotate(self):
+        self._file.flush()
+        if self.fsync != "never":
+            os.fsync(self._file.fileno())
+        self._file.close()
+        self.active_seq += 1
+        self._file = open(self._segment_path(self.active_seq), "ab")
+
+    def _recover_tail(self):
+        # Drop a torn record left at the end of the active segment by a crash.
+        valid_end = self._scan_segment(self.active_seq)
+        if valid_end < self._file.tell():
+            logger.warning(f"Truncating torn spool record in segment {self.active_seq} at byte {valid_end}")
+            self._file.truncate(valid_end)
+            self._file.seek(valid_end)
+
+    def _scan_segment(self, seq):
+        offset = 0
+        while True:
+            rows, new_offset = self._read_segment(seq, offset, 100_000, decode=False)
+            if not rows:
+                return offset
+            offset = new_offset
+
+    def _read_segment(self, seq, offset, max_records, decode=True):
+        rows = []
+        try:
+            f = open(self._segment_path(seq), "rb")
+        except FileNotFoundError:
+            return rows, offset
+        with f:
+            size = os.fstat(f.fileno()).st_size
+            if size <= offset:
+                return rows, offset
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                while len(rows) < max_records and offset + HEADER.size <= size:
+                    length, crc = HEADER.unpack_from(mm, offset)
+                    end = offset + HEADER.size + length
+                    if end > size:
+                        break
+                    payload = mm[offset + HEADER.size:end]
+                    if zlib.crc32(payload) != crc:
+                        break
+                    rows.append(json.loads(payload) if decode else None)
+                    offset = end
+        return rows, offset
+
+    def _segment_path(self, seq):
+        return os.path.join(self.directory, f"segment-{seq:012d}.log")
+
+    def _checkpoint_path(self):
+        return os.path.join(self.directory, "checkpoint")
+
+
+class SpoolDrainer:
+    """Background thread that replays spooled events to `send` in order.
+
+    `send(rows)` returns per-row errors like `StorageBackend.insert_rows`.
+    Failed rows are retried with exponential backoff and the checkpoint only
+    advances once a whole batch is delivered, so delivery is at-least-once.
+    Rows rejected for a permanent reason go to the spool's dead-letter file
+    straight away. Rows failing for an unknown reason are sent one at a time
+    after `max_attempts` tries, and those that still fail are dead-lettered,
+    so one bad row cannot hold up the rest of the spool. A failed request
+    (e.g. the warehouse is unreachable) is retried for as long as it takes.
+    """
+
+    def __init__(self, spool, send, batch_size=500, poll_interval=0.5, max_backoff=30.0, max_attempts=5):
+        self.spool = spool
+        self.send = send
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_backoff = max_backoff
+        self.max_attempts = max_attempts
+        self.position = spool.load_checkpoint()
+        self.rows_delivered = 0
+        self.rows_dead_lettered = 0
+        self.retries = 0
+        self._stopping = threading.Event()
+        self._abort = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="spool-drainer", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        """Delivers everything spooled so far, giving up after `timeout` seconds."""
+        self._stopping.set()
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            logger.warning("Spool drainer did not catch up in time; remaining events stay spooled")
+            self._abort.set()
+            self._thread.join()
+
+    def _run(self):
+        while not self._abort.is_set():
+            rows, position = self.spool.read(self.position, self.batch_size)
+            if not rows:
+                if self._stopping.is_set():
+                    break
+                self._abort.wait(self.poll_interval)
+                continue
+            if not self._deliver(rows):
+                break
+            self.position = position
+            self.spool.commit(position)
+            self.rows_delivered += len(rows)
+
+    def _deliver(self, rows):
+        delay = 0.5
+        attempts = 0
+        while True:
+            try:
+                errors = self.send(rows)
+            except Exception as e:
+                errors = None
+                reason = str(e)
+            if errors is not None:
+                if not errors:
+                    return True
+                attempts += 1
+                reason = errors[0]
+                failed = {err["index"]: err["errors"] for err in errors}
+                poison = [(rows[i], errs) for i, errs in failed.items() if error_kind(errs) == "permanent"]
+                rows = [row for i, row in enumerate(rows) if i in failed and error_kind(failed[i]) != "permanent"]
+                if rows and attempts >= self.max_attempts:
+                    isolated, rows = self._isolate(rows)
+                    poison += isolated
+                    attempts = 0
+                if poison:
+                    self._dead_letter(poison)
+                if not rows:
+                    return True
+            self.retries += 1
+            logger.warning(f"Retrying {len(rows)} spooled events in {delay:.1f}s: {reason}")
+            if self._abort.wait(delay):
+                return False
+            delay = min(delay * 2, self.max_backoff)
+
+    def _isolate(self, rows):
+        # Sends rows one by one; returns the rejected ones as (row, errors)
+        # and the ones to keep retrying.
+        poison, retry = [], []
+        for row in rows:
+            try:
+                errors = self.send([row])
+            except Exception:
+                retry.append(row)
+                continue
+            if errors and error_kind(errors[0]["errors"]) != "transient":
+                poison.append((row, errors[0]["errors"]))
+            elif errors:
+                retry.append(row)
+        return poison, retry
+
+    def _dead_letter(self, poison):
+        self.spool.dead_letter(poison)
+        self.rows_dead_lettered += len(poison)
+        logger.error(f"Moved {len(poison)} undeliverable events to the dead-letter file: {poison[0][1]}")
@@ -0,0 +1,427 @@
+import datetime
+import queue
+import re
+import threading
+from contextlib import contextmanager
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import google.auth
+from google.api_core.exceptions import Conflict, NotFound
+from google.cloud import bigquery
+import Connection as BQ
+from statements import logger
+
+
+class StorageBackend:
+    """Warehouse operations used by the pipeline and the dashboard.
+
+    Code refers to tables by short name ("events", "order_items"); `table()`
+    returns the identifier to interpolate into SQL for this backend.
+    """
+
+    # Whether SQL can build and merge HLL_COUNT sketches
+    hll_sketches = False
+
+    def table(self, name):
+        raise NotImplementedError
+
+    def insert_rows(self, table, rows):
+        """Appends JSON rows; returns per-row errors like `insert_rows_json`."""
+        raise NotImplementedError
+
+    def query(self, sql, params=None, categories=()):
+        """Runs `sql`; `params` fill BigQuery-style `@name` placeholders.
+
+        A list parameter is matched with `IN UNNEST(@name)`. Strings come
+        back pyarrow-backed and `categories` columns as categoricals.
+        """
+        return arrow_to_frame(self.query_arrow(sql, params), categories)
+
+    def query_arrow(self, sql, params=None):
+        """Like `query()`, as a pyarrow Table."""
+        raise NotImplementedError
+
+    def read_table(self, table, columns=None, categories=()):
+        """Reads `columns` (default all) of a whole table without a query job."""
+        raise NotImplementedError
+
+    def execute(self, sql, params=None):
+        """Runs a DDL or DML statement."""
+        raise NotImplementedError
+
+    def column_types(self, table):
+        """{column: BigQuery type name}, or None if the table does not exist."""
+        raise NotImplementedError
+
+    def create_table(self, table, columns, partition_field=None, cluster_fields=()):
+        """Creates `table` from (name, BigQuery type) pairs if it does not exist.
+
+        `partition_field` is a TIMESTAMP column to partition by day.
+        """
+        raise NotImplementedError
+
+    def load_dataframe(self, df, table, write_disposition="WRITE_TRUNCATE"):
+        raise NotImplementedError
+
+    def load_parquet(self, path, table, job_id):
+        """Appends a Parquet file; a repeated `job_id` must not load it twice."""
+        raise NotImplementedError
+
+    def load_job_state(self, job_id):
+        """"done", "failed", "running", or None if no such load job exists."""
+        raise NotImplementedError
+
+
+class BigQueryBackend(StorageBackend):
+    """BigQuery backend with a pool of up to `max_concurrency` clients.
+
+    Clients are created on demand, share one set of credentials so auth
+    happens once, and keep their HTTP keep-alive connections between calls.
+    Each client serves one call at a time, so its default HTTP connection
+    pool is never short. A call blocks while all clients are busy.
+    """
+
+    hll_sketches = True
+
+    def __init__(self, project=BQ.BQ_PROJECT, dataset=BQ.BQ_DATASET, client=None, max_concurrency=BQ.WAREHOUSE_MAX_CONCURRENCY,
+                 location=BQ.BQ_LOCATION, credentials=None):
+        self.project = project
+        self.dataset = dataset
+        self.location = location
+        self.max_concurrency = max_concurrency
+        if credentials is None and client is None:
+            credentials, _ = google.auth.default(scopes=bigquery.Client.SCOPE)
+        self.credentials = credentials
+        self.client = client if client is not None else self._new_client()
+        self._idle = queue.LifoQueue()
+        self._idle.put(self.client)
+        self._created = 1
+        self._pool_lock = threading.Lock()
+        self._read_client = None
+
+    def _new_client(self):
+        return bigquery.Client(project=self.project, credentials=self.credentials)
+
+    @contextmanager
+    def connection(self):
+        try:
+            client = self._idle.get_nowait()
+        except queue.Empty:
+            with self._pool_lock:
+                grow = self._created < self.max_concurrency
+                if grow:
+                    self._created += 1
+            if grow:
+                try:
+                    client = self._new_client()
+                except Exception:
+                    # Give the slot back, or the pool shrinks for good.
+                    with self._pool_lock:
+                        self._created -= 1
+                    raise
+            else:
+                # Most recently used first, so warm connections get reused.
+                client = self._idle.get()
+        try:
+            yield client
+        finally:
+            self._idle.put(client)
+
+    def table_id(self, name):
+        return f"{self.project}.{self.dataset}.{name}"
+
+    def table(self, name):
+        return f"`{self.table_id(name)}`"
+
+    def insert_rows(self, table, rows):
+        with self.connection() as client:
+            # Event ids double as insert ids, so BigQuery drops retried rows
+            # on a best-effort basis too.
+            if all("event_id" in row for row in rows):
+                row_ids = [row["event_id"] for row in rows]
+            else:
+                row_ids = bigquery.AutoRowIDs.GENERATE_UUID
+            return client.insert_rows_json(self.table_id(table), rows, row_ids=row_ids)
+
+    def read_client(self):
+        """Shared BigQuery Storage Read API client, or None to download over REST."""
+        with self._pool_lock:
+            if self._read_client is None:
+                try:
+                    from google.cloud import bigquery_storage
+                except ImportError:
+                    logger.warning("google-cloud-bigquery-storage is not installed; downloading results over REST")
+                    self._read_client = False
+                else:
+                    self._read_client = bigquery_storage.BigQueryReadClient(credentials=self.credentials)
+            return self._read_client or None
+
+    def query_arrow(self, sql, params=None):
+        # Large results are read as Arrow record batches over parallel
+        # Storage API streams; small ones come back with the job.
+        with self.connection() as client:
+            return client.query(sql, job_config=self._job_config(params)).to_arrow(bqstorage_client=self.read_client())
+
+    def read_table(self, table, columns=None, categories=()):
+        with self.connection() as client:
+            schema = client.get_table(self.table_id(table)).schema
+            fields = [field for field in schema if columns is None or field.name in columns]
+            rows = client.list_rows(self.table_id(table), selected_fields=fields)
+            return arrow_to_frame(rows.to_arrow(bqstorage_client=self.read_client()), categories)
+
+    def execute(self, sql, params=None):
+        with self.connection() as client:
+            client.query(sql, job_config=self._job_config(params)).result()
+
+    def _job_config(self, params):
+        if not params:
+            return None
+        return bigquery.QueryJobConfig(query_parameters=[query_parameter(name, value) for name, value in params.items()])
+
+    def column_types(self, table):
+        with self.connection() as client:
+            try:
+                return {field.name: field.field_type for field in client.get_table(self.table_id(table)).schema}
+            except NotFound:
+                return None
+
+    def create_table(self, table, columns, partition_field=None, cluster_fields=()):
+        definition = bigquery.Table(self.table_id(table), schema=[bigquery.SchemaField(name, type_) for name, type_ in columns])
+        if partition_field:
+            definition.time_partitioning = bigquery.TimePartitioning(type_=bigquery.TimePartitioningType.DAY, field=partition_field)
+        if cluster_fields:
+            definition.clustering_fields = list(cluster_fields)
+        with self.connection() as client:
+            client.create_table(definition, exists_ok=True)
+
+    def load_dataframe(self, df, table, write_disposition="WRITE_TRUNCATE"):
+        with self.connection() as client:
+            job = client.load_table_from_dataframe(df, self.table_id(table), job_config=bigquery.LoadJobConfig(
+                write_disposition=write_disposition
+            ))
+            job.result()
+
+    def load_parquet(self, path, table, job_id):
+        with self.connection() as client, open(path, "rb") as f:
+            try:
+                job = client.load_table_from_file(f, self.table_id(table), job_id=job_id, location=self.location,
+                                                  job_config=bigquery.LoadJobConfig(
+                    source_format=bigquery.SourceFormat.PARQUET,
+                    write_disposition="WRITE_APPEND"
+                ))
+            except Conflict:
+                # Submitted by an earlier attempt; that only counts as loaded
+                # if it succeeded, otherwise the caller retries with a new id.
+                job = client.get_job(job_id, location=self.location)
+                if job.state == "DONE" and job.error_result:
+                    raise RuntimeError(f"Earlier load job {job_id} failed: {job.error_result}")
+            job.result()
+
+    def load_job_state(self, job_id):
+        with self.connection() as client:
+            try:
+                job = client.get_job(job_id, location=self.location)
+            except NotFound:
+                return None
+        if job.state != "DONE":
+            return "running"
+        return "failed" if job.error_result else "done"
+
+
+PARAMETER_TYPES = [
+    (bool, "BOOL"),
+    (int, "INT64"),
+    (float, "FLOAT64"),
+    (datetime.datetime, "TIMESTAMP"),
+    (datetime.date, "DATE"),
+    (str, "STRING"),
+]
+
+
+# Compact pandas dtypes for Arrow results: strings stay in Arrow memory
+# instead of one Python object per value.
+ARROW_DTYPES = {
+    pa.string(): pd.StringDtype("pyarrow"),
+    pa.large_string(): pd.StringDtype("pyarrow"),
+}
+
+
+def arrow_to_frame(table, categories=()):
+    for name in categories:
+        if name in table.column_names:
+            column = table[name]
+            if not pa.types.is_dictionary(column.type):
+                column = pc.dictionary_encode(column)
+            table = table.set_column(table.column_names.index(name), name, column)
+    return table.to_pandas(types_mapper=ARROW_DTYPES.get)
+
+
+def query_parameter(name, value):
+    def type_of(v):
+        return next((t for cls, t in PARAMETER_TYPES if isinstance(v, cls)), "STRING")
+
+    if isinstance(value, (list, tuple)):
+        return bigquery.ArrayQueryParameter(name, type_of(value[0]) if value else "STRING", list(value))
+    return bigquery.ScalarQueryParameter(name, type_of(value), value)
+
+
+# Tables whose column types cannot be inferred from the first batch of rows
+# (e.g. `price` is NULL for most event types).
+LOCAL_SCHEMAS = {
+    "events": "event_id VARCHAR, user_id VARCHAR, event_type VARCHAR, product_id VARCHAR, price DOUBLE, timestamp TIMESTAMPTZ",
+}
+
+# BigQuery-only expressions used by the dashboard, rewritten for DuckDB.
+BIGQUERY_REWRITES = [
+    (re.compile(r"TIMESTAMP\(DATETIME\(CURRENT_TIMESTAMP\(\),\s*['\"]([^'\"]+)['\"]\)\)", re.IGNORECASE),
+     r"CAST(timezone('\1', current_timestamp) AS TIMESTAMP)"),
+    (re.compile(r"CURRENT_TIMESTAMP\(\)", re.IGNORECASE), "current_timestamp"),
+    (re.compile(r"IN\s+UNNEST\((@\w+)\)", re.IGNORECASE), r"IN (SELECT UNNEST(\1))"),
+    (re.compile(r"TIMESTAMP\(PARSE_DATETIME\('[^']*',\s*(\w+)\),\s*(@\w+|'[^']*')\)", re.IGNORECASE),
+     r"timezone(\2, CAST(\1 AS TIMESTAMP))"),
+]
+
+# BigQuery column types as DuckDB types, and back.
+LOCAL_TYPES = {"STRING": "VARCHAR", "FLOAT64": "DOUBLE", "INT64": "BIGINT", "BOOL": "BOOLEAN", "TIMESTAMP": "TIMESTAMPTZ", "DATE": "DATE", "BYTES": "BLOB"}
+WAREHOUSE_TYPES = {"VARCHAR": "STRING", "DOUBLE": "FLOAT64", "BIGINT": "INT64", "BOOLEAN": "BOOL", "TIMESTAMP WITH TIME ZONE": "TIMESTAMP", "DATE": "DATE", "BLOB": "BYTES"}
+
+
+class DuckDBBackend(StorageBackend):
+    """Embedded columnar backend for running the pipeline locally."""
+
+    def __init__(self, path=BQ.LOCAL_DB_PATH, max_concurrency=BQ.WAREHOUSE_MAX_CONCURRENCY):
+        import duckdb
+
+        self.path = path
+        self.con = duckdb.connect(path)
+        # TIMESTAMPTZ values come back in UTC, as from BigQuery.
+        self.con.execute("SET GLOBAL TimeZone = 'UTC'")
+        self._lock = threading.Lock()
+        self._readers = threading.BoundedSemaphore(max_concurrency)
+        self._local = threading.local()
+        self.con.create_function("initcap", lambda s: s.title() if s is not None else None, [str], str, null_handling="special")
+        self.con.execute("CREATE MACRO IF NOT EXISTS parse_timestamp(fmt, s) AS CAST(s AS TIMESTAMP)")
+        self.con.execute("CREATE MACRO IF NOT EXISTS timestamp_sub(ts, i) AS ts - i")
+        self.con.execute("CREATE TABLE IF NOT EXISTS _load_jobs (job_id VARCHAR PRIMARY KEY, loaded_at TIMESTAMP)")
+        for name, columns in LOCAL_SCHEMAS.items():
+            self.con.execute(f"CREATE TABLE IF NOT EXISTS {self.table(name)} ({columns})")
+
+    def table(self, name):
+        return f'"{name}"'
+
+    def insert_rows(self, table, rows):
+        if not rows:
+            return []
+        df = pd.DataFrame(rows)
+        with self._lock:
+            self.con.register("_rows", df)
+            try:
+                self.con.execute(f"CREATE TABLE IF NOT EXISTS {self.table(table)} AS SELECT * FROM _rows LIMIT 0")
+                self.con.execute(f"INSERT INTO {self.table(table)} BY NAME SELECT * FROM _rows")
+            except Exception as e:
+                logger.warning(f"Error inserting into local table {table}: {e}")
+                return [{"index": i, "errors": [str(e)]} for i in range(len(rows))]
+            finally:
+                self.con.unregister("_rows")
+        return []
+
+    def query_arrow(self, sql, params=None):
+        sql, params = self._translate(sql, params)
+        # Reads run concurrently on per-thread cursors of the shared database.
+        with self._readers:
+            return self._cursor().execute(sql, params).to_arrow_table()
+
+    def read_table(self, table, columns=None, categories=()):
+        projection = ", ".join(columns) if columns else "*"
+        return self.query(f"SELECT {projection} FROM {self.table(table)}", categories=categories)
+
+    def execute(self, sql, params=None):
+        sql, params = self._translate(sql, params)
+        with self._lock:
+            self.con.execute(sql, params)
+
+    def _translate(self, sql, params):
+        for pattern, replacement in BIGQUERY_REWRITES:
+            sql = pattern.sub(replacement, sql)
+        if not params:
+            return sql, None
+        # DuckDB spells named parameters $name.
+        sql = re.sub(r"@(" + "|".join(map(re.escape, params)) + r")\b", r"$\1", sql)
+        return sql, {name: list(value) if isinstance(value, tuple) else value for name, value in params.items()}
+
+    def column_types(self, table):
+        rows = self._cursor().execute(
+            "SELECT column_name, data_type FROM information_schema.columns WHERE table_name = ? ORDER BY ordinal_position", [table]
+        ).fetchall()
+        return {name: WAREHOUSE_TYPES.get(type_, type_) for name, type_ in rows} or None
+
+    def create_table(self, table, columns, partition_field=None, cluster_fields=()):
+        # No partitioning or clustering locally; DuckDB's per-row-group
+        # min/max indexes do the pruning.
+        definition = ", ".join(f"{name} {LOCAL_TYPES.get(type_, type_)}" for name, type_ in columns)
+        with self._lock:
+            self.con.execute(f"CREATE TABLE IF NOT EXISTS {self.table(table)} ({definition})")
+
+    def _cursor(self):
+        cursor = getattr(self._local, "cursor", None)
+        if cursor is None:
+            cursor = self._local.cursor = self.con.cursor()
+        return cursor
+
+    def load_dataframe(self, df, table, write_disposition="WRITE_TRUNCATE"):
+        # Registered as Arrow so pyarrow-backed columns are not copied.
+        data = pa.Table.from_pandas(df, preserve_index=False)
+        with self._lock:
+            self.con.register("_df", data)
+            try:
+                if write_disposition == "WRITE_TRUNCATE":
+                    self.con.execute(f"CREATE OR REPLACE TABLE {self.table(table)} AS SELECT * FROM _df")
+                else:
+                    self.con.execute(f"CREATE TABLE IF NOT EXISTS {self.table(table)} AS SELECT * FROM _df LIMIT 0")
+                    self.con.execute(f"INSERT INTO {self.table(table)} BY NAME SELECT * FROM _df")
+            finally:
+                self.con.unregister("_df")
+
+    def load_parquet(self, path, table, job_id):
+        with self._lock:
+            if self.con.execute("SELECT 1 FROM _load_jobs WHERE job_id = ?", [job_id]).fetchone():
+                return
+            # The job id is recorded in the same transaction as the rows.
+            self.con.execute("BEGIN TRANSACTION")
+            try:
+                self.con.execute(f"CREATE TABLE IF NOT EXISTS {self.table(table)} AS SELECT * FROM read_parquet(?) LIMIT 0", [path])
+                self.con.execute(f"INSERT INTO {self.table(table)} BY NAME SELECT * FROM read_parquet(?)", [path])
+                self.con.execute("INSERT INTO _load_jobs VALUES (?, current_timestamp)", [job_id])
+                self.con.execute("COMMIT")
+            except Exception:
+                self.con.execute("ROLLBACK")
+                raise
+
+    def load_job_state(self, job_id):
+        # Local loads are synchronous and transactional: a job either
+        # committed or left nothing behind.
+        with self._lock:
+            done = self.con.execute("SELECT 1 FROM _load_jobs WHERE job_id = ?", [job_id]).fetchone()
+        return "done" if done else None
+
+
+BACKENDS = {
+    "bigquery": BigQueryBackend,
+    "duckdb": DuckDBBackend,
+}
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    """Returns the process-wide backend selected by `Connection.STORAGE_BACKEND`."""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            if BQ.STORAGE_BACKEND not in BACKENDS:
+                raise ValueError(f"Unknown storage backend {BQ.STORAGE_BACKEND!r}, expected one of {sorted(BACKENDS)}")
+            logger.info(f"Using {BQ.STORAGE_BACKEND} storage backend")
+            _backend = BACKENDS[BQ.STORAGE_BACKEND]()
+        return _backend
@@ -0,0 +1,227 @@
+import argparse
+import pandas as pd
+from statements import logger
+from sketches import distinct_count_sql
+
+
+SUMMARY_TABLES = ["summary_kpis", "summary_category_revenue", "summary_order_status", "summary_daily_orders"]
+
+# Products already counted by total_products_sold. Products recur across
+# orders, so they are checked against this set, which is bounded by the
+# catalog; orders and customers are new by construction (see fold()).
+KEYS_TABLE = "summary_keys"
+STAGING_TABLE = "summary_staging"
+
+KEY_COLUMNS = {
+    "product": ("order_items", "product_id"),
+}
+
+
+def as_naive_timestamps(values):
+    """Dates or timestamps as tz-naive (UTC) pandas timestamps, for comparison."""
+    values = pd.to_datetime(values)
+    if getattr(values.dt, "tz", None) is not None:
+        values = values.dt.tz_convert("UTC").dt.tz_localize(None)
+    return values
+
+
+class OrderSummaries:
+    """Small pre-aggregated tables behind the Overview and Order Summary views.
+
+    `rebuild()` computes them from the full source tables once. After that,
+    `fold()` adds only orders newer than the high-water mark, the latest
+    OrderDate already summarised (`orders_through` in `summary_kpis`),
+    together with their items and customers. Orders must therefore be loaded
+    in OrderDate order, each order with its items and customer; anything
+    else needs a `rebuild()`. Sums and counts are added to the stored totals,
+    and products are checked against `summary_keys`. Folds are not
+    transactional and should run from a single loader; `rebuild()` restores
+    consistency after a failed one. In "approx" distinct count mode the
+    rebuilt distinct KPIs are HyperLogLog estimates, which folds then add
+    exact counts of new keys to.
+    """
+
+    def __init__(self, backend, orders_table="ClusteredOrders"):
+        self.backend = backend
+        self.orders_table = orders_table
+
+    def exists(self):
+        # Errors other than a missing table propagate instead of triggering
+        # a full rebuild; summaries without a high-water mark are rebuilt.
+        types = self.backend.column_types("summary_kpis")
+        return types is not None and "orders_through" in types
+
+    def ensure_built(self):
+        if not self.exists():
+            self.rebuild()
+
+    def rebuild(self):
+        logger.info("Rebuilding order summary tables from source tables...")
+        t = self.backend.table
+        kpis = self.backend.query(f"""
+            SELECT {distinct_count_sql("order_id")} AS total_orders,
+                SUM(price + freight_value) AS total_revenue,
+                (SELECT {distinct_count_sql("customer_id")} FROM {t("customers")}) AS active_customers,
+                {distinct_count_sql("product_id")} AS total_products_sold,
+                COUNT(price + freight_value) AS item_count
+            FROM {t("order_items")}
+        """)
+        category_revenue = self.backend.query(f"""
+            SELECT p.product_category_name AS ProductCategoryName, SUM(oi.price) AS Revenue
+            FROM {t("order_items")} oi
+            INNER JOIN {t("products")} p ON oi.product_id = p.product_id
+            GROUP BY p.product_category_name
+        """)
+        order_status = self.backend.query(f"SELECT OrderStatus, COUNT(*) AS Count FROM {t(self.orders_table)} GROUP BY OrderStatus")
+        daily_orders = self.backend.query(f"SELECT OrderDate, COUNT(*) AS Orders FROM {t(self.orders_table)} GROUP BY OrderDate")
+        orders_through = self.backend.query(f"SELECT MAX(OrderDate) AS orders_through FROM {t(self.orders_table)}")
+        keys = pd.concat([
+            self.backend.query(f"SELECT DISTINCT '{kind}' AS kind, {column} AS key FROM {t(table)} WHERE {column} IS NOT NULL")
+            for kind, (table, column) in KEY_COLUMNS.items()
+        ], ignore_index=True)
+
+        self.backend.load_dataframe(keys, KEYS_TABLE)
+        self._write({
+            "summary_kpis": self._kpi_frame({**kpis.iloc[0], **orders_through.iloc[0]}),
+            "summary_category_revenue": category_revenue,
+            "summary_order_status": order_status,
+            "summary_daily_orders": self._daily_orders(daily_orders),
+        })
+
+    def fold(self, orders, order_items=None, customers=None):
+        """Adds orders newer than the high-water mark, with their items and
+        customers, to the summaries; returns the tables changed."""
+        new, order_items, customers = self.new_orders(orders, order_items, customers)
+        if new.empty:
+            return []
+        kpis = self._read("summary_kpis").iloc[0].to_dict()
+        updates = {}
+        products_added = None
+
+        if order_items is not None and len(order_items):
+            products_added = self._new_keys("product", order_items["product_id"])
+            amounts = order_items["price"] + order_items["freight_value"]
+            kpis["total_orders"] += order_items["order_id"].nunique()
+            kpis["total_products_sold"] += len(products_added)
+            kpis["total_revenue"] += amounts.sum()
+            kpis["item_count"] += amounts.notna().sum()
+            updates["summary_category_revenue"] = self._add(
+                "summary_category_revenue", self._category_revenue(order_items), "ProductCategoryName", "Revenue"
+            )
+        if customers is not None and len(customers):
+            kpis["active_customers"] += customers["customer_id"].nunique()
+
+        status = new.groupby("OrderStatus", dropna=False).size().rename("Count").reset_index()
+        daily = new.groupby("OrderDate", dropna=False).size().rename("Orders").reset_index()
+        updates["summary_order_status"] = self._add("summary_order_status", status, "OrderStatus", "Count")
+        updates["summary_daily_orders"] = self._daily_orders(pd.concat([self._read("summary_daily_orders"), daily], ignore_index=True))
+        kpis["orders_through"] = as_naive_timestamps(new["OrderDate"]).max()
+        updates["summary_kpis"] = self._kpi_frame(kpis)
+        self._write(updates)
+        if products_added is not None and len(products_added):
+            self.backend.load_dataframe(products_added, KEYS_TABLE, write_disposition="WRITE_APPEND")
+        logger.info(f"Folded {len(new)} new orders into {sorted(updates)}")
+        return sorted(updates)
+
+    def append(self, orders, order_items=None, customers=None):
+        """Appends orders newer than the high-water mark, with their items and
+        customers, to the source tables and folds them into the summaries."""
+        orders, order_items, customers = self.new_orders(orders, order_items, customers)
+        for df, table in [(orders, self.orders_table), (order_items, "order_items"), (customers, "customers")]:
+            if df is not None and len(df):
+                self.backend.load_dataframe(df, table, write_disposition="WRITE_APPEND")
+        return self.fold(orders, order_items, customers)
+
+    def new_orders(self, orders, order_items=None, customers=None):
+        """The orders after the high-water mark, and their items and customers."""
+        self.ensure_built()
+        if orders is None:
+            orders = pd.DataFrame(columns=["OrderId", "CustomerId", "OrderStatus", "OrderDate"])
+        mark = as_naive_timestamps(self.backend.query(
+            f"SELECT orders_through FROM {self.backend.table('summary_kpis')}"
+        )["orders_through"]).iloc[0]
+        new = orders[as_naive_timestamps(orders["OrderDate"]) > mark] if pd.notna(mark) else orders
+        if len(new) < len(orders):
+            logger.info(f"Skipped {len(orders) - len(new)} orders already summarised through {mark}")
+        if order_items is not None:
+            order_items = order_items[order_items["order_id"].astype(str).isin(new["OrderId"].astype(str))]
+        if customers is not None:
+            customers = customers[customers["customer_id"].astype(str).isin(new["CustomerId"].astype(str))]
+        return new, order_items, customers
+
+    def _read(self, table):
+        return self.backend.query(f"SELECT * FROM {self.backend.table(table)}")
+
+    def _write(self, frames):
+        for table, df in frames.items():
+            self.backend.load_dataframe(df, table, write_disposition="WRITE_TRUNCATE")
+
+    def _kpi_frame(self, kpis):
+        return pd.DataFrame([{
+            "total_orders": int(kpis["total_orders"]),
+            "total_revenue": float(kpis["total_revenue"]) if pd.notna(kpis["total_revenue"]) else 0.0,
+            "active_customers": int(kpis["active_customers"]),
+            "total_products_sold": int(kpis["total_products_sold"]),
+            "item_count": int(kpis["item_count"]),
+            "orders_through": as_naive_timestamps(pd.Series([kpis["orders_through"]])).iloc[0],
+        }])
+
+    def _daily_orders(self, daily):
+        # OrderDate may be a timestamp; days are summed again once truncated.
+        daily = daily.assign(OrderDate=pd.to_datetime(daily["OrderDate"]).dt.date)
+        return daily.groupby("OrderDate", dropna=False)["Orders"].sum().reset_index()
+
+    def _add(self, table, delta, key, value):
+        current = self._read(table)
+        return pd.concat([current, delta], ignore_index=True).groupby(key, dropna=False)[value].sum().reset_index()
+
+    def _new_keys(self, kind, values):
+        staged = pd.DataFrame({"kind": kind, "key": values.dropna().astype(str).unique()})
+        if staged.empty:
+            return staged
+        self.backend.load_dataframe(staged, STAGING_TABLE)
+        return self.backend.query(f"""
+            SELECT s.kind, s.key
+            FROM {self.backend.table(STAGING_TABLE)} s
+            LEFT JOIN {self.backend.table(KEYS_TABLE)} k ON k.kind = s.kind AND k.key = s.key
+            WHERE k.key IS NULL
+        """)
+
+    def _category_revenue(self, order_items):
+        # Same INNER JOIN as the full aggregate, against the products table.
+        product_ids = pd.DataFrame({"product_id": order_items["product_id"].dropna().astype(str).unique()})
+        self.backend.load_dataframe(product_ids, STAGING_TABLE)
+        categories = self.backend.query(f"""
+            SELECT p.product_id, p.product_category_name AS ProductCategoryName
+            FROM {self.backend.table("products")} p
+            INNER JOIN {self.backend.table(STAGING_TABLE)} s ON s.product_id = p.product_id
+        """)
+        joined = order_items.merge(categories, on="product_id")
+        return joined.groupby("ProductCategoryName", dropna=False)["price"].sum().rename("Revenue").reset_index()
+
+
+def main():
+    from storage import get_backend
+    from querycache import QueryCache
+
+    parser = argparse.ArgumentParser(description="Build or update the dashboard order summary tables")
+    parser.add_argument("command", choices=["rebuild", "append"])
+    parser.add_argument("--orders", help="CSV of new ClusteredOrders rows")
+    parser.add_argument("--order-items", help="CSV of the new orders' order_items rows")
+    parser.add_argument("--customers", help="CSV of the new orders' customers rows")
+    args = parser.parse_args()
+
+    summaries = OrderSummaries(get_backend())
+    if args.command == "rebuild":
+        summaries.rebuild()
+        changed = SUMMARY_TABLES
+    else:
+        changed = summaries.append(*(pd.read_csv(path) if path else None for path in (args.orders, args.order_items, args.customers)))
+    # Dashboards sharing the query cache directory pick up the new totals.
+    cache = QueryCache()
+    for table in changed:
+        cache.invalidate(table)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+import threading
+from collections import Counter, deque
+import pandas as pd
+from hll import HyperLogLog
+
+
+def utc_now():
+    return pd.Timestamp.now(tz="UTC")
+
+
+class WindowBucket:
+    """Totals of one tumbling window."""
+
+    __slots__ = ("index", "events", "revenue", "type_counts", "users", "sketch")
+
+    def __init__(self, index, sketch=None):
+        self.index = index
+        self.events = 0
+        self.revenue = 0.0
+        self.type_counts = Counter()
+        # Users whose latest event in the sliding window is in this bucket
+        self.users = set()
+        # Distinct users of the bucket, when counting approximately
+        self.sketch = sketch
+
+
+class WindowedAggregates:
+    """Live KPIs kept up to date event by event.
+
+    Events are added once, as they arrive, to the `bucket`-wide tumbling
+    window holding their timestamp. The sliding `window` is the last
+    window // bucket tumbling windows: running totals are kept for it and a
+    bucket's totals are subtracted when it slides out, so each event costs
+    O(1) and the state is bounded by the number of buckets plus the distinct
+    users in the window. Events older than the window are only counted in
+    `late_dropped`.
+
+    With `distinct_counts="approx"` each bucket keeps a HyperLogLog sketch
+    of its users instead, and the window's count merges them, so state no
+    longer grows with the number of users.
+    """
+
+    def __init__(self, window=pd.Timedelta(minutes=10), bucket=pd.Timedelta(seconds=10), now=utc_now,
+                 distinct_counts="exact", precision=14):
+        self.bucket = bucket
+        self.bucket_micros = bucket // pd.Timedelta(microseconds=1)
+        self.size = max(1, window // bucket)
+        self.now = now
+        self.approximate = distinct_counts == "approx"
+        self.precision = precision
+        self.late_dropped = 0
+        self._buckets = deque()  # consecutive tumbling windows, oldest first
+        self._events = 0
+        self._type_counts = Counter()
+        self._last_seen = {}  # user -> index of the bucket holding their latest event
+        self._lock = threading.Lock()
+
+    def add(self, event_type, user_id, price, timestamp):
+        with self._lock:
+            bucket = self._add(event_type, user_id, price, self._index(pd.Timestamp(timestamp)))
+            if bucket is not None and self.approximate:
+                bucket.sketch.add([user_id])
+
+    def add_frame(self, df):
+        """Adds live window rows (EventType, UserId, Price, timestamp)."""
+        indexes = df["timestamp"].dt.as_unit("us").astype("int64") // self.bucket_micros
+        with self._lock:
+            for event_type, user_id, price, index in zip(df["EventType"], df["UserId"], df["Price"], indexes):
+                self._add(event_type, user_id, price, index)
+            if self.approximate:
+                # Sketches hash a bucket's users in one pass.
+                for index, users in df["UserId"].groupby(indexes.to_numpy()):
+                    bucket = self._bucket(index)
+                    if bucket is not None:
+                        bucket.sketch.add(users)
+
+    def snapshot(self):
+        """Totals for the sliding window ending now, with its tumbling windows."""
+        with self._lock:
+            self._advance(self._index(self.now()))
+            buckets = list(self._buckets)
+            return {
+                "events": self._events,
+                "unique_users": self._unique_users(buckets),
+                "revenue": sum(b.revenue for b in buckets),
+                "type_counts": {t: n for t, n in self._type_counts.items() if n},
+                "buckets": pd.DataFrame({
+                    "start": pd.to_datetime([b.index * self.bucket_micros for b in buckets], unit="us", utc=True),
+                    "events": [b.events for b in buckets],
+                    "revenue": [b.revenue for b in buckets],
+                }),
+                "late_dropped": self.late_dropped,
+            }
+
+    def _index(self, timestamp):
+        return timestamp.value // 1000 // self.bucket_micros
+
+    def _bucket(self, index):
+        offset = index - self._buckets[0].index
+        return self._buckets[offset] if 0 <= offset < len(self._buckets) else None
+
+    def _unique_users(self, buckets):
+        if self.approximate:
+            return HyperLogLog.union((b.sketch for b in buckets), self.precision).count()
+        return len(self._last_seen)
+
+    def _add(self, event_type, user_id, price, index):
+        self._advance(index)
+        bucket = self._bucket(index)
+        if bucket is None:
+            self.late_dropped += 1
+            return None
+        bucket.events += 1
+        bucket.type_counts[event_type] += 1
+        self._events += 1
+        self._type_counts[event_type] += 1
+        if pd.notna(price):
+            bucket.revenue += price
+        if not self.approximate and pd.notna(user_id):
+            seen = self._last_seen.get(user_id)
+            if seen is None or seen < index:
+                if seen is not None:
+                    self._bucket(seen).users.discard(user_id)
+                bucket.users.add(user_id)
+                self._last_seen[user_id] = index
+        return bucket
+
+    def _advance(self, index):
+        # Opens buckets up to `index` and slides out the ones that fall off.
+        if not self._buckets or index - self._buckets[-1].index >= self.size:
+            self._reset(index - self.size + 1)
+        while self._buckets[-1].index < index:
+            self._buckets.append(self._new_bucket(self._buckets[-1].index + 1))
+        while len(self._buckets) > self.size:
+            self._expire(self._buckets.popleft())
+
+    def _reset(self, index):
+        self._buckets.clear()
+        self._buckets.append(self._new_bucket(index))
+        self._events = 0
+        self._type_counts.clear()
+        self._last_seen.clear()
+
+    def _new_bucket(self, index):
+        return WindowBucket(index, HyperLogLog(self.precision) if self.approximate else None)
+
+    def _expire(self, bucket):
+        self._events -= bucket.events
+        self._type_counts.subtract(bucket.type_counts)
+        for user_id in bucket.users:
+            del self._last_seen[user_id]
@@ -0,0 +1,113 @@
+import json
+import threading
+import time
+from statements import logger
+from storage import get_backend
+
+
+class BatchedEventWriter:
+    """Buffers events and sends them to the storage backend as multi-row inserts.
+
+    A batch is sent once it holds `max_rows` rows, `max_bytes` of JSON payload,
+    or its oldest row has waited `max_linger` seconds. Call `close()` on
+    shutdown so the last partial batch is not lost. Rows the backend rejects
+    are appended to `spool`, if given, for a `SpoolDrainer` to replay.
+    """
+
+    def __init__(self, table="events", backend=None, max_rows=500, max_bytes=5_000_000, max_linger=1.0, spool=None):
+        self.table = table
+        self.backend = backend if backend is not None else get_backend()
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.max_linger = max_linger
+        self.spool = spool
+
+        self.rows_sent = 0
+        self.rows_failed = 0
+        self.batches_sent = 0
+
+        self._rows = []
+        self._bytes = 0
+        self._oldest = None
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self._linger_thread = threading.Thread(target=self._linger_loop, name="event-writer-linger", daemon=True)
+        self._linger_thread.start()
+
+    def write(self, event):
+        self.write_many([event])
+
+    def write_many(self, events):
+        if self._closed.is_set():
+            raise RuntimeError("BatchedEventWriter is closed")
+
+        ready = []
+        with self._lock:
+            for event in events:
+                size = len(json.dumps(event, default=str)) + 1
+                if self._rows and self._bytes + size > self.max_bytes:
+                    ready.append(self._take())
+                if not self._rows:
+                    self._oldest = time.monotonic()
+                self._rows.append(event)
+                self._bytes += size
+                if len(self._rows) >= self.max_rows:
+                    ready.append(self._take())
+
+        # Send outside the lock so other producers keep buffering meanwhile.
+        for batch in ready:
+            self._send(batch)
+
+    def flush(self):
+        with self._lock:
+            batch = self._take()
+        return self._send(batch) if batch else []
+
+    def close(self):
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        self._linger_thread.join()
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _take(self):
+        batch = self._rows
+        self._rows = []
+        self._bytes = 0
+        self._oldest = None
+        return batch
+
+    def _send(self, rows):
+        try:
+            errors = self.backend.insert_rows(self.table, rows)
+        except Exception as e:
+            logger.warning(f"Error inserting {len(rows)} events: {e}")
+            errors = [{"index": i, "errors": [str(e)]} for i in range(len(rows))]
+
+        failed = len({err["index"] for err in errors})
+        self.rows_failed += failed
+        self.rows_sent += len(rows) - failed
+        self.batches_sent += 1
+        if errors:
+            logger.warning(f"Error inserting events: {errors}")
+            if self.spool is not None:
+                failed_rows = [rows[i] for i in sorted({err["index"] for err in errors})]
+                self.spool.append_many(failed_rows)
+                logger.info(f"Spooled {len(failed_rows)} failed events for replay")
+        else:
+            logger.info(f"Inserted {len(rows)} events into {self.table}")
+        return errors
+
+    def _linger_loop(self):
+        while not self._closed.wait(self.max_linger / 4):
+            with self._lock:
+                expired = self._oldest is not None and time.monotonic() - self._oldest >= self.max_linger
+                batch = self._take() if expired else None
+            if batch:
+                self._send(batch)
@@ -0,0 +1,87 @@
+import json
+import os
+import time
+from bulkload import ParquetEventSink
+from generator import EventBatchGenerator
+from schema import EVENTS_COLUMNS
+from storage import DuckDBBackend
+
+
+class FlakyBackend(DuckDBBackend):
+    """Fails the first `failures` Parquet loads."""
+
+    def __init__(self, failures=0):
+        super().__init__(":memory:")
+        self.create_table("events", EVENTS_COLUMNS)
+        self.failures = failures
+        self.job_ids = []
+
+    def load_parquet(self, path, table, job_id):
+        self.job_ids.append(job_id)
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("warehouse unavailable")
+        super().load_parquet(path, table, job_id)
+
+
+def count(backend):
+    return backend.query("SELECT COUNT(*) AS n FROM events").iloc[0]["n"]
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def rows(n, seed=0):
+    return EventBatchGenerator(seed=seed).generate(n).to_rows()
+
+
+def test_flushed_file_is_loaded_once(tmp_path):
+    backend = FlakyBackend()
+    with ParquetEventSink(str(tmp_path), backend=backend, keep_loaded=True) as sink:
+        sink.write_many(rows(100))
+        sink.flush()
+    assert count(backend) == 100
+    assert sink.files_loaded == 1
+
+    # Restarting over the loaded file must not submit it again.
+    with ParquetEventSink(str(tmp_path), backend=backend, keep_loaded=True):
+        pass
+    assert count(backend) == 100
+    assert len(backend.job_ids) == 1
+
+
+def test_loaded_files_are_removed_with_their_ledger_entry(tmp_path):
+    backend = FlakyBackend()
+    with ParquetEventSink(str(tmp_path), backend=backend) as sink:
+        sink.write_many(rows(50))
+    assert count(backend) == 50
+    assert [name for name in os.listdir(tmp_path) if name.endswith(".parquet")] == []
+    with open(tmp_path / "loads.json") as f:
+        assert json.load(f) == {}
+
+
+def test_failed_load_is_retried_without_a_restart(tmp_path):
+    backend = FlakyBackend(failures=2)
+    with ParquetEventSink(str(tmp_path), backend=backend, retry_delay=0.05) as sink:
+        sink.write_many(rows(100))
+        sink.flush()
+        assert wait_for(lambda: sink.files_loaded == 1)
+    assert count(backend) == 100
+    assert (sink.files_failed, len(backend.job_ids)) == (2, 3)
+
+
+def test_file_still_failing_at_close_is_loaded_on_restart(tmp_path):
+    backend = FlakyBackend(failures=1)
+    with ParquetEventSink(str(tmp_path), backend=backend, retry_delay=60) as sink:
+        sink.write_many(rows(100))
+    assert count(backend) == 0
+    with open(tmp_path / "loads.json") as f:
+        assert [entry["state"] for entry in json.load(f).values()] == ["failed"]
+
+    with ParquetEventSink(str(tmp_path), backend=backend) as sink:
+        assert wait_for(lambda: sink.files_loaded == 1)
+    assert count(backend) == 100
@@ -0,0 +1,68 @@
+from dedup import EventDeduplicator
+
+
+def ids(rows):
+    return [row["event_id"] for row in rows]
+
+
+def make_rows(*keys):
+    return [{"event_id": key} for key in keys]
+
+
+def test_drops_duplicates_within_batch():
+    dedup = EventDeduplicator(capacity=1_000)
+    assert ids(dedup.filter(make_rows("a", "b", "a", "c", "b"))) == ["a", "b", "c"]
+    assert dedup.exact_duplicates == 2
+
+
+def test_drops_duplicates_across_batches():
+    dedup = EventDeduplicator(capacity=1_000)
+    dedup.filter(make_rows("a", "b"))
+    assert ids(dedup.filter(make_rows("b", "c", "a"))) == ["c"]
+    assert dedup.stats()["passed"] == 3
+    assert dedup.duplicates_dropped == 2
+
+
+def test_bloom_filter_catches_keys_evicted_from_lru():
+    dedup = EventDeduplicator(capacity=1_000, lru_size=2)
+    dedup.filter(make_rows(*[f"k{i}" for i in range(100)]))
+    assert dedup.filter(make_rows("k0", "k1", "new")) == make_rows("new")
+    assert dedup.filter_duplicates == 2
+
+
+def test_rotation_forgets_oldest_generation():
+    dedup = EventDeduplicator(capacity=10, generations=2, lru_size=1)
+    dedup.filter(make_rows(*[f"a{i}" for i in range(10)]))
+    # The full filter rotates out to the older generation and still counts.
+    assert dedup.filter(make_rows("a0")) == []
+    dedup.filter(make_rows(*[f"b{i}" for i in range(10)]))
+    # Rotating again drops the generation holding the a* keys.
+    assert dedup.filter(make_rows("a0")) == make_rows("a0")
+
+
+def test_delivery_wrapper_remembers_only_accepted_rows():
+    dedup = EventDeduplicator(capacity=1_000)
+    sent = []
+
+    def send(rows):
+        sent.append(ids(rows))
+        return [{"index": i, "errors": ["rejected"]} for i, row in enumerate(rows) if row["event_id"] == "bad"]
+
+    deliver = dedup.wrap_delivery(send)
+    assert deliver(make_rows("a", "bad", "a", "b")) == [{"index": 1, "errors": ["rejected"]}]
+    # A replay only resends the row that failed.
+    assert deliver(make_rows("a", "bad", "b")) == [{"index": 1, "errors": ["rejected"]}]
+    assert sent == [["a", "bad", "b"], ["bad"]]
+
+
+def test_delivery_wrapper_forgets_batch_when_send_raises():
+    dedup = EventDeduplicator(capacity=1_000)
+
+    def unreachable(rows):
+        raise ConnectionError("warehouse down")
+
+    try:
+        dedup.wrap_delivery(unreachable)(make_rows("a"))
+    except ConnectionError:
+        pass
+    assert dedup.filter(make_rows("a")) == make_rows("a")
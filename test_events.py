@@ -0,0 +1,58 @@
+from datetime import datetime
+import pytest
+from events import Event, EventBatch, EventType, iso_to_micros, micros_to_iso
+from generator import EventBatchGenerator
+
+
+@pytest.fixture
+def rows():
+    return EventBatchGenerator(seed=0).generate(500).to_rows()
+
+
+def test_rows_round_trip_through_a_batch(rows):
+    batch = EventBatch.from_rows(rows)
+    assert len(batch) == len(rows)
+    assert batch.to_rows() == rows
+
+
+def test_batch_items_match_single_events(rows):
+    batch = EventBatch.from_rows(rows)
+    for i, row in enumerate(rows):
+        event = Event.from_row(row)
+        assert event == batch[i]
+        assert event.to_row() == row
+
+
+def test_nulls_survive_the_round_trip(rows):
+    batch = EventBatch.from_rows(rows)
+    assert any(row["product_id"] is None for row in rows) and any(row["price"] is None for row in rows)
+    assert batch.has_product.tolist() == [row["product_id"] is not None for row in rows]
+    assert batch.has_price.tolist() == [row["price"] is not None for row in rows]
+
+
+def test_arrow_table_matches_rows(rows):
+    table = EventBatch.from_rows(rows).to_arrow()
+    assert table.num_rows == len(rows)
+    assert table.column("event_type").to_pylist() == [row["event_type"] for row in rows]
+    assert table.column("price").to_pylist() == [row["price"] for row in rows]
+    assert [raw and raw.hex() for raw in table.column("product_id").to_pylist()] == \
+        [row["product_id"] and row["product_id"].replace("-", "") for row in rows]
+    timestamps = table.column("timestamp").to_pylist()
+    assert [iso_to_micros(row["timestamp"]) for row in rows] == \
+        [int(ts.timestamp()) * 1_000_000 + ts.microsecond for ts in timestamps]
+
+
+def test_timestamps_convert_both_ways():
+    micros = 1_735_689_600_123_456
+    assert micros_to_iso(micros) == "2025-01-01T00:00:00.123456Z"
+    assert iso_to_micros(micros_to_iso(micros)) == micros
+    # Naive timestamps from before the TIMESTAMP column are local time.
+    naive = "2025-01-01T00:00:00.123456"
+    assert iso_to_micros(naive) == int(datetime(2025, 1, 1).timestamp()) * 1_000_000 + 123_456
+
+
+def test_event_type_codes_are_validated():
+    row = EventBatchGenerator(seed=0).generate(1).to_rows()[0]
+    assert Event.from_row({**row, "event_type": "purchase"}).event_type is EventType.PURCHASE
+    with pytest.raises(ValueError):
+        Event.from_row({**row, "event_type": "teleport"})
@@ -0,0 +1,67 @@
+import pandas as pd
+import pytest
+from events import DISPLAY_NAMES
+from filters import EventFilter
+from generator import EventBatchGenerator
+from schema import EVENTS_COLUMNS
+from storage import DuckDBBackend
+
+
+@pytest.fixture(scope="module")
+def rows():
+    return EventBatchGenerator(seed=0, user_range=(0, 50)).generate(2_000).to_rows()
+
+
+@pytest.fixture(scope="module")
+def backend(rows):
+    backend = DuckDBBackend(":memory:")
+    backend.create_table("events", EVENTS_COLUMNS)
+    backend.insert_rows("events", rows)
+    return backend
+
+
+@pytest.fixture
+def dashboard_rows(rows):
+    df = pd.DataFrame(rows).rename(columns={"event_id": "EventId", "user_id": "UserId", "product_id": "ProductId",
+                                            "event_type": "EventType"})
+    df["EventType"] = df["EventType"].map(DISPLAY_NAMES)
+    return df
+
+
+def filters(rows):
+    product_id = next(row["product_id"] for row in rows if row["event_type"] == "view_product")
+    return [
+        EventFilter(["purchase", "add_to_cart"]),
+        EventFilter(user_id=rows[0]["user_id"]),
+        EventFilter(event_id=rows[1]["event_id"][:5]),
+        EventFilter(product_id=f"  {product_id[:3].upper()} "),
+        EventFilter(["view_product"], product_id=product_id),
+        EventFilter(["login"], user_id=next(row["user_id"] for row in rows if row["event_type"] == "login")[:2]),
+    ]
+
+
+def test_sql_and_apply_select_the_same_events(rows, backend, dashboard_rows):
+    for event_filter in filters(rows):
+        where, params = event_filter.sql()
+        matched = backend.query(f"SELECT event_id FROM events WHERE {where}", params)["event_id"]
+        applied = event_filter.apply(dashboard_rows)["EventId"]
+        assert len(applied) > 0
+        assert sorted(matched) == sorted(applied)
+
+
+def test_empty_filter_keeps_everything(dashboard_rows):
+    event_filter = EventFilter(user_id="  ", product_id="")
+    assert not event_filter
+    assert event_filter.sql() == (None, {})
+    assert len(event_filter.apply(dashboard_rows)) == len(dashboard_rows)
+
+
+def test_full_ids_match_exactly_and_partial_ids_as_prefixes():
+    user_id = "0f8e3a4c-1b2d-4e5f-8a9b-0c1d2e3f4a5b"
+    assert EventFilter(user_id=user_id.upper()).sql() == ("user_id = @user_id", {"user_id": user_id})
+    assert EventFilter(user_id="0f8e").sql() == ("STARTS_WITH(user_id, @user_id)", {"user_id": "0f8e"})
+
+
+def test_rejects_unknown_columns():
+    with pytest.raises(ValueError):
+        EventFilter(price="10")
@@ -0,0 +1,54 @@
+import time
+import uuid
+import numpy as np
+import pytest
+from events import EVENT_TYPES
+from generator import EventBatchGenerator, PRICED_EVENT_TYPES, NO_PRODUCT_EVENT_TYPES, user_uuids
+
+
+def test_timestamps_never_run_ahead_of_the_clock():
+    generator = EventBatchGenerator(seed=0)
+    previous = 0
+    for _ in range(20):
+        ts = generator.generate(100_000).timestamp
+        now = time.time_ns() // 1000
+        assert ts[-1] <= now
+        assert ts[0] >= previous and (np.diff(ts) >= 0).all()
+        previous = ts[-1]
+
+
+def test_seed_reproduces_everything_but_timestamps():
+    first = EventBatchGenerator(seed=42).generate(1_000)
+    second = EventBatchGenerator(seed=42).generate(1_000)
+    for column in ("event_id", "user_id", "event_type", "product_id", "price"):
+        assert np.array_equal(getattr(first, column), getattr(second, column))
+
+
+def test_fields_follow_event_type():
+    rows = EventBatchGenerator(seed=1).generate(5_000).to_rows()
+    for row in rows:
+        assert (row["price"] is not None) == (row["event_type"] in PRICED_EVENT_TYPES)
+        assert (row["product_id"] is None) == (row["event_type"] in NO_PRODUCT_EVENT_TYPES)
+        if row["price"] is not None:
+            assert 5.0 <= row["price"] <= 500.0
+        assert uuid.UUID(row["event_id"]).version == 4
+
+
+def test_weights_pick_event_types():
+    batch = EventBatchGenerator(weights={"purchase": 3, "login": 1}, seed=2).generate(40_000)
+    counts = np.bincount(batch.event_type, minlength=len(EVENT_TYPES))
+    assert set(np.flatnonzero(counts)) == {EVENT_TYPES.index("purchase"), EVENT_TYPES.index("login")}
+    assert counts[EVENT_TYPES.index("purchase")] / len(batch) == pytest.approx(0.75, abs=0.01)
+
+
+def test_rejects_bad_weights():
+    with pytest.raises(ValueError):
+        EventBatchGenerator(weights={"teleport": 1})
+    with pytest.raises(ValueError):
+        EventBatchGenerator(weights=[0] * len(EVENT_TYPES))
+
+
+def test_user_range_draws_stable_user_ids():
+    batch = EventBatchGenerator(seed=3, user_range=(100, 110)).generate(2_000)
+    expected = {bytes(raw) for raw in user_uuids(np.arange(100, 110))}
+    assert {bytes(raw) for raw in batch.user_id} == expected
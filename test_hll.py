@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+import pytest
+from hll import HyperLogLog, approx_nunique
+
+
+@pytest.mark.parametrize("n", [1_000, 50_000, 300_000])
+def test_count_within_error_bound(n):
+    sketch = HyperLogLog(14).add([f"user-{i}" for i in range(n)])
+    # Four standard errors; the hashes are deterministic, so this never flakes.
+    assert abs(sketch.count() - n) <= 4 * sketch.standard_error * n
+
+
+def test_small_counts_are_nearly_exact():
+    assert approx_nunique(pd.Series(["a", "b", "c", "a", None] * 20)) == 3
+
+
+def test_numeric_values_count_like_their_strings():
+    numbers = HyperLogLog(12).add(np.arange(5_000))
+    strings = HyperLogLog(12).add([str(i) for i in range(5_000)])
+    assert np.array_equal(numbers.registers, strings.registers)
+
+
+def test_merge_equals_sketch_of_union():
+    left = HyperLogLog(12).add([f"k{i}" for i in range(0, 30_000)])
+    right = HyperLogLog(12).add([f"k{i}" for i in range(20_000, 50_000)])
+    both = HyperLogLog(12).add([f"k{i}" for i in range(50_000)])
+    merged = HyperLogLog.union([left, right], precision=12)
+    assert np.array_equal(merged.registers, both.registers)
+    assert abs(merged.count() - 50_000) <= 4 * merged.standard_error * 50_000
+
+
+def test_bytes_round_trip():
+    sketch = HyperLogLog(10).add(range(1_000))
+    restored = HyperLogLog.from_bytes(sketch.to_bytes())
+    assert restored.precision == 10
+    assert restored.count() == sketch.count()
+
+
+def test_merge_rejects_other_precision():
+    with pytest.raises(ValueError):
+        HyperLogLog(12).merge(HyperLogLog(14))
@@ -0,0 +1,52 @@
+import asyncio
+import itertools
+import threading
+import time
+from ingest import run_ingestion
+
+
+class CountingSource:
+    def __init__(self):
+        self.ids = itertools.count()
+        self.lock = threading.Lock()
+        self.produced = 0
+
+    def __call__(self, n):
+        with self.lock:
+            self.produced += n
+            return [next(self.ids) for _ in range(n)]
+
+
+def test_delivers_every_event_exactly_once():
+    source = CountingSource()
+    delivered = []
+    stats = asyncio.run(run_ingestion(source, delivered.extend, producers=3, senders=4, batch_size=7, max_events=1_000))
+    assert sorted(delivered) == list(range(1_000))
+    assert stats == {"produced": 1_000, "sent": 1_000, "failed": 0}
+
+
+def test_producers_wait_for_slow_senders():
+    source = CountingSource()
+    ahead = []
+
+    def slow_sink(rows):
+        time.sleep(0.005)
+        with source.lock:
+            ahead.append(source.produced - slow_sink.sent)
+            slow_sink.sent += len(rows)
+    slow_sink.sent = 0
+
+    asyncio.run(run_ingestion(source, slow_sink, producers=1, senders=2, queue_size=4, batch_size=10, max_events=600))
+    # At most the queued batches, one per sender and one being produced are
+    # outstanding at any time.
+    assert max(ahead) <= (4 + 2 + 1) * 10
+    assert slow_sink.sent == 600
+
+
+def test_failed_batches_are_counted_and_do_not_stop_the_run():
+    def flaky_sink(rows):
+        if rows[0] % 20 == 0:
+            raise ConnectionError("warehouse unavailable")
+
+    stats = asyncio.run(run_ingestion(CountingSource(), flaky_sink, senders=2, batch_size=10, max_events=100))
+    assert stats == {"produced": 100, "sent": 50, "failed": 50}
@@ -0,0 +1,75 @@
+import time
+import pandas as pd
+import pytest
+from broadcast import EventPublisher, EventSubscriber
+from livefeed import LiveEventFeed
+from schema import EVENTS_COLUMNS
+from storage import DuckDBBackend
+
+NOW = pd.Timestamp("2025-01-01 12:00:00", tz="UTC")
+
+
+class Clock:
+    def __init__(self, now=NOW):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def make_rows(ids, at):
+    return [{"event_id": event_id, "user_id": f"u{i % 4}", "event_type": "purchase", "product_id": None,
+             "price": 10.0, "timestamp": at.isoformat()} for i, event_id in enumerate(ids)]
+
+
+@pytest.fixture
+def backend():
+    backend = DuckDBBackend(":memory:")
+    backend.create_table("events", EVENTS_COLUMNS)
+    return backend
+
+
+def test_pushed_events_are_not_counted_again_on_refresh(backend):
+    clock = Clock()
+    feed = LiveEventFeed(backend, now=clock)
+    backend.insert_rows("events", make_rows(["a", "b", "c"], NOW - pd.Timedelta(seconds=30)))
+    assert feed.refresh() == 3
+
+    # Pushed: one already fetched, two the warehouse does not have yet.
+    assert feed.push(make_rows(["c", "d", "e"], NOW - pd.Timedelta(seconds=5))) == 2
+    backend.insert_rows("events", make_rows(["d", "e"], NOW - pd.Timedelta(seconds=5)))
+    clock.now = NOW + pd.Timedelta(seconds=1)
+    assert feed.refresh() == 0
+    assert feed.push(make_rows(["d", "e"], NOW - pd.Timedelta(seconds=5))) == 0
+
+    window = feed.snapshot()
+    assert sorted(window["EventId"]) == ["a", "b", "c", "d", "e"]
+    totals = feed.aggregates.snapshot()
+    assert totals["events"] == 5
+    assert totals["revenue"] == pytest.approx(50.0)
+
+
+def test_refresh_max_age_skips_warehouse(backend):
+    feed = LiveEventFeed(backend, now=Clock())
+    backend.insert_rows("events", make_rows(["a"], NOW))
+    assert feed.refresh(max_age=60) == 1
+    backend.insert_rows("events", make_rows(["b"], NOW))
+    assert feed.refresh(max_age=60) == 0
+    assert feed.refresh() == 1
+    assert feed.aggregates.snapshot()["events"] == 2
+
+
+def test_published_events_reach_the_feed(backend):
+    feed = LiveEventFeed(backend, now=Clock())
+    with EventPublisher("127.0.0.1:0") as publisher:
+        subscriber = EventSubscriber(feed.push, f"127.0.0.1:{publisher.port}", reconnect_delay=0.05).start()
+        publish = publisher.wrap(lambda rows: None)
+        deadline = time.monotonic() + 5
+        # Batches published before the publisher accepts the connection are
+        # lost by design; republishing also checks pushed ids are not re-added.
+        while subscriber.rows_received == 0 and time.monotonic() < deadline:
+            publish(make_rows(["a", "b"], NOW))
+            time.sleep(0.05)
+        # Stopping must not hang while the connection is open.
+        subscriber.stop()
+    assert sorted(feed.snapshot()["EventId"]) == ["a", "b"]
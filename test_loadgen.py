@@ -0,0 +1,45 @@
+import multiprocessing as mp
+import threading
+import time
+from loadgen import TokenBucket
+
+
+def drain(bucket, batches, size):
+    for _ in range(batches):
+        bucket.acquire(size)
+
+
+def test_burst_is_free_then_rate_is_held():
+    bucket = TokenBucket(rate=20_000, burst=1_000)
+    start = time.monotonic()
+    bucket.acquire(1_000)
+    assert time.monotonic() - start < 0.02
+
+    start = time.monotonic()
+    threads = [threading.Thread(target=drain, args=(bucket, 20, 50)) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - start
+    assert 4_000 / 20_000 * 0.9 <= elapsed < 4_000 / 20_000 * 3
+
+
+def test_batches_larger_than_the_burst_still_progress():
+    bucket = TokenBucket(rate=10_000, burst=10)
+    start = time.monotonic()
+    drain(bucket, 3, 500)
+    assert 0.1 <= time.monotonic() - start < 0.5
+
+
+def test_processes_share_one_rate():
+    bucket = TokenBucket(rate=10_000, burst=100)
+    bucket.acquire(100)
+    start = time.monotonic()
+    workers = [mp.get_context("fork").Process(target=drain, args=(bucket, 10, 100)) for _ in range(3)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    # Each process alone would finish in about a third of the time.
+    assert time.monotonic() - start >= 3_000 / 10_000 * 0.9
@@ -0,0 +1,73 @@
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+import pytest
+from pagination import KeysetPager, shared_prefetcher
+from storage import DuckDBBackend
+
+
+@pytest.fixture
+def backend():
+    backend = DuckDBBackend(":memory:")
+    # Few distinct days, so most rows tie on the first key.
+    backend.load_dataframe(pd.DataFrame({
+        "day": pd.to_datetime(["2025-01-01", "2025-01-02", "2025-01-03"] * 35).date,
+        "id": [f"id{i:03d}" for i in range(105)],
+    }), "items")
+    return backend
+
+
+def make_pager(backend, **options):
+    return KeysetPager(backend, f"SELECT day, id FROM {backend.table('items')}", backend.table("items"),
+                       [("day", "day"), ("id", "id")], page_size=10, **options)
+
+
+def all_pages(pager):
+    return [pager.page(number) for number in range(-(-pager.total_rows() // pager.page_size))]
+
+
+def test_pages_cover_every_row_once(backend):
+    pager = make_pager(backend)
+    pages = all_pages(pager)
+    rows = pd.concat(pages, ignore_index=True)
+    assert [len(page) for page in pages] == [10] * 10 + [5]
+    assert rows["id"].is_unique and len(rows) == 105
+    expected = backend.query(f"SELECT day, id FROM {backend.table('items')} ORDER BY day, id")
+    pd.testing.assert_frame_equal(rows, expected)
+
+
+def test_pages_are_stable(backend):
+    pager = make_pager(backend)
+    first = all_pages(pager)
+    pager.invalidate()
+    # A page reached without its predecessors is walked to from page 0.
+    pd.testing.assert_frame_equal(pager.page(7), first[7])
+    pd.testing.assert_frame_equal(pager.page(3), first[3])
+
+
+def test_descending_pages(backend):
+    pager = make_pager(backend, descending=True)
+    rows = pd.concat(all_pages(pager), ignore_index=True)
+    expected = backend.query(f"SELECT day, id FROM {backend.table('items')} ORDER BY day DESC, id DESC")
+    pd.testing.assert_frame_equal(rows, expected)
+
+
+def test_filtered_pages(backend):
+    pager = make_pager(backend, where="day = @day", params={"day": pd.Timestamp("2025-01-02").date()})
+    rows = pd.concat(all_pages(pager), ignore_index=True)
+    assert pager.total_rows() == 35
+    assert rows["id"].is_unique and len(rows) == 35
+
+
+def test_concurrent_pages_match_serial_pages(backend):
+    expected = all_pages(make_pager(backend))
+    pager = make_pager(backend)
+    numbers = [n % len(expected) for n in range(200)]
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        for _ in range(3):
+            pager.invalidate()
+            for number, page in zip(numbers, pool.map(pager.page, numbers)):
+                pd.testing.assert_frame_equal(page, expected[number])
+
+
+def test_pagers_share_one_prefetch_pool(backend):
+    assert make_pager(backend)._prefetcher is make_pager(backend)._prefetcher is shared_prefetcher()
@@ -0,0 +1,79 @@
+import threading
+import time
+import pandas as pd
+from querycache import QueryCache
+
+
+def frame(n=3):
+    return pd.DataFrame({"event_type": [f"t{i}" for i in range(n)], "count": range(n)})
+
+
+def test_equivalent_sql_shares_a_key(tmp_path):
+    cache = QueryCache(str(tmp_path))
+    assert cache.key("SELECT *\n  FROM events -- all\n;") == cache.key("SELECT * FROM events")
+    assert cache.key("SELECT 1", {"a": 1}) != cache.key("SELECT 1", {"a": 2})
+
+
+def test_entries_expire_after_their_ttl(tmp_path, monkeypatch):
+    cache = QueryCache(str(tmp_path))
+    cache.put("SELECT 1", frame(), ttl=10)
+    pd.testing.assert_frame_equal(cache.get("SELECT 1"), frame())
+
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 11)
+    assert cache.get("SELECT 1") is None
+    assert QueryCache(str(tmp_path)).get("SELECT 1") is None
+
+
+def test_results_persist_across_instances(tmp_path):
+    QueryCache(str(tmp_path)).put("SELECT 1", frame())
+    other = QueryCache(str(tmp_path))
+    pd.testing.assert_frame_equal(other.get("SELECT 1"), frame())
+    assert other.hits == {"memory": 0, "disk": 1}
+    other.get("SELECT 1")
+    assert other.hits == {"memory": 1, "disk": 1}
+
+
+def test_invalidate_drops_tagged_entries_for_every_instance(tmp_path):
+    first = QueryCache(str(tmp_path))
+    second = QueryCache(str(tmp_path))
+    first.put("SELECT * FROM events", frame(), tags=("events",))
+    first.put("SELECT * FROM orders", frame(), tags=("orders",))
+    assert second.get("SELECT * FROM events") is not None
+
+    first.invalidate("events")
+    # second still holds the result in memory, but its disk entry is gone.
+    assert second.get("SELECT * FROM events") is None
+    assert second.get("SELECT * FROM orders") is not None
+    first.invalidate()
+    assert second.get("SELECT * FROM orders") is None
+
+
+def test_memory_tier_stays_within_its_budget():
+    cache = QueryCache(None, memory_bytes=int(frame(100).memory_usage(deep=True).sum()) * 2)
+    for i in range(5):
+        cache.put(f"SELECT {i}", frame(100))
+    assert cache._memory_used <= cache.memory_bytes
+    assert cache.get("SELECT 0") is None
+    assert cache.get("SELECT 4") is not None
+
+
+def test_concurrent_misses_compute_once(tmp_path):
+    cache = QueryCache(str(tmp_path))
+    calls = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.05)
+        return frame()
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_compute("SELECT 1", compute))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert len(results) == 8
+    for df in results:
+        pd.testing.assert_frame_equal(df, frame())
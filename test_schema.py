@@ -0,0 +1,50 @@
+import pandas as pd
+import pytest
+from schema import EventsSchema
+from storage import DuckDBBackend
+
+
+LEGACY_ROWS = [
+    ("e1", "u1", "login", None, None, "2025-01-01T05:30:00"),
+    ("e2", "u1", "purchase", "p1", 19.5, "2025-01-01T06:00:00.250000"),
+]
+
+
+@pytest.fixture
+def legacy_backend():
+    backend = DuckDBBackend(":memory:")
+    backend.execute("DROP TABLE events")
+    backend.execute("CREATE TABLE events (event_id VARCHAR, user_id VARCHAR, event_type VARCHAR, product_id VARCHAR, "
+                    "price DOUBLE, timestamp VARCHAR)")
+    columns = ("event_id", "user_id", "event_type", "product_id", "price", "timestamp")
+    backend.insert_rows("events", [dict(zip(columns, row)) for row in LEGACY_ROWS])
+    return backend
+
+
+def test_ensure_creates_a_native_table():
+    backend = DuckDBBackend(":memory:")
+    backend.execute("DROP TABLE events")
+    schema = EventsSchema(backend)
+    assert schema.ensure() is False
+    assert backend.column_types("events")["timestamp"] == "TIMESTAMP"
+    assert schema.ensure() is False
+    assert schema.migrate() is None
+
+
+def test_migrate_converts_legacy_strings(legacy_backend):
+    schema = EventsSchema(legacy_backend)
+    assert schema.ensure() is True
+
+    legacy = schema.migrate(source_timezone="Asia/Kolkata")
+    assert legacy.startswith("events_legacy_")
+    assert not schema.needs_migration()
+
+    df = legacy_backend.query("SELECT event_id, price, timestamp FROM events ORDER BY event_id")
+    assert df["event_id"].tolist() == ["e1", "e2"]
+    assert pd.isna(df["price"][0]) and df["price"][1] == 19.5
+    # Legacy strings were local (IST) time.
+    assert pd.to_datetime(df["timestamp"], utc=True).tolist() == [
+        pd.Timestamp("2025-01-01T00:00:00Z"), pd.Timestamp("2025-01-01T00:30:00.250000Z")]
+    # The original rows are kept as they were.
+    old = legacy_backend.query(f"SELECT timestamp FROM {legacy} ORDER BY event_id")
+    assert old["timestamp"].tolist() == [row[-1] for row in LEGACY_ROWS]
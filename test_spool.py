@@ -0,0 +1,102 @@
+import json
+import os
+import pytest
+from spool import EventSpool, SpoolDrainer
+from storage import DuckDBBackend
+from schema import EVENTS_COLUMNS
+
+
+def make_rows(n, start=0):
+    return [{"event_id": f"e{i}", "user_id": f"u{i % 7}", "event_type": "page_view", "product_id": None,
+             "price": None, "timestamp": "2025-01-01T00:00:00+00:00"} for i in range(start, start + n)]
+
+
+def read_all(spool, position=(0, 0)):
+    # Reads segment by segment; returns the rows and the position after them.
+    rows = []
+    while True:
+        batch, position = spool.read(position, 1_000)
+        if not batch:
+            return rows, position
+        rows += batch
+
+
+@pytest.fixture
+def spool(tmp_path):
+    spool = EventSpool(str(tmp_path), fsync="never")
+    yield spool
+    spool.close()
+
+
+def test_spool_truncates_torn_tail(tmp_path):
+    spool = EventSpool(str(tmp_path), fsync="never")
+    spool.append_many(make_rows(3))
+    spool.close()
+    path = os.path.join(str(tmp_path), "segment-000000000000.log")
+    intact = os.path.getsize(path)
+    with open(path, "ab") as f:
+        f.write(b"\x40\x00\x00\x00\x01\x02")  # header and payload cut short by a crash
+
+    spool = EventSpool(str(tmp_path), fsync="never")
+    assert os.path.getsize(path) == intact
+    spool.append_many(make_rows(2, start=3))
+    assert [row["event_id"] for row in read_all(spool)[0]] == ["e0", "e1", "e2", "e3", "e4"]
+    spool.close()
+
+
+def test_spool_stops_at_corrupt_record(spool):
+    spool.append_many(make_rows(3))
+    path = os.path.join(spool.directory, "segment-000000000000.log")
+    with open(path, "r+b") as f:
+        f.seek(os.path.getsize(path) - 2)
+        f.write(b"!!")
+    assert [row["event_id"] for row in read_all(spool)[0]] == ["e0", "e1"]
+
+
+def test_spool_resumes_from_checkpoint(tmp_path):
+    spool = EventSpool(str(tmp_path), fsync="never")
+    spool.append_many(make_rows(10))
+    rows, position = spool.read(spool.load_checkpoint(), 4)
+    assert len(rows) == 4
+    spool.commit(position)
+    spool.close()
+
+    spool = EventSpool(str(tmp_path), fsync="never")
+    position = spool.load_checkpoint()
+    assert [row["event_id"] for row in read_all(spool, position)[0]] == [f"e{i}" for i in range(4, 10)]
+    spool.close()
+
+
+def test_spool_rotates_and_deletes_delivered_segments(tmp_path):
+    spool = EventSpool(str(tmp_path), segment_bytes=1024, fsync="never")
+    for start in range(0, 40, 5):
+        spool.append_many(make_rows(5, start))
+    assert len(spool.segments()) > 2
+
+    rows, position = read_all(spool, spool.load_checkpoint())
+    assert [row["event_id"] for row in rows] == [f"e{i}" for i in range(40)]
+    spool.commit(position)
+    assert spool.segments() == [spool.active_seq]
+    spool.close()
+
+
+def test_drainer_delivers_and_dead_letters(spool):
+    backend = DuckDBBackend(":memory:")
+    backend.create_table("events", EVENTS_COLUMNS)
+
+    def send(rows):
+        # Rows the warehouse rejects for good, the way BigQuery reports them.
+        errors = [{"index": i, "errors": [{"reason": "invalid", "message": "bad row"}]}
+                  for i, row in enumerate(rows) if row["event_id"] == "e3"]
+        accepted = [row for row in rows if row["event_id"] != "e3"]
+        return errors + backend.insert_rows("events", accepted)
+
+    spool.append_many(make_rows(10))
+    drainer = SpoolDrainer(spool, send, batch_size=4, poll_interval=0.01).start()
+    drainer.stop(timeout=10)
+
+    assert backend.query("SELECT COUNT(*) AS n FROM events").iloc[0]["n"] == 9
+    assert drainer.rows_dead_lettered == 1
+    with open(os.path.join(spool.directory, "dead-letter.jsonl")) as f:
+        assert [json.loads(line)["row"]["event_id"] for line in f] == ["e3"]
+    assert read_all(spool, spool.load_checkpoint())[0] == []
@@ -0,0 +1,42 @@
+import threading
+import pytest
+from google.auth.credentials import AnonymousCredentials
+from storage import BigQueryBackend
+
+
+@pytest.fixture
+def backend():
+    return BigQueryBackend(project="test-project", dataset="test", max_concurrency=3, credentials=AnonymousCredentials())
+
+
+def test_pool_grows_to_max_and_reuses_clients(backend):
+    held = []
+    for _ in range(3):
+        context = backend.connection()
+        held.append((context, context.__enter__()))
+    clients = [client for _, client in held]
+    assert len({id(client) for client in clients}) == 3
+    assert all(client.project == "test-project" for client in clients)
+
+    # With every client busy, a fourth call waits for one to be returned.
+    got = []
+    waiter = threading.Thread(target=lambda: got.append(backend.connection().__enter__()))
+    waiter.start()
+    waiter.join(0.2)
+    assert waiter.is_alive()
+    held[0][0].__exit__(None, None, None)
+    waiter.join(5)
+    assert got == [clients[0]]
+
+
+def test_failed_client_creation_releases_its_slot(backend, monkeypatch):
+    def unavailable():
+        raise RuntimeError("no credentials")
+
+    with backend.connection():
+        monkeypatch.setattr(backend, "_new_client", unavailable)
+        for _ in range(5):
+            with pytest.raises(RuntimeError):
+                with backend.connection():
+                    pass
+    assert backend._created == 1
@@ -0,0 +1,108 @@
+import numpy as np
+import pandas as pd
+import pytest
+from storage import DuckDBBackend
+from summaries import OrderSummaries, SUMMARY_TABLES
+
+
+def make_source(n_orders=200, seed=0):
+    rng = np.random.default_rng(seed)
+    order_ids = [f"o{i:04d}" for i in range(n_orders)]
+    orders = pd.DataFrame({
+        "OrderId": order_ids,
+        "CustomerId": [f"c{i:04d}" for i in range(n_orders)],
+        "OrderStatus": rng.choice(["delivered", "shipped", "canceled"], n_orders),
+        # Several orders a day, at different times, in OrderDate order.
+        "OrderDate": pd.Timestamp("2018-01-01") + pd.to_timedelta(np.sort(rng.uniform(0, 30, n_orders)), unit="D"),
+    })
+    items_per_order = rng.integers(1, 4, n_orders)
+    order_items = pd.DataFrame({
+        "order_id": np.repeat(order_ids, items_per_order),
+        "product_id": [f"p{i}" for i in rng.integers(0, 40, items_per_order.sum())],
+        "price": rng.uniform(5, 200, items_per_order.sum()).round(2),
+        "freight_value": rng.uniform(0, 20, items_per_order.sum()).round(2),
+    })
+    customers = pd.DataFrame({"customer_id": orders["CustomerId"], "customer_state": "SP"})
+    products = pd.DataFrame({"product_id": [f"p{i}" for i in range(40)],
+                             "product_category_name": [f"cat_{i % 6}" for i in range(40)]})
+    return orders, order_items, customers, products
+
+
+def load(backend, orders, order_items, customers, products):
+    for df, table in [(orders, "ClusteredOrders"), (order_items, "order_items"), (customers, "customers"), (products, "products")]:
+        backend.load_dataframe(df, table)
+
+
+def summary(backend, table):
+    df = backend.query(f"SELECT * FROM {backend.table(table)}")
+    key = {"summary_category_revenue": "ProductCategoryName", "summary_order_status": "OrderStatus",
+           "summary_daily_orders": "OrderDate"}.get(table)
+    if key == "OrderDate":
+        df[key] = pd.to_datetime(df[key])
+    return df.sort_values(key).reset_index(drop=True) if key else df
+
+
+def split(orders, order_items, customers, at):
+    first = orders.iloc[:at]
+    rest = orders.iloc[at:]
+    return (
+        (first, order_items[order_items["order_id"].isin(first["OrderId"])], customers[customers["customer_id"].isin(first["CustomerId"])]),
+        (rest, order_items[order_items["order_id"].isin(rest["OrderId"])], customers[customers["customer_id"].isin(rest["CustomerId"])]),
+    )
+
+
+def test_fold_matches_rebuild():
+    orders, order_items, customers, products = make_source()
+    (first, rest) = split(orders, order_items, customers, 120)
+
+    folded = DuckDBBackend(":memory:")
+    load(folded, *first, products)
+    summaries = OrderSummaries(folded)
+    summaries.rebuild()
+    assert summaries.append(*rest) == sorted(SUMMARY_TABLES)
+
+    rebuilt = DuckDBBackend(":memory:")
+    load(rebuilt, orders, order_items, customers, products)
+    OrderSummaries(rebuilt).rebuild()
+
+    for table in SUMMARY_TABLES:
+        pd.testing.assert_frame_equal(summary(folded, table), summary(rebuilt, table), check_dtype=False, check_exact=False)
+
+
+def test_replayed_orders_are_not_folded_twice():
+    orders, order_items, customers, products = make_source()
+    (first, rest) = split(orders, order_items, customers, 120)
+    backend = DuckDBBackend(":memory:")
+    load(backend, *first, products)
+    summaries = OrderSummaries(backend)
+    summaries.rebuild()
+    summaries.append(*rest)
+    before = {table: summary(backend, table) for table in SUMMARY_TABLES}
+
+    assert summaries.append(*rest) == []
+    assert summaries.fold(*first) == []
+    for table in SUMMARY_TABLES:
+        pd.testing.assert_frame_equal(summary(backend, table), before[table])
+    assert backend.query("SELECT COUNT(*) AS n FROM ClusteredOrders").iloc[0]["n"] == len(orders)
+
+
+def test_daily_orders_have_one_row_per_day():
+    orders, order_items, customers, products = make_source()
+    backend = DuckDBBackend(":memory:")
+    load(backend, orders, order_items, customers, products)
+    OrderSummaries(backend).rebuild()
+    daily = summary(backend, "summary_daily_orders")
+    assert daily["OrderDate"].is_unique
+    assert daily["Orders"].sum() == len(orders)
+
+
+def test_exists_only_swallows_missing_tables():
+    backend = DuckDBBackend(":memory:")
+    assert not OrderSummaries(backend).exists()
+
+    class Unavailable(DuckDBBackend):
+        def column_types(self, table):
+            raise ConnectionError("warehouse unavailable")
+
+    with pytest.raises(ConnectionError):
+        OrderSummaries(Unavailable(":memory:")).ensure_built()
@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+import pytest
+from windows import WindowedAggregates
+
+NOW = pd.Timestamp("2025-01-01 12:00:00", tz="UTC")
+
+
+class Clock:
+    def __init__(self, now=NOW):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def make_frame(n, seed=0, span=pd.Timedelta(minutes=9)):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "EventType": rng.choice(["page_view", "purchase", "login"], n),
+        "UserId": [f"u{i}" for i in rng.integers(0, n // 3, n)],
+        "Price": np.where(rng.random(n) < 0.3, rng.uniform(5, 500, n).round(2), np.nan),
+        "timestamp": NOW - span + pd.to_timedelta(rng.uniform(0, span.total_seconds(), n), unit="s"),
+    })
+
+
+def test_aggregates_match_pandas():
+    df = make_frame(5_000)
+    aggregates = WindowedAggregates(now=Clock())
+    aggregates.add_frame(df)
+    totals = aggregates.snapshot()
+    assert totals["events"] == len(df)
+    assert totals["unique_users"] == df["UserId"].nunique()
+    assert totals["revenue"] == pytest.approx(df["Price"].sum())
+    assert totals["type_counts"] == df["EventType"].value_counts().to_dict()
+    assert totals["buckets"]["events"].sum() == len(df)
+
+
+def test_aggregates_slide_old_events_out():
+    clock = Clock()
+    df = make_frame(3_000, span=pd.Timedelta(minutes=10))
+    aggregates = WindowedAggregates(now=clock)
+    aggregates.add_frame(df)
+
+    clock.now = NOW + pd.Timedelta(minutes=4)
+    # The window is the 60 tumbling windows of 10 s up to the current one.
+    recent = df[df["timestamp"] >= clock.now.floor("10s") - pd.Timedelta(seconds=590)]
+    totals = aggregates.snapshot()
+    assert totals["events"] == len(recent)
+    assert totals["unique_users"] == recent["UserId"].nunique()
+    assert totals["revenue"] == pytest.approx(recent["Price"].sum())
+
+    clock.now = NOW + pd.Timedelta(hours=1)
+    assert aggregates.snapshot()["events"] == 0
+
+
+def test_aggregates_count_late_events_as_dropped():
+    aggregates = WindowedAggregates(now=Clock())
+    aggregates.add("purchase", "u1", 10.0, NOW)
+    aggregates.add("purchase", "u2", 10.0, NOW - pd.Timedelta(minutes=30))
+    totals = aggregates.snapshot()
+    assert totals["events"] == 1
+    assert totals["late_dropped"] == 1
+
+
+def test_approximate_unique_users():
+    df = make_frame(30_000)
+    aggregates = WindowedAggregates(now=Clock(), distinct_counts="approx")
+    aggregates.add_frame(df)
+    exact = df["UserId"].nunique()
+    assert abs(aggregates.snapshot()["unique_users"] - exact) <= 0.05 * exact
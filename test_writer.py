@@ -0,0 +1,69 @@
+import json
+import time
+from schema import EVENTS_COLUMNS
+from spool import EventSpool
+from storage import DuckDBBackend
+from writer import BatchedEventWriter
+
+
+def make_rows(n, start=0):
+    return [{"event_id": f"e{i}", "user_id": "u", "event_type": "login", "product_id": None, "price": None,
+             "timestamp": "2025-01-01T00:00:00+00:00"} for i in range(start, start + n)]
+
+
+class RecordingBackend:
+    def __init__(self, reject=()):
+        self.batches = []
+        self.reject = set(reject)
+
+    def insert_rows(self, table, rows):
+        self.batches.append([row["event_id"] for row in rows])
+        return [{"index": i, "errors": [{"reason": "invalid"}]} for i, row in enumerate(rows) if row["event_id"] in self.reject]
+
+
+def test_sends_full_batches():
+    backend = RecordingBackend()
+    with BatchedEventWriter(backend=backend, max_rows=4, max_linger=60) as writer:
+        writer.write_many(make_rows(10))
+        assert [len(batch) for batch in backend.batches] == [4, 4]
+    # close() sends the partial batch.
+    assert [len(batch) for batch in backend.batches] == [4, 4, 2]
+    assert writer.rows_sent == 10
+
+
+def test_sends_by_payload_size():
+    backend = RecordingBackend()
+    row_bytes = len(json.dumps(make_rows(1)[0])) + 1
+    with BatchedEventWriter(backend=backend, max_rows=1_000, max_bytes=3 * row_bytes, max_linger=60) as writer:
+        writer.write_many(make_rows(7))
+    assert [len(batch) for batch in backend.batches] == [3, 3, 1]
+    assert sum(len(batch) for batch in backend.batches) == 7
+
+
+def test_linger_sends_partial_batch():
+    backend = RecordingBackend()
+    with BatchedEventWriter(backend=backend, max_rows=100, max_linger=0.1) as writer:
+        writer.write(make_rows(1)[0])
+        deadline = time.monotonic() + 5
+        while not backend.batches and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert backend.batches == [["e0"]]
+
+
+def test_rejected_rows_are_spooled(tmp_path):
+    spool = EventSpool(str(tmp_path), fsync="never")
+    backend = RecordingBackend(reject={"e1", "e3"})
+    with BatchedEventWriter(backend=backend, max_rows=5, spool=spool) as writer:
+        writer.write_many(make_rows(5))
+    rows, _ = spool.read((0, 0), 100)
+    assert [row["event_id"] for row in rows] == ["e1", "e3"]
+    assert (writer.rows_sent, writer.rows_failed) == (3, 2)
+    spool.close()
+
+
+def test_writes_reach_the_local_warehouse():
+    backend = DuckDBBackend(":memory:")
+    backend.create_table("events", EVENTS_COLUMNS)
+    with BatchedEventWriter(backend=backend, max_rows=50) as writer:
+        writer.write_many(make_rows(120))
+    assert backend.query("SELECT COUNT(*) AS n FROM events").iloc[0]["n"] == 120